@@ -0,0 +1,48 @@
+"""Allocation indexes
+
+Revision ID: 22f04c1ca22c
+Revises: d09781c41c10
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '22f04c1ca22c'
+down_revision = 'd09781c41c10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('charityproject', 'donation'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(
+                f'ix_{table}_fully_invested_create_date_id',
+                ['fully_invested', 'create_date', 'id'],
+                unique=False,
+            )
+            batch_op.create_index(
+                f'ix_{table}_open_create_date_id',
+                ['create_date', 'id'],
+                unique=False,
+                sqlite_where=sa.text('fully_invested = 0'),
+                postgresql_where=sa.text('NOT fully_invested'),
+            )
+    with op.batch_alter_table('donation', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_donation_user_id_create_date',
+            ['user_id', 'create_date'],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('donation', schema=None) as batch_op:
+        batch_op.drop_index('ix_donation_user_id_create_date')
+    for table in ('donation', 'charityproject'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_open_create_date_id')
+            batch_op.drop_index(f'ix_{table}_fully_invested_create_date_id')
@@ -0,0 +1,39 @@
+"""Allocation queue
+
+Revision ID: 3b8f0d2e5a61
+Revises: a7d2e6c4f913
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8f0d2e5a61'
+down_revision = 'a7d2e6c4f913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('charityproject', 'donation'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(
+                'queued', sa.Boolean(), nullable=False,
+                server_default='0',
+            ))
+            batch_op.create_index(
+                f'ix_{table}_queued_create_date_id',
+                ['create_date', 'id'],
+                unique=False,
+                sqlite_where=sa.text('queued = 1'),
+                postgresql_where=sa.text('queued'),
+            )
+
+
+def downgrade():
+    for table in ('donation', 'charityproject'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_queued_create_date_id')
+            batch_op.drop_column('queued')
@@ -0,0 +1,31 @@
+"""Row versions
+
+Revision ID: 5e3a9d41b7c2
+Revises: c9c2b369a1dc
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e3a9d41b7c2'
+down_revision = 'c9c2b369a1dc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('charityproject', 'donation'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(
+                'version_id', sa.Integer(), nullable=False,
+                server_default='1',
+            ))
+
+
+def downgrade():
+    for table in ('donation', 'charityproject'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version_id')
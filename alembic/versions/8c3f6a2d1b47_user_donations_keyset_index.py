@@ -0,0 +1,33 @@
+"""User donations keyset index
+
+Revision ID: 8c3f6a2d1b47
+Revises: e5b7c1d93f20
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3f6a2d1b47'
+down_revision = 'e5b7c1d93f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('donation', schema=None) as batch_op:
+        batch_op.drop_index('ix_donation_user_id_create_date')
+        batch_op.create_index(
+            'ix_donation_user_id_id', ['user_id', 'id'], unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('donation', schema=None) as batch_op:
+        batch_op.drop_index('ix_donation_user_id_id')
+        batch_op.create_index(
+            'ix_donation_user_id_create_date',
+            ['user_id', 'create_date'],
+            unique=False,
+        )
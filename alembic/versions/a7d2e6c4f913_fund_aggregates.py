@@ -0,0 +1,42 @@
+"""Fund aggregates
+
+Revision ID: a7d2e6c4f913
+Revises: 5e3a9d41b7c2
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2e6c4f913'
+down_revision = '5e3a9d41b7c2'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('open_capacity', 'pending_balance', 'donated_total')
+
+
+def upgrade():
+    with op.batch_alter_table('allocationstate', schema=None) as batch_op:
+        for column in COLUMNS:
+            batch_op.add_column(sa.Column(
+                column, sa.BigInteger(), nullable=False, server_default='0',
+            ))
+    op.execute(
+        'UPDATE allocationstate SET '
+        'open_capacity = (SELECT coalesce(sum(full_amount - '
+        'invested_amount), 0) FROM charityproject '
+        'WHERE NOT fully_invested), '
+        'pending_balance = (SELECT coalesce(sum(full_amount - '
+        'invested_amount), 0) FROM donation WHERE NOT fully_invested), '
+        'donated_total = (SELECT coalesce(sum(full_amount), 0) '
+        'FROM donation)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('allocationstate', schema=None) as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column)
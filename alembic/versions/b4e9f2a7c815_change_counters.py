@@ -0,0 +1,48 @@
+"""Change counters
+
+Revision ID: b4e9f2a7c815
+Revises: 8c3f6a2d1b47
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e9f2a7c815'
+down_revision = '8c3f6a2d1b47'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('charityproject', 'donation', 'donation_bulk')
+STRIPES = 16
+
+
+def upgrade():
+    op.create_table(
+        'changecounter',
+        sa.Column('id', sa.Integer(), nullable=False),
+        *(
+            sa.Column(column, sa.BigInteger(), nullable=False)
+            for column in COLUMNS
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute(
+        'INSERT INTO changecounter (id, charityproject, donation, '
+        'donation_bulk) VALUES ' + ', '.join(
+            f'({stripe}, 0, 0, 0)' for stripe in range(1, STRIPES + 1)
+        )
+    )
+    op.create_table(
+        'userchangecounter',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('userchangecounter')
+    op.drop_table('changecounter')
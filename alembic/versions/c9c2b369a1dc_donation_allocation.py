@@ -0,0 +1,46 @@
+"""Donation allocation
+
+Revision ID: c9c2b369a1dc
+Revises: f8b254b7cd60
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9c2b369a1dc'
+down_revision = 'f8b254b7cd60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('donationallocation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('donation_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['donation_id'], ['donation.id'], ),
+    sa.ForeignKeyConstraint(['project_id'], ['charityproject.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('donationallocation', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_donationallocation_donation_id_id',
+            ['donation_id', 'id'], unique=False,
+        )
+        batch_op.create_index(
+            'ix_donationallocation_project_id_id',
+            ['project_id', 'id'], unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('donationallocation', schema=None) as batch_op:
+        batch_op.drop_index('ix_donationallocation_project_id_id')
+        batch_op.drop_index('ix_donationallocation_donation_id_id')
+
+    op.drop_table('donationallocation')
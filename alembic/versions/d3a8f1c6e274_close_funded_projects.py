@@ -0,0 +1,27 @@
+"""Close funded projects
+
+Revision ID: d3a8f1c6e274
+Revises: b4e9f2a7c815
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f1c6e274'
+down_revision = 'b4e9f2a7c815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        'UPDATE charityproject SET fully_invested = TRUE, '
+        'close_date = CURRENT_TIMESTAMP, version_id = version_id + 1 '
+        'WHERE NOT fully_invested AND invested_amount = full_amount'
+    )
+
+
+def downgrade():
+    pass
@@ -0,0 +1,65 @@
+"""Fund aggregate stripes
+
+Revision ID: e5b7c1d93f20
+Revises: 3b8f0d2e5a61
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7c1d93f20'
+down_revision = '3b8f0d2e5a61'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('open_capacity', 'pending_balance', 'donated_total')
+STRIPES = 16
+
+
+def upgrade():
+    op.create_table(
+        'fundaggregate',
+        sa.Column('id', sa.Integer(), nullable=False),
+        *(
+            sa.Column(column, sa.BigInteger(), nullable=False)
+            for column in COLUMNS
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute(
+        'INSERT INTO fundaggregate (id, open_capacity, pending_balance, '
+        'donated_total) VALUES ' + ', '.join(
+            f'({stripe}, 0, 0, 0)' for stripe in range(1, STRIPES + 1)
+        )
+    )
+    op.execute(
+        'UPDATE fundaggregate SET '
+        'open_capacity = (SELECT coalesce(sum(full_amount - '
+        'invested_amount), 0) FROM charityproject '
+        'WHERE NOT fully_invested), '
+        'pending_balance = (SELECT coalesce(sum(full_amount - '
+        'invested_amount), 0) FROM donation WHERE NOT fully_invested), '
+        'donated_total = (SELECT coalesce(sum(full_amount), 0) '
+        'FROM donation) WHERE id = 1'
+    )
+    with op.batch_alter_table('allocationstate', schema=None) as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column)
+
+
+def downgrade():
+    with op.batch_alter_table('allocationstate', schema=None) as batch_op:
+        for column in COLUMNS:
+            batch_op.add_column(sa.Column(
+                column, sa.BigInteger(), nullable=False, server_default='0',
+            ))
+    op.execute(
+        'UPDATE allocationstate SET ' + ', '.join(
+            f'{column} = (SELECT sum({column}) FROM fundaggregate)'
+            for column in COLUMNS
+        )
+    )
+    op.drop_table('fundaggregate')
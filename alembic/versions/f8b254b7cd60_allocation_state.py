@@ -0,0 +1,29 @@
+"""Allocation state
+
+Revision ID: f8b254b7cd60
+Revises: 22f04c1ca22c
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8b254b7cd60'
+down_revision = '22f04c1ca22c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    allocation_state = op.create_table('allocationstate',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(allocation_state, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('allocationstate')
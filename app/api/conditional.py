@@ -0,0 +1,36 @@
+from http import HTTPStatus
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def weak_etag(*parts) -> str:
+    """
+    Слабый ETag из частей версии: одинаковый тег означает
+    равнозначный, но не обязательно побайтно равный ответ.
+    """
+    return 'W/"{}"'.format("-".join(map(str, parts)))
+
+
+def opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    Ответ 304, если If-None-Match запроса совпадает с etag,
+    иначе None.
+
+    Теги сравниваются слабо, без префикса W/, как требует
+    RFC 9110 для If-None-Match.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    tags = {opaque_tag(tag) for tag in header.split(",")}
+    if "*" in tags or opaque_tag(etag) in tags:
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return None
@@ -5,3 +5,6 @@ ERR_PROJECT_NOT_FOUND = "Проект не найден!"
 ERR_PROJECT_WITH_DONATION = "Не подлежит удалению!"
 ERR_CLOSED_PROJECT_EDIT = "Закрытый проект нельзя редактировать!"
 ERR_AMOUNT_LESS_THAN_INVESTED = "Данная сумма слишком мала!"
+ERR_PROJECT_CHANGED = "Проект был изменен параллельно, повторите запрос!"
+ERR_DONATION_NOT_FOUND = "Пожертвование не найдено!"
+ERR_UNKNOWN_FIELDS = "Неизвестные поля: {fields}!"
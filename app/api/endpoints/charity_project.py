@@ -1,18 +1,37 @@
-from typing import List
+from http import HTTPStatus
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import (APIRouter, Body, Depends, HTTPException, Query,
+                     Request, Response)
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
+from app.api import constants
+from app.api.conditional import not_modified, weak_etag
+from app.api.pagination import add_next_link, page_fields, page_response
 from app.api.validators import (check_closed_project, check_name_duplicate,
-                                check_new_full_amount, check_project_exists,
+                                check_name_unique, check_new_full_amount,
+                                check_project_exists,
                                 check_project_with_donation)
+from app.core.config import settings
 from app.core.db import get_async_session
 from app.core.user import current_superuser
+from app.crud.change_counter import change_counter_crud
 from app.crud.charity_project import charity_project_crud
+from app.crud.donation_allocation import donation_allocation_crud
 from app.schemas.charity_project import (CharityProjectCreate,
                                          CharityProjectDB,
                                          CharityProjectUpdate)
-from app.services.investing import get_donations_for_project
+from app.models import CharityProject, Donation
+from app.schemas.donation_allocation import DonationAllocationDB
+from app.schemas.simulation import SimulationCreate, SimulationResult
+from app.services.allocation_queue import allocation_queue
+from app.services.export import ExportFormat, export_response
+from app.services.investing import (get_donations_for_project, invest_many,
+                                    make_close_obj)
+from app.services.simulation import simulate
 
 router = APIRouter()
 
@@ -32,16 +51,80 @@ async def create_new_charity_project(
 
     Доступно только для суперпользователей.
 
-    Проверяет, что имя проекта уникально, создает проект,
-    затем обновляет информацию о проекте с учетом текущих пожертвований.
+    Создает проект и распределяет по нему текущие пожертвования
+    в одной транзакции. При включенной настройке allocation_queue
+    проект только ставится в очередь фонового распределения.
+    Уникальность имени проверяет ограничение БД при вставке:
+    если имя занято, возвращает 400.
 
     """
-    await check_name_duplicate(charity_project.name, session)
-    new_project = await charity_project_crud.create(charity_project, session)
-    project_after_investing = await get_donations_for_project(
-        new_project, session
+    new_project = await charity_project_crud.create(
+        charity_project, session, commit=False
     )
-    return project_after_investing
+    try:
+        if settings.allocation_queue:
+            return await allocation_queue.enqueue(new_project, session)
+        return await get_donations_for_project(new_project, session)
+    except IntegrityError as error:
+        await session.rollback()
+        check_name_unique(error)
+        raise
+
+
+@router.post(
+    "/bulk",
+    response_model=List[CharityProjectDB],
+    dependencies=[Depends(current_superuser)],
+    response_model_exclude_none=True,
+)
+async def create_charity_projects_bulk(
+    charity_projects: List[CharityProjectCreate] = Body(
+        ..., min_items=1, max_items=settings.project_batch_max_size
+    ),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Создает пачку благотворительных проектов.
+
+    Доступно только для суперпользователей.
+
+    Проекты вставляются многострочными INSERT и распределяются
+    по ожидающим пожертвованиям за один проход в одной транзакции,
+    в порядке запроса. Если имя занято или повторяется в пачке,
+    возвращает 400 и не создает ни одного проекта. При включенной
+    настройке allocation_queue проекты только ставятся в очередь.
+
+    """
+    new_projects = await charity_project_crud.create_many(
+        charity_projects, session
+    )
+    try:
+        if settings.allocation_queue:
+            return await allocation_queue.enqueue_many(new_projects, session)
+        return await invest_many(new_projects, Donation, session)
+    except IntegrityError as error:
+        await session.rollback()
+        check_name_unique(error)
+        raise
+
+
+@router.post(
+    "/simulate",
+    response_model=SimulationResult,
+    dependencies=[Depends(current_superuser)],
+)
+async def simulate_charity_project(
+    obj_in: SimulationCreate,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Прогнозирует, какие открытые пожертвования поглотит новый проект
+    на сумму full_amount и какие из них закроются.
+
+    Доступно только для суперпользователей. Ничего не записывает в БД.
+
+    """
+    return await simulate(obj_in.full_amount, Donation, session)
 
 
 @router.get(
@@ -49,13 +132,85 @@ async def create_new_charity_project(
     response_model_exclude_none=True
 )
 async def get_all_charity_projects(
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.page_size, ge=1, le=settings.max_page_size),
+    after_id: int = Query(0, ge=0),
+    fields: Optional[str] = Query(
+        None, description="Поля ответа через запятую, например id,name"
+    ),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Получает страницу благотворительных проектов в порядке id.
+
+    Следующую страницу задает after_id (id последнего проекта),
+    ссылка на нее приходит в заголовке Link. С fields в ответе
+    и запросе к БД остаются только перечисленные поля и id.
+    Слабый ETag строится по версии таблицы проектов: если он
+    совпадает с If-None-Match, возвращается 304 без чтения проектов.
+    """
+    columns = page_fields(CharityProjectDB, fields)
+    etag = weak_etag(
+        "charityproject",
+        await change_counter_crud.get_version(CharityProject, session),
+    )
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    all_projects = await charity_project_crud.get_multi(
+        session, limit, after_id, columns
+    )
+    return page_response(
+        request, response, all_projects, limit, columns,
+        exclude_none=True, etag=etag,
+    )
+
+
+@router.get(
+    "/export",
+    dependencies=[Depends(current_superuser)],
+    response_class=StreamingResponse,
+)
+async def export_charity_projects(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
-    Получает список всех благотворительных проектов.
+    Выгружает все благотворительные проекты в NDJSON или CSV.
+
+    Доступно только для суперпользователей. Проекты читаются
+    и отдаются потоком, порциями по EXPORT_CHUNK_SIZE строк.
+
     """
-    all_projects = await charity_project_crud.get_multi(session)
-    return all_projects
+    return export_response(
+        charity_project_crud, CharityProjectDB, export_format, session
+    )
+
+
+@router.get(
+    "/{project_id}/allocations",
+    response_model=List[DonationAllocationDB],
+    dependencies=[Depends(current_superuser)],
+)
+async def get_charity_project_allocations(
+    project_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.page_size, ge=1, le=settings.max_page_size),
+    after_id: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Получает страницу долей пожертвований, направленных в проект.
+
+    Доступно только для суперпользователей.
+
+    """
+    allocations = await donation_allocation_crud.get_project_allocations(
+        project_id, session, limit, after_id
+    )
+    return add_next_link(request, response, allocations, limit)
 
 
 @router.patch(
@@ -75,17 +230,32 @@ async def partially_update_charity_project(
 
     Проверяет существование проекта, что он не закрыт,
     проверяет уникальность нового имени и корректность новой суммы,
-    затем обновляет проект.
+    затем обновляет проект. Проект, новая сумма которого равна уже
+    внесенной, закрывается. Если проект успели изменить параллельно,
+    возвращает 409. Если имя заняли после проверки, его отклоняет
+    ограничение БД, и возвращается 400.
     """
     charity_project = await check_project_exists(project_id, session)
-    await check_closed_project(project_id, session)
+    check_closed_project(charity_project)
     if obj_in.name:
         await check_name_duplicate(obj_in.name, session)
     if obj_in.full_amount:
-        await check_new_full_amount(obj_in.full_amount, project_id, session)
-    charity_project = await charity_project_crud.update(
-        charity_project, obj_in, session
-    )
+        check_new_full_amount(obj_in.full_amount, charity_project)
+        if obj_in.full_amount == charity_project.invested_amount:
+            make_close_obj(charity_project)
+    try:
+        charity_project = await charity_project_crud.update(
+            charity_project, obj_in, session
+        )
+    except StaleDataError:
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail=constants.ERR_PROJECT_CHANGED,
+        )
+    except IntegrityError as error:
+        await session.rollback()
+        check_name_unique(error)
+        raise
     return charity_project
 
 
@@ -104,12 +274,19 @@ async def remove_charity_project(
     Доступно только для суперпользователей.
 
     Проверяет существование проекта и отсутствие связанных пожертвований,
-    затем удаляет проект из базы данных.
+    затем удаляет проект из базы данных. Если проект успели изменить
+    параллельно, возвращает 409.
 
     """
     charity_project = await check_project_exists(project_id, session)
-    await check_project_with_donation(project_id, session)
-    charity_project = await charity_project_crud.remove(
-        charity_project, session
-    )
+    check_project_with_donation(charity_project)
+    try:
+        charity_project = await charity_project_crud.remove(
+            charity_project, session
+        )
+    except StaleDataError:
+        raise HTTPException(
+            status_code=HTTPStatus.CONFLICT,
+            detail=constants.ERR_PROJECT_CHANGED,
+        )
     return charity_project
@@ -1,14 +1,29 @@
-from typing import List
+from http import HTTPStatus
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import (APIRouter, Body, Depends, HTTPException, Query,
+                     Request, Response)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api import constants
+from app.api.conditional import not_modified, weak_etag
+from app.api.pagination import add_next_link, page_fields, page_response
+from app.core.config import settings
 from app.core.db import get_async_session
 from app.core.user import current_superuser, current_user
+from app.crud.change_counter import change_counter_crud
 from app.crud.donation import donation_crud
-from app.models import User
-from app.schemas.donation import DonationCreate, DonationDB, UserDonationDB
-from app.services.investing import get_projects_for_donation
+from app.crud.donation_allocation import donation_allocation_crud
+from app.models import CharityProject, Donation, User
+from app.schemas.donation import (DonationCreate, DonationDB, DonationStatus,
+                                  UserDonationDB)
+from app.schemas.donation_allocation import DonationAllocationDB
+from app.schemas.simulation import SimulationCreate, SimulationResult
+from app.services.allocation_queue import allocation_queue
+from app.services.export import ExportFormat, export_response
+from app.services.investing import get_projects_for_donation, invest_many
+from app.services.simulation import simulate
 
 router = APIRouter()
 
@@ -25,28 +40,103 @@ async def create_new_donation(
 ):
     """
     Создает новое пожертвование от текущего пользователя.
-    После создания пожертвования обновляет информацию о связанных проектах.
+    Пожертвование вставляется и распределяется по открытым проектам
+    в одной транзакции. При включенной настройке allocation_queue
+    пожертвование только ставится в очередь фонового распределения,
+    а его состояние отдает `/donation/{donation_id}/status`.
     """
-    new_donation = await donation_crud.create(donation, session, user)
+    new_donation = await donation_crud.create(
+        donation, session, user, commit=False
+    )
+    if settings.allocation_queue:
+        return await allocation_queue.enqueue(new_donation, session)
     donation_after_investing = await get_projects_for_donation(new_donation,
                                                                session)
     return donation_after_investing
 
 
+@router.post(
+    "/batch",
+    response_model=List[DonationDB],
+    response_model_exclude_none=True,
+)
+async def create_donations_batch(
+    donations: List[DonationCreate] = Body(
+        ..., min_items=1, max_items=settings.donation_batch_max_size
+    ),
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Создает пачку пожертвований от текущего пользователя.
+
+    Пожертвования вставляются и распределяются по открытым
+    проектам за один проход в одной транзакции. Возвращает результат
+    распределения для каждого пожертвования в порядке запроса.
+    При включенной настройке allocation_queue пожертвования только
+    ставятся в очередь, чтобы не обогнать уже ожидающие объекты.
+    """
+    new_donations = await donation_crud.create_many(donations, session, user)
+    if settings.allocation_queue:
+        return await allocation_queue.enqueue_many(new_donations, session)
+    return await invest_many(new_donations, CharityProject, session)
+
+
+@router.post(
+    "/simulate",
+    response_model=SimulationResult,
+    dependencies=[Depends(current_user)],
+)
+async def simulate_donation(
+    obj_in: SimulationCreate,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Прогнозирует распределение пожертвования на сумму full_amount
+    по открытым проектам, ничего не записывая в БД.
+
+    """
+    return await simulate(obj_in.full_amount, CharityProject, session)
+
+
 @router.get(
     "/my",
     response_model=List[UserDonationDB],
 )
 async def get_user_donations(
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.page_size, ge=1, le=settings.max_page_size),
+    after_id: int = Query(0, ge=0),
+    fields: Optional[str] = Query(
+        None, description="Поля ответа через запятую, например id,name"
+    ),
     user: User = Depends(current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
-    Получает список всех пожертвований текущего пользователя.
+    Получает страницу пожертвований текущего пользователя в порядке id.
+
+    Ссылка на следующую страницу приходит в заголовке Link.
+    С fields возвращаются только перечисленные поля и id.
+    Слабый ETag строится по версии пожертвований пользователя:
+    если он совпадает с If-None-Match, возвращается 304.
 
     """
-    all_donations = await donation_crud.get_user_donations(user, session)
-    return all_donations
+    columns = page_fields(UserDonationDB, fields)
+    etag = weak_etag(
+        "donation", "user", user.id,
+        await change_counter_crud.get_user_version(user.id, session),
+    )
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    all_donations = await donation_crud.get_user_donations(
+        user, session, limit, after_id, columns
+    )
+    return page_response(
+        request, response, all_donations, limit, columns, etag=etag
+    )
 
 
 @router.get(
@@ -56,13 +146,113 @@ async def get_user_donations(
     response_model=List[DonationDB],
 )
 async def get_all_donations(
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.page_size, ge=1, le=settings.max_page_size),
+    after_id: int = Query(0, ge=0),
+    fields: Optional[str] = Query(
+        None, description="Поля ответа через запятую, например id,name"
+    ),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Получает страницу пожертвований в порядке id.
+
+    Доступно только для суперпользователей. Ссылка на следующую
+    страницу приходит в заголовке Link. С fields возвращаются
+    только перечисленные поля и id. Слабый ETag строится по версии
+    таблицы пожертвований.
+
+    """
+    columns = page_fields(DonationDB, fields)
+    etag = weak_etag(
+        "donation", await change_counter_crud.get_version(Donation, session)
+    )
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    all_donations = await donation_crud.get_multi(
+        session, limit, after_id, columns
+    )
+    return page_response(
+        request, response, all_donations, limit, columns,
+        exclude_none=True, etag=etag,
+    )
+
+
+@router.get(
+    "/export",
+    dependencies=[Depends(current_superuser)],
+    response_class=StreamingResponse,
+)
+async def export_donations(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Выгружает все пожертвования в NDJSON или CSV.
+
+    Доступно только для суперпользователей. Пожертвования читаются
+    и отдаются потоком, порциями по EXPORT_CHUNK_SIZE строк.
+
+    """
+    return export_response(donation_crud, DonationDB, export_format, session)
+
+
+@router.get(
+    "/{donation_id}/status",
+    response_model=DonationStatus,
+)
+async def get_donation_status(
+    donation_id: int,
+    wait: float = Query(0, ge=0, le=settings.allocation_queue_max_wait),
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Получает состояние распределения пожертвования.
+
+    С параметром wait ответ откладывается, пока пожертвование ждет
+    фонового распределения, но не дольше wait секунд. Пользователь
+    видит только свои пожертвования, суперпользователь - любые.
+
+    """
+    donation = await allocation_queue.wait_allocated(
+        lambda: donation_crud.get_user_donation(
+            donation_id, session, None if user.is_superuser else user
+        ),
+        session, wait,
+    )
+    if donation is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail=constants.ERR_DONATION_NOT_FOUND,
+        )
+    return donation
+
+
+@router.get(
+    "/{donation_id}/allocations",
+    response_model=List[DonationAllocationDB],
+)
+async def get_donation_allocations(
+    donation_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.page_size, ge=1, le=settings.max_page_size),
+    after_id: int = Query(0, ge=0),
+    user: User = Depends(current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
     """
-    Получает список всех пожертвований.
+    Получает страницу долей пожертвования по проектам.
 
-    Доступно только для суперпользователей.
+    Пользователь видит только доли своих пожертвований,
+    суперпользователь - любых.
 
     """
-    all_donations = await donation_crud.get_multi(session)
-    return all_donations
+    allocations = await donation_allocation_crud.get_donation_allocations(
+        donation_id, session, limit, after_id,
+        user=None if user.is_superuser else user,
+    )
+    return add_next_link(request, response, allocations, limit)
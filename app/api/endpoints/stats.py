@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_async_session
+from app.core.user import current_superuser
+from app.crud.allocation_state import allocation_state_crud
+from app.schemas.stats import EntityCacheStats, FundStats
+from app.services.entity_cache import entity_cache
+
+router = APIRouter()
+
+
+@router.get("/stats", response_model=FundStats)
+async def get_fund_stats(
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Получает итоги фонда: свободную потребность открытых проектов,
+    нераспределенный остаток пожертвований, сумму всех пожертвований
+    и уже распределенную сумму.
+
+    Суммирует полосы агрегатов, не обходя проекты и пожертвования.
+
+    """
+    totals = await allocation_state_crud.get_totals(session)
+    return FundStats(
+        **totals,
+        invested_total=totals["donated_total"] - totals["pending_balance"],
+    )
+
+
+@router.get(
+    "/stats/cache",
+    response_model=EntityCacheStats,
+    dependencies=[Depends(current_superuser)],
+)
+async def get_entity_cache_stats():
+    """
+    Получает число попаданий и промахов кэша объектов
+    и число записей в нем.
+
+    Доступно только для суперпользователей.
+
+    """
+    return await entity_cache.stats()
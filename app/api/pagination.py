@@ -0,0 +1,78 @@
+from http import HTTPStatus
+from typing import List, Optional
+
+from fastapi import HTTPException, Request, Response
+
+from app.api import constants
+from app.api.responses import RowsResponse
+from app.core.config import settings
+
+
+def add_next_link(
+    request: Request, response: Response, page: List, limit: int
+) -> List:
+    """
+    Добавляет к ответу заголовок Link на следующую страницу.
+
+    Заполненная целиком страница может быть не последней, поэтому
+    ссылка ведет на тот же запрос с after_id последнего объекта.
+    """
+    if page and len(page) == limit:
+        url = request.url.include_query_params(
+            limit=limit, after_id=page[-1].id
+        )
+        response.headers["Link"] = f'<{url}>; rel="next"'
+    return page
+
+
+def fast_read_fields(schema) -> Optional[List[str]]:
+    """
+    Поля схемы для чтения списка кортежами столбцов или None,
+    если быстрое чтение выключено настройкой fast_read.
+    """
+    return list(schema.__fields__) if settings.fast_read else None
+
+
+def page_fields(schema, fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Поля страницы из параметра fields (через запятую) или поля
+    быстрого чтения, если параметр не передан.
+
+    id выбирается всегда: по нему строится ссылка на следующую
+    страницу.
+    """
+    if fields is None:
+        return fast_read_fields(schema)
+    requested = [field.strip() for field in fields.split(",")]
+    unknown = [field for field in requested if field not in schema.__fields__]
+    if unknown:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=constants.ERR_UNKNOWN_FIELDS.format(
+                fields=", ".join(unknown)
+            ),
+        )
+    return list(dict.fromkeys(["id", *requested]))
+
+
+def page_response(
+    request: Request,
+    response: Response,
+    page: List,
+    limit: int,
+    fields: Optional[List[str]] = None,
+    exclude_none: bool = False,
+    etag: Optional[str] = None,
+):
+    """
+    Ответ со страницей списка, ссылкой на следующую и ETag.
+
+    Объекты ORM отдаются FastAPI для проверки response_model,
+    кортежи столбцов полей fields сериализуются сразу в байты JSON.
+    """
+    if fields is not None:
+        response = RowsResponse(fields, page, exclude_none=exclude_none)
+    add_next_link(request, response, page, limit)
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return page if fields is None else response
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+from typing import List, Sequence
+
+from fastapi import Response
+
+
+def encode_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} не сериализуется в JSON")
+
+
+class RowsResponse(Response):
+    """
+    JSON-список объектов, собранный прямо из кортежей столбцов.
+
+    Заменяет для списков проверку каждой строки схемой pydantic
+    с orm_mode: поля берутся в порядке fields, даты сериализуются
+    так же, как в FastAPI. С exclude_none пустые поля опускаются,
+    как при response_model_exclude_none.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        fields: List[str],
+        rows: Sequence[tuple],
+        exclude_none: bool = False,
+        **kwargs,
+    ):
+        self.fields = fields
+        self.exclude_none = exclude_none
+        super().__init__(rows, **kwargs)
+
+    def render(self, rows: Sequence[tuple]) -> bytes:
+        items = [dict(zip(self.fields, row)) for row in rows]
+        if self.exclude_none:
+            items = [
+                {key: value for key, value in item.items()
+                 if value is not None}
+                for item in items
+            ]
+        return json.dumps(
+            items, ensure_ascii=False, separators=(",", ":"),
+            default=encode_default,
+        ).encode("utf-8")
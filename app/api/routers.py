@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 
 from app.api.endpoints import (charity_project_router, donation_router,
-                               google_api_router, user_router)
+                               google_api_router, stats_router, user_router)
 
 main_router = APIRouter()
 main_router.include_router(
@@ -11,4 +11,5 @@ main_router.include_router(donation_router, prefix="/donation",
                            tags=["Donation"])
 main_router.include_router(google_api_router, prefix="/google",
                            tags=["Google"])
+main_router.include_router(stats_router, tags=["Stats"])
 main_router.include_router(user_router)
@@ -1,6 +1,8 @@
 from http import HTTPStatus
+from typing import Optional
 
 from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.charity_project import charity_project_crud
@@ -8,6 +10,11 @@ from app.models import CharityProject
 
 from . import constants
 
+NAME_TABLE = CharityProject.__tablename__
+NAME_UNIQUE_MESSAGE = f"UNIQUE constraint failed: {NAME_TABLE}.name"
+NAME_UNIQUE_CONSTRAINT = f"{NAME_TABLE}_name_key"
+UNIQUE_VIOLATION = "23505"
+
 
 async def check_name_duplicate(
     project_name: str,
@@ -23,6 +30,48 @@ async def check_name_duplicate(
         )
 
 
+def violated_constraint(error: IntegrityError) -> Optional[str]:
+    """
+    Имя ограничения из ошибки PostgreSQL (psycopg2 или asyncpg).
+    """
+    orig = error.orig
+    diag = getattr(orig, "diag", None)
+    return (
+        getattr(diag, "constraint_name", None) or
+        getattr(orig.__cause__, "constraint_name", None)
+    )
+
+
+def is_name_conflict(error: IntegrityError) -> bool:
+    """
+    Нарушено ли ограничение уникальности имени проекта: на SQLite
+    его называет текст ошибки, на PostgreSQL - SQLSTATE 23505
+    и имя ограничения.
+    """
+    orig = error.orig
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(
+        orig, "pgcode", None
+    )
+    if sqlstate is not None:
+        return (
+            sqlstate == UNIQUE_VIOLATION and
+            violated_constraint(error) == NAME_UNIQUE_CONSTRAINT
+        )
+    return NAME_UNIQUE_MESSAGE in str(orig)
+
+
+def check_name_unique(error: IntegrityError) -> None:
+    """
+    Возвращает 400, если запись проекта отклонило ограничение
+    уникальности имени; другие ошибки не обрабатывает.
+    """
+    if is_name_conflict(error):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail=constants.ERR_NAME_DUPLICATE,
+        )
+
+
 async def check_project_exists(
     project_id: int,
     session: AsyncSession,
@@ -36,10 +85,7 @@ async def check_project_exists(
     return project
 
 
-async def check_project_with_donation(
-        project_id: int, session: AsyncSession
-) -> None:
-    project = await charity_project_crud.get(project_id, session)
+def check_project_with_donation(project: CharityProject) -> None:
     if project.invested_amount > 0:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
@@ -47,8 +93,7 @@ async def check_project_with_donation(
         )
 
 
-async def check_closed_project(project_id: int, session: AsyncSession) -> None:
-    project = await charity_project_crud.get(project_id, session)
+def check_closed_project(project: CharityProject) -> None:
     if project.fully_invested:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
@@ -56,10 +101,9 @@ async def check_closed_project(project_id: int, session: AsyncSession) -> None:
         )
 
 
-async def check_new_full_amount(
-    new_full_amount: int, project_id: int, session: AsyncSession
+def check_new_full_amount(
+    new_full_amount: int, project: CharityProject
 ) -> None:
-    project = await charity_project_crud.get(project_id, session)
     if new_full_amount < project.invested_amount:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
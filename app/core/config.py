@@ -1,8 +1,8 @@
 import logging
 
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseSettings, EmailStr
+from pydantic import BaseSettings, EmailStr, validator
 
 
 class Settings(BaseSettings):
@@ -10,6 +10,28 @@ class Settings(BaseSettings):
     app_description: str = "Сервис для поддержки котиков!"
     database_url: str = "sqlite+aiosqlite:///./fastapi.db"
     secret: str = "SECRET"
+    allocation_chunk_size: int = 100
+    allocation_engine: str = "python"
+    allocation_ledger: bool = False
+    allocation_strategy: str = "fifo"
+    allocation_retries: int = 5
+    allocation_retry_delay: float = 0.05
+    allocation_skip_locked: bool = True
+    allocation_queue: bool = False
+    allocation_queue_batch_size: int = 500
+    allocation_queue_flush_interval: float = 0.05
+    allocation_queue_max_wait: float = 30
+    donation_batch_max_size: int = 10000
+    project_batch_max_size: int = 10000
+    page_size: int = 100
+    max_page_size: int = 1000
+    export_chunk_size: int = 1000
+    fast_read: bool = True
+    entity_cache: bool = False
+    entity_cache_size: int = 10000
+    entity_cache_ttl: float = 5
+    entity_cache_path: Optional[str] = None
+    single_flight_routes: List[str] = []
     first_superuser_email: Optional[EmailStr] = None
     first_superuser_password: Optional[str] = None
     type: Optional[str] = None
@@ -27,6 +49,15 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
 
+    @validator("allocation_strategy")
+    def check_allocation_strategy(cls, value, values):
+        if value != "fifo" and not values.get("allocation_ledger"):
+            raise ValueError(
+                "Стратегии, кроме fifo, работают только "
+                "с ALLOCATION_LEDGER=true"
+            )
+        return value
+
 
 settings = Settings()
 
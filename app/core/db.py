@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer
+import contextlib
+
+from sqlalchemy import Column, Integer, event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
 
 from app.core.config import settings
 
+SQLITE_BEGIN = "sqlite_begin"
+SKIP_LOCKED_DIALECTS = ("postgresql",)
+
 
 class PreBase:
 
@@ -16,9 +21,68 @@ class PreBase:
 
 Base = declarative_base(cls=PreBase)
 
+
+def setup_sqlite_transactions(async_engine):
+    """
+    Передает начало транзакций SQLite из драйвера в SQLAlchemy.
+
+    Режим BEGIN берется из опции соединения sqlite_begin, поэтому
+    транзакции распределения начинаются с BEGIN IMMEDIATE и ждут
+    друг друга, а остальные остаются отложенными.
+    """
+    sync_engine = async_engine.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    def disable_driver_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sync_engine, "begin")
+    def begin(conn):
+        mode = conn.get_execution_options().get(SQLITE_BEGIN, "DEFERRED")
+        conn.exec_driver_sql(f"BEGIN {mode}")
+
+
+@contextlib.contextmanager
+def raw_cursor(sync_conn, statement):
+    """
+    Курсор драйвера с выполненным запросом без параметров.
+
+    Строки читаются в обход обработки результатов SQLAlchemy:
+    на сотнях тысяч строк это в несколько раз быстрее.
+    """
+    cursor = sync_conn.connection.cursor()
+    try:
+        cursor.execute(str(statement.compile(dialect=sync_conn.dialect)))
+        yield cursor
+    finally:
+        cursor.close()
+
+
+def skips_locked(dialect) -> bool:
+    """
+    Пропускает ли распределение строки, заблокированные параллельными
+    транзакциями (FOR UPDATE SKIP LOCKED): так бывает на PostgreSQL
+    при settings.allocation_skip_locked. Порядок долей тогда может
+    отличаться от точного FIFO.
+    """
+    return (
+        settings.allocation_skip_locked and
+        dialect.name in SKIP_LOCKED_DIALECTS
+    )
+
+
+def fetch_raw(sync_conn, statement) -> list:
+    with raw_cursor(sync_conn, statement) as cursor:
+        return cursor.fetchall()
+
+
 engine = create_async_engine(settings.database_url)
+if engine.dialect.name == "sqlite":
+    setup_sqlite_transactions(engine)
 
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession)
+AsyncSessionLocal = sessionmaker(
+    engine, class_=AsyncSession, expire_on_commit=False
+)
 
 
 async def get_async_session():
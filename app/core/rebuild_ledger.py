@@ -0,0 +1,254 @@
+"""
+Пересчет распределения и проверка сохраненных сумм.
+
+Проекты и пожертвования читаются в порядке создания, и распределение
+FIFO воспроизводится нарастающими итогами NumPy: k-я единица
+пожертвований попадает в k-ю единицу потребности проектов. Полученное
+состояние сравнивается с invested_amount, fully_invested и close_date
+в БД. Пересчет опирается на текущие full_amount, поэтому после
+изменения суммы закрытого распределения он покажет, каким было бы
+распределение при этой сумме с самого начала.
+
+Пересчет воспроизводит только FIFO и отказывается работать при другой
+стратегии распределения и при пропуске заблокированных строк
+(ALLOCATION_SKIP_LOCKED на PostgreSQL), когда порядок долей может
+отличаться от точного FIFO. Исправления затрагивают проекты
+и пожертвования, но не таблицу долей donationallocation: после --fix
+ее суммы могут расходиться с invested_amount.
+
+Запуск: python -m app.core.rebuild_ledger [--fix]
+"""
+import argparse
+import asyncio
+import json
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import SQLITE_BEGIN, raw_cursor, skips_locked
+from app.core.init_db import get_async_session_context
+from app.crud.allocation_state import allocation_state_crud
+from app.models import CharityProject, Donation
+from app.models.change_counter import record_changes
+
+CHUNK_SIZE = 100000
+COLUMNS = (
+    ("id", np.int64),
+    ("full_amount", np.int64),
+    ("invested_amount", np.int64),
+    ("fully_invested", bool),
+    ("create_date", "datetime64[us]"),
+    ("close_date", "datetime64[us]"),
+)
+FIELDS = ("invested_amount", "fully_invested", "close_date")
+
+
+def read_columns(sync_conn, model, chunk_size: int) -> Dict[str, np.ndarray]:
+    """
+    Читает объекты модели в порядке создания порциями курсора
+    драйвера и собирает столбцы в массивы NumPy. Объекты, ожидающие
+    фонового распределения, пропускаются.
+    """
+    statement = select(
+        *(getattr(model, name) for name, _ in COLUMNS)
+    ).where(~model.waiting()).order_by(model.create_date, model.id)
+    parts = {name: [] for name, _ in COLUMNS}
+    with raw_cursor(sync_conn, statement) as cursor:
+        rows = cursor.fetchmany(chunk_size)
+        while rows:
+            for number, (name, dtype) in enumerate(COLUMNS):
+                parts[name].append(np.array(
+                    [row[number] for row in rows], dtype=dtype
+                ))
+            rows = cursor.fetchmany(chunk_size)
+    return {
+        name: np.concatenate(parts[name]) if parts[name]
+        else np.array([], dtype=dtype)
+        for name, dtype in COLUMNS
+    }
+
+
+def replay_fifo(state: Dict[str, np.ndarray], other: Dict[str, np.ndarray],
+                matched: int) -> Dict[str, np.ndarray]:
+    """
+    Ожидаемое состояние объектов state при сопоставлении matched
+    единиц с объектами other.
+
+    Объект закрывается, когда приходит последняя единица его суммы:
+    в момент создания его самого или объекта other, который ее покрыл.
+    """
+    ends = np.cumsum(state["full_amount"])
+    invested = np.clip(
+        matched - (ends - state["full_amount"]), 0, state["full_amount"]
+    )
+    fully_invested = invested == state["full_amount"]
+    other_ends = np.cumsum(other["full_amount"])
+    covering = np.minimum(
+        np.searchsorted(other_ends, ends), max(len(other_ends) - 1, 0)
+    )
+    close_date = np.full(len(ends), np.datetime64("NaT"), "datetime64[us]")
+    if len(other_ends):
+        close_date[fully_invested] = np.maximum(
+            state["create_date"], other["create_date"][covering]
+        )[fully_invested]
+    return dict(
+        invested_amount=invested,
+        fully_invested=fully_invested,
+        close_date=close_date,
+    )
+
+
+def compare(state, expected) -> Tuple[Dict, Dict]:
+    """
+    Возвращает маски расхождений по полям и исправленное состояние.
+
+    Сохраненная дата закрытия считается верной, если объект закрыт
+    и она не раньше прихода его последней единицы.
+    """
+    stored_close = state["close_date"]
+    close_ok = np.where(
+        expected["fully_invested"],
+        ~np.isnat(stored_close) & (stored_close >= expected["close_date"]),
+        np.isnat(stored_close),
+    )
+    masks = dict(
+        invested_amount=(
+            state["invested_amount"] != expected["invested_amount"]
+        ),
+        fully_invested=state["fully_invested"] != expected["fully_invested"],
+        close_date=~close_ok,
+    )
+    fixed = dict(expected, close_date=np.where(
+        close_ok, stored_close, expected["close_date"]
+    ))
+    return masks, fixed
+
+
+def describe(model, state, masks, fixed) -> List[dict]:
+    mismatches = []
+    for field in FIELDS:
+        rows = np.flatnonzero(masks[field])
+        mismatches.extend(
+            dict(model=model.__name__, id=obj_id, field=field,
+                 stored=stored, expected=expected)
+            for obj_id, stored, expected in zip(
+                state["id"][rows].tolist(),
+                state[field][rows].tolist(),
+                fixed[field][rows].tolist(),
+            )
+        )
+    return mismatches
+
+
+async def apply_fixes(model, state, masks, fixed, session: AsyncSession):
+    """
+    Записывает исправленное состояние расходящихся строк одним
+    UPDATE с executemany и возвращает их число.
+    """
+    rows = np.flatnonzero(np.logical_or.reduce(list(masks.values())))
+    if not len(rows):
+        return 0
+    await session.execute(
+        update(model).where(
+            model.id == bindparam("obj_id")
+        ).values(
+            invested_amount=bindparam("invested"),
+            fully_invested=bindparam("fully"),
+            close_date=bindparam("closed"),
+            version_id=model.version_id + 1,
+        ).execution_options(synchronize_session=False),
+        [
+            dict(obj_id=obj_id, invested=invested, fully=fully,
+                 closed=closed)
+            for obj_id, invested, fully, closed in zip(
+                state["id"][rows].tolist(),
+                fixed["invested_amount"][rows].tolist(),
+                fixed["fully_invested"][rows].tolist(),
+                fixed["close_date"][rows].tolist(),
+            )
+        ],
+    )
+    record_changes(session.sync_session, model)
+    return len(rows)
+
+
+async def rebuild_ledger(
+    session: AsyncSession, fix: bool = False, chunk_size: int = CHUNK_SIZE
+) -> Tuple[List[dict], int]:
+    """
+    Пересчитывает распределение и сравнивает его с БД.
+
+    Возвращает список расхождений и число исправленных строк. При fix
+    строки исправляются в той же транзакции, агрегаты фонда
+    пересчитываются, а версия пула увеличивается, чтобы кэши открытых
+    объектов перечитали его. Доли в donationallocation не меняются.
+
+    Поднимает ValueError, если settings.allocation_strategy не fifo
+    или распределение пропускает заблокированные строки: иначе верные
+    данные выглядели бы расхождениями, а fix переписал бы их под FIFO.
+    """
+    if settings.allocation_strategy != "fifo":
+        raise ValueError(
+            "Пересчет воспроизводит только FIFO, а текущая стратегия "
+            f"распределения - {settings.allocation_strategy}"
+        )
+    if skips_locked(session.get_bind().dialect):
+        raise ValueError(
+            "Пересчет воспроизводит только точный FIFO, а распределение "
+            "пропускает заблокированные строки: отключите "
+            "ALLOCATION_SKIP_LOCKED"
+        )
+    connection = await session.connection(
+        execution_options={SQLITE_BEGIN: "IMMEDIATE"} if fix else {}
+    )
+    states = {
+        model: await connection.run_sync(read_columns, model, chunk_size)
+        for model in (CharityProject, Donation)
+    }
+    projects, donations = states[CharityProject], states[Donation]
+    matched = min(
+        int(projects["full_amount"].sum()), int(donations["full_amount"].sum())
+    )
+    mismatches = []
+    fixed_count = 0
+    for model, state, other in (
+        (CharityProject, projects, donations),
+        (Donation, donations, projects),
+    ):
+        masks, fixed = compare(state, replay_fifo(state, other, matched))
+        mismatches.extend(describe(model, state, masks, fixed))
+        if fix:
+            fixed_count += await apply_fixes(
+                model, state, masks, fixed, session
+            )
+    if fixed_count:
+        await allocation_state_crud.bump_version(session)
+        await allocation_state_crud.recalculate(session)
+    await session.commit()
+    return mismatches, fixed_count
+
+
+async def main(fix: bool, chunk_size: int):
+    async with get_async_session_context() as session:
+        mismatches, fixed_count = await rebuild_ledger(
+            session, fix, chunk_size
+        )
+    for mismatch in mismatches:
+        print(json.dumps(mismatch, default=str))
+    print(json.dumps({"mismatches": len(mismatches), "fixed": fixed_count}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--fix", action="store_true", help="исправить расхождения в БД"
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.fix, args.chunk_size))
+    except ValueError as error:
+        parser.error(str(error))
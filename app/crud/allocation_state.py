@@ -0,0 +1,94 @@
+from typing import Dict
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.models import AllocationState
+from app.models.allocation_state import STATE_ID
+from app.models.fund_aggregate import (COLUMNS, PENDING_KEY, POOL_COLUMNS,
+                                       add_pending, exact_totals,
+                                       pending_deltas, recalculate_statement,
+                                       totals_query)
+
+
+class CRUDAllocationState(CRUDBase):
+
+    async def get_totals(self, session: AsyncSession) -> Dict[str, int]:
+        """
+        Итоги фонда: сумма полос агрегатов и изменений текущей
+        транзакции, которые попадут в полосу только при фиксации.
+        """
+        pending = pending_deltas(session.sync_session)
+        if pending is None:
+            totals = await session.execute(select(*exact_totals().values()))
+            return dict(zip(COLUMNS, totals.one()))
+        totals = await session.execute(totals_query())
+        return {
+            column: total + pending[column]
+            for column, total in zip(COLUMNS, totals.one())
+        }
+
+    async def get_version(self, session: AsyncSession) -> int:
+        version = await session.execute(
+            select(AllocationState.version).where(
+                AllocationState.id == STATE_ID
+            )
+        )
+        return version.scalars().first() or 0
+
+    async def get_pool_balance(self, model, session: AsyncSession) -> int:
+        """
+        Свободная сумма открытых объектов модели по агрегатам фонда.
+        """
+        totals = await self.get_totals(session)
+        return totals[POOL_COLUMNS[model]]
+
+    async def bump_version(self, session: AsyncSession) -> int:
+        """
+        Увеличивает версию пула в текущей транзакции.
+
+        Строка версии остается заблокированной до конца транзакции,
+        поэтому изменения пула, сверяющиеся с версией, не чередуются.
+        """
+        bumped = await session.execute(
+            update(AllocationState).where(
+                AllocationState.id == STATE_ID
+            ).values(version=AllocationState.version + 1)
+        )
+        if bumped.rowcount == 0:
+            session.add(AllocationState(id=STATE_ID, version=1))
+            await session.flush()
+            await self.recalculate(session)
+        return await self.get_version(session)
+
+    async def lock(self, session: AsyncSession) -> None:
+        """
+        Блокирует строку состояния пула до конца транзакции
+        (SELECT ... FOR UPDATE там, где СУБД это поддерживает).
+        """
+        await session.execute(
+            select(AllocationState.id).where(
+                AllocationState.id == STATE_ID
+            ).with_for_update()
+        )
+
+    async def adjust(self, deltas: Dict[str, int], session: AsyncSession):
+        """
+        Учитывает в агрегатах записи, сделанные в обход flush.
+        """
+        add_pending(session.sync_session, deltas)
+
+    async def recalculate(self, session: AsyncSession) -> None:
+        """
+        Пересчитывает агрегаты фонда после записей в обход ORM.
+
+        Итоги пишутся в первую полосу, остальные обнуляются; ранее
+        накопленные изменения транзакции уже учтены пересчетом.
+        """
+        await session.flush()
+        await session.execute(recalculate_statement())
+        session.sync_session.info.pop(PENDING_KEY, None)
+
+
+allocation_state_crud = CRUDAllocationState(AllocationState)
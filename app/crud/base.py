@@ -1,10 +1,19 @@
-from typing import Optional
+from typing import AsyncIterator, List, Optional
 
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import bindparam, insert, inspect, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm.util import identity_key
 
+from app.core.config import settings
 from app.models import User
+from app.models.change_counter import record_changes
+from app.models.fund_aggregate import (POOL_COLUMNS, add_pending,
+                                       changed_deltas, inserted_deltas)
+from app.services.entity_cache import EntityCache, record_written
 
 
 class CRUDBase:
@@ -12,58 +21,349 @@ class CRUDBase:
     Класс для операций CRUD с использованием SQLAlchemy.
     """
 
-    def __init__(self, model):
+    def __init__(self, model, cache: Optional[EntityCache] = None):
         self.model = model
+        self.cache = cache
 
     async def get(
         self,
         obj_id: int,
         session: AsyncSession,
     ):
+        """
+        Объект по id.
+
+        Сессия живет один запрос, и ее identity map служит памятью
+        запроса: объект, уже прочитанный в этом запросе со всеми
+        столбцами, возвращается без SELECT. Иначе с кэшем чтение идет
+        через него (см. EntityCache).
+        """
+        loaded = self.loaded(obj_id, session)
+        if loaded is not None:
+            return loaded
+        if self.cache is None:
+            return await self.read(obj_id, session)
+        return await self.cache.get(
+            self.model, obj_id, session, lambda: self.read(obj_id, session)
+        )
+
+    def loaded(self, obj_id: int, session: AsyncSession):
+        """
+        Объект сессии с этим id или None, если его нет или какие-то
+        его столбцы не загружены (отложены или сброшены).
+        """
+        db_obj = session.identity_map.get(identity_key(self.model, obj_id))
+        if db_obj is None or inspect(db_obj).unloaded:
+            return None
+        return db_obj
+
+    async def read(self, obj_id: int, session: AsyncSession):
         db_obj = await session.execute(
             select(self.model).where(self.model.id == obj_id)
         )
         return db_obj.scalars().first()
 
-    async def get_multi(self, session: AsyncSession):
-        db_objs = await session.execute(select(self.model))
-        return db_objs.scalars().all()
+    async def commit_write(self, db_objs: List, session: AsyncSession):
+        """
+        Фиксирует изменение объектов. Если версия строки разошлась,
+        записи кэша о них сбрасываются сразу: они могли устареть.
+        """
+        try:
+            await session.commit()
+        except StaleDataError:
+            if self.cache is not None and self.cache.enabled:
+                await self.cache.run(self.cache.invalidate_all, [
+                    self.cache.entity_key(
+                        self.model, inspect(db_obj).identity[0]
+                    )
+                    for db_obj in db_objs
+                ])
+            raise
+
+    def page_query(
+        self,
+        limit: Optional[int] = None,
+        after_id: int = 0,
+        *criteria,
+        fields: Optional[List[str]] = None,
+    ):
+        """
+        SELECT страницы объектов с id больше after_id в порядке id.
+
+        Страница начинается поиском по ключу, а не пропуском OFFSET
+        строк, поэтому ее чтение не зависит от глубины. С fields
+        выбираются только эти столбцы.
+        """
+        entities = [self.model] if fields is None else [
+            getattr(self.model, field) for field in fields
+        ]
+        query = select(*entities).where(
+            self.model.id > after_id, *criteria
+        ).order_by(self.model.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    async def read_page(self, query, session: AsyncSession, fields=None):
+        """
+        Выполняет запрос страницы: без fields возвращает объекты ORM,
+        с fields - кортежи столбцов без загрузки в identity map.
+        """
+        page = await session.execute(query)
+        return page.scalars().all() if fields is None else page.all()
+
+    async def get_multi(
+        self,
+        session: AsyncSession,
+        limit: Optional[int] = None,
+        after_id: int = 0,
+        fields: Optional[List[str]] = None,
+    ):
+        return await self.read_page(
+            self.page_query(limit, after_id, fields=fields), session, fields
+        )
+
+    async def stream_columns(
+        self,
+        fields: List[str],
+        session: AsyncSession,
+        chunk_size: int,
+    ) -> AsyncIterator[List[tuple]]:
+        """
+        Отдает значения полей fields всех объектов в порядке id
+        порциями по chunk_size строк из серверного курсора,
+        не создавая объекты ORM.
+        """
+        rows = await session.stream(
+            select(
+                *(getattr(self.model, field) for field in fields)
+            ).order_by(self.model.id)
+        )
+        async for partition in rows.partitions(chunk_size):
+            yield partition
 
     async def create(
             self, obj_in, session: AsyncSession,
-            user: Optional[User] = None
+            user: Optional[User] = None,
+            commit: bool = True,
     ):
+        """
+        Создает объект. При commit=False объект только добавляется
+        в сессию и вставляется вместе с остальными изменениями
+        транзакции.
+        """
         obj_in_data = obj_in.dict()
         if user is not None:
             obj_in_data["user_id"] = user.id
         db_obj = self.model(**obj_in_data)
         session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        if commit:
+            await session.commit()
         return db_obj
 
-    async def update(
-        self,
-        db_obj,
-        obj_in,
-        session: AsyncSession,
+    async def create_many(
+            self, objs_in, session: AsyncSession,
+            user: Optional[User] = None,
+            commit: bool = False,
     ):
+        """
+        Создает объекты. По умолчанию они только добавляются в сессию
+        и вставляются ближайшим flush вместе с остальными изменениями
+        транзакции. При commit=True объекты вставляются многострочными
+        INSERT (см. insert_many) и фиксируются одной транзакцией.
+        """
+        user_data = {} if user is None else {"user_id": user.id}
+        db_objs = [
+            self.model(**obj_in.dict(), **user_data) for obj_in in objs_in
+        ]
+        if not commit:
+            session.add_all(db_objs)
+            return db_objs
+        await self.insert_many(db_objs, session)
+        await session.commit()
+        return db_objs
+
+    def fill_defaults(self, db_obj) -> dict:
+        """
+        Проставляет объекту значения по умолчанию на стороне Python
+        и возвращает значения его столбцов без первичного ключа.
+        Незаданные столбцы явно получают None, чтобы после вставки
+        они не считались истекшими.
+        """
+        row = {}
+        for prop in inspect(self.model).column_attrs:
+            column = prop.columns[0]
+            if column.primary_key:
+                continue
+            value = getattr(db_obj, prop.key)
+            if value is None and column.default is not None:
+                value = (
+                    column.default.arg(None) if column.default.is_callable
+                    else column.default.arg
+                )
+            setattr(db_obj, prop.key, value)
+            row[column.key] = value
+        return row
+
+    async def insert_many(self, db_objs: List, session: AsyncSession):
+        """
+        Вставляет новые объекты многострочными INSERT ... VALUES
+        порциями по settings.allocation_chunk_size строк и добавляет
+        их в сессию как уже сохраненные.
+
+        Flush вставляет каждый объект отдельным INSERT, потому что ORM
+        нужен сгенерированный id каждой строки. Здесь id берутся
+        из RETURNING там, где СУБД его поддерживает, а на SQLite
+        восстанавливаются по lastrowid: строки одной команды получают
+        идущие подряд rowid, пока транзакция держит блокировку записи
+        (BEGIN IMMEDIATE транзакции распределения). Событие after_flush
+        такие вставки не видит, поэтому агрегаты фонда, кэш и счетчики
+        изменений учитывают их здесь.
+        """
+        for db_obj in db_objs:
+            if db_obj in session:
+                session.expunge(db_obj)
+        returning = session.bind.dialect.implicit_returning
+        chunk_size = settings.allocation_chunk_size
+        for start in range(0, len(db_objs), chunk_size):
+            chunk = db_objs[start:start + chunk_size]
+            statement = insert(self.model).values(
+                [self.fill_defaults(db_obj) for db_obj in chunk]
+            )
+            if returning:
+                ids = (await session.execute(
+                    statement.returning(self.model.id)
+                )).scalars().all()
+            else:
+                last_id = (await session.execute(statement)).lastrowid
+                ids = range(last_id - len(chunk) + 1, last_id + 1)
+            for db_obj, obj_id in zip(chunk, ids):
+                db_obj.id = obj_id
+                make_transient_to_detached(db_obj)
+        session.add_all(db_objs)
+        if self.model in POOL_COLUMNS:
+            add_pending(session.sync_session, inserted_deltas(db_objs))
+        record_written(session.sync_session, db_objs, new=True)
+        record_changes(session.sync_session, self.model, db_objs)
+        return db_objs
+
+    @staticmethod
+    def apply_update(db_obj, obj_in) -> None:
         obj_data = jsonable_encoder(db_obj)
         update_data = obj_in.dict(exclude_unset=True)
 
         for field in obj_data:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
+
+    async def update(
+        self,
+        db_obj,
+        obj_in,
+        session: AsyncSession,
+    ):
+        self.apply_update(db_obj, obj_in)
         session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        await self.commit_write([db_obj], session)
         return db_obj
 
+    async def update_many(
+        self,
+        db_objs: List,
+        objs_in: List,
+        session: AsyncSession,
+    ) -> List:
+        """
+        Изменяет каждый объект данными своей схемы из objs_in
+        и фиксирует все изменения одной транзакцией.
+
+        Объекты с одинаковым набором измененных полей записываются
+        одним UPDATE с executemany (у него нет ограничения на число
+        параметров одной команды): flush с версиями строк обновлял бы
+        их по одному. Версии строк сверяются там, где драйвер сообщает
+        число строк executemany. Записи в обход flush учитываются
+        в агрегатах фонда, кэше и счетчиках изменений здесь.
+        """
+        groups = {}
+        for db_obj, obj_in in zip(db_objs, objs_in):
+            self.apply_update(db_obj, obj_in)
+            changes = self.changes(db_obj)
+            if changes:
+                groups.setdefault(tuple(changes), []).append(
+                    (db_obj, changes)
+                )
+        changed = [db_obj for group in groups.values() for db_obj, _ in group]
+        if self.model in POOL_COLUMNS:
+            add_pending(session.sync_session, changed_deltas(changed))
+        record_written(session.sync_session, changed)
+        record_changes(session.sync_session, self.model, changed)
+        for columns, group in groups.items():
+            await self.execute_update(columns, group, session)
+        await self.commit_write(db_objs, session)
+        return db_objs
+
+    def changes(self, db_obj) -> dict:
+        """
+        Измененные, но еще не записанные значения столбцов объекта.
+        """
+        state = inspect(db_obj)
+        return {
+            prop.key: getattr(db_obj, prop.key)
+            for prop in inspect(self.model).column_attrs
+            if state.attrs[prop.key].history.has_changes()
+        }
+
+    async def execute_update(self, columns, group, session: AsyncSession):
+        """
+        Записывает изменения group одним UPDATE с executemany
+        и помечает записанные значения объектов как сохраненные.
+        """
+        version = inspect(self.model).version_id_col
+        statement = update(self.model).where(
+            self.model.id == bindparam("obj_id")
+        ).values({column: bindparam(column) for column in columns})
+        params = [
+            dict(changes, obj_id=db_obj.id) for db_obj, changes in group
+        ]
+        if version is not None:
+            statement = statement.where(
+                version == bindparam("obj_version")
+            ).values({version.key: version + 1})
+            for row, (db_obj, _) in zip(params, group):
+                row["obj_version"] = getattr(db_obj, version.key)
+        updated = await session.execute(
+            statement.execution_options(synchronize_session=False), params
+        )
+        if (
+            version is not None and
+            session.bind.dialect.supports_sane_multi_rowcount and
+            updated.rowcount != len(group)
+        ):
+            raise StaleDataError(
+                f"{self.model.__tablename__}: {len(group)} rows expected "
+                f"to be updated, {updated.rowcount} matched"
+            )
+        for db_obj, changes in group:
+            if version is not None:
+                changes[version.key] = getattr(db_obj, version.key) + 1
+            for key, value in changes.items():
+                set_committed_value(db_obj, key, value)
+
     async def remove(
         self,
         db_obj,
         session: AsyncSession,
     ):
         await session.delete(db_obj)
-        await session.commit()
+        await self.commit_write([db_obj], session)
         return db_obj
+
+    async def remove_many(self, db_objs: List, session: AsyncSession):
+        """
+        Удаляет объекты одной транзакцией: flush удаляет их одним
+        DELETE с executemany, сверяя версии строк.
+        """
+        for db_obj in db_objs:
+            await session.delete(db_obj)
+        await self.commit_write(db_objs, session)
+        return db_objs
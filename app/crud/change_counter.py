@@ -0,0 +1,28 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.models import ChangeCounter
+from app.models.change_counter import user_version_query, version_query
+
+
+class CRUDChangeCounter(CRUDBase):
+
+    async def get_version(self, model, session: AsyncSession) -> int:
+        """
+        Версия таблицы модели: растет при каждой фиксации,
+        изменившей ее строки.
+        """
+        version = await session.execute(version_query(model))
+        return version.scalar_one()
+
+    async def get_user_version(
+        self, user_id: int, session: AsyncSession
+    ) -> int:
+        """
+        Версия пожертвований пользователя.
+        """
+        version = await session.execute(user_version_query(user_id))
+        return version.scalar_one()
+
+
+change_counter_crud = CRUDChangeCounter(ChangeCounter)
@@ -1,32 +1,59 @@
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import select, true
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.crud.allocation_state import allocation_state_crud
 from app.crud.base import CRUDBase
 from app.models import CharityProject
+from app.services.entity_cache import entity_cache
 
 
 class CRUDCharityProject(CRUDBase):
 
+    async def update(self, db_obj, obj_in, session: AsyncSession):
+        await allocation_state_crud.bump_version(session)
+        return await super().update(db_obj, obj_in, session)
+
+    async def remove(self, db_obj, session: AsyncSession):
+        await allocation_state_crud.bump_version(session)
+        return await super().remove(db_obj, session)
+
+    async def update_many(self, db_objs, objs_in, session: AsyncSession):
+        await allocation_state_crud.bump_version(session)
+        return await super().update_many(db_objs, objs_in, session)
+
+    async def remove_many(self, db_objs, session: AsyncSession):
+        await allocation_state_crud.bump_version(session)
+        return await super().remove_many(db_objs, session)
+
     async def get_project_id_by_name(
         self,
         project_name: str,
         session: AsyncSession,
     ) -> Optional[int]:
-        project_id = await session.execute(
-            select(CharityProject.id).where(
-                CharityProject.name == project_name
+        async def read():
+            project_id = await session.execute(
+                select(CharityProject.id).where(
+                    CharityProject.name == project_name
+                )
             )
+            return project_id.scalars().first()
+
+        if self.cache is None:
+            return await read()
+        return await self.cache.lookup(
+            CharityProject, "name", project_name, read
         )
-        return project_id.scalars().first()
 
     async def get_projects_by_completion_rate(
         self,
         session: AsyncSession,
     ) -> list:
         projects = await session.execute(
-            select(CharityProject).where(CharityProject.fully_invested == 1)
+            select(CharityProject).where(
+                CharityProject.fully_invested == true()
+            )
         )
         rated_projects = []
         projects = projects.scalars().all()
@@ -40,4 +67,5 @@ class CRUDCharityProject(CRUDBase):
         return rated_projects
 
 
-charity_project_crud = CRUDCharityProject(CharityProject)
+charity_project_crud = CRUDCharityProject(CharityProject, entity_cache)
+entity_cache.index(CharityProject, "name")
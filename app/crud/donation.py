@@ -1,21 +1,39 @@
-from typing import List
+from typing import List, Optional
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.base import CRUDBase
 from app.models import Donation, User
+from app.services.entity_cache import entity_cache
 
 
 class CRUDDonation(CRUDBase):
 
     async def get_user_donations(
-        self, user: User, session: AsyncSession
+        self, user: User, session: AsyncSession,
+        limit: Optional[int] = None, after_id: int = 0,
+        fields: Optional[List[str]] = None,
     ) -> List[Donation]:
-        donations = await session.execute(
-            select(Donation).where(Donation.user_id == user.id)
-        )
-        return donations.scalars().all()
+        return await self.read_page(self.page_query(
+            limit, after_id, Donation.user_id == user.id, fields=fields
+        ), session, fields)
 
+    async def get_user_donation(
+        self, donation_id: int, session: AsyncSession,
+        user: Optional[User] = None,
+    ) -> Optional[Donation]:
+        """
+        Перечитывает пожертвование из БД. Если передан пользователь,
+        чужое пожертвование не возвращается.
+        """
+        query = select(Donation).where(
+            Donation.id == donation_id
+        ).execution_options(populate_existing=True)
+        if user is not None:
+            query = query.where(Donation.user_id == user.id)
+        donation = await session.execute(query)
+        return donation.scalars().first()
 
-donation_crud = CRUDDonation(Donation)
+
+donation_crud = CRUDDonation(Donation, entity_cache)
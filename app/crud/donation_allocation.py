@@ -0,0 +1,52 @@
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.models import Donation, DonationAllocation, User
+
+
+class CRUDDonationAllocation(CRUDBase):
+
+    def page_query(self, column, obj_id: int, limit: int, after_id: int):
+        return select(DonationAllocation).where(
+            column == obj_id, DonationAllocation.id > after_id
+        ).order_by(DonationAllocation.id).limit(limit)
+
+    async def get_donation_allocations(
+        self,
+        donation_id: int,
+        session: AsyncSession,
+        limit: int,
+        after_id: int = 0,
+        user: Optional[User] = None,
+    ) -> List[DonationAllocation]:
+        """
+        Возвращает страницу долей пожертвования.
+
+        Если передан пользователь, доли чужих пожертвований
+        отфильтровываются в том же запросе.
+        """
+        query = self.page_query(
+            DonationAllocation.donation_id, donation_id, limit, after_id
+        )
+        if user is not None:
+            query = query.join(Donation).where(Donation.user_id == user.id)
+        allocations = await session.execute(query)
+        return allocations.scalars().all()
+
+    async def get_project_allocations(
+        self,
+        project_id: int,
+        session: AsyncSession,
+        limit: int,
+        after_id: int = 0,
+    ) -> List[DonationAllocation]:
+        allocations = await session.execute(self.page_query(
+            DonationAllocation.project_id, project_id, limit, after_id
+        ))
+        return allocations.scalars().all()
+
+
+donation_allocation_crud = CRUDDonationAllocation(DonationAllocation)
@@ -3,12 +3,25 @@ from fastapi import FastAPI
 from app.api.routers import main_router
 from app.core.config import settings
 from app.core.init_db import create_first_superuser
+from app.services.allocation_queue import allocation_queue
+from app.services.ledger import load_ledger
+from app.services.single_flight import SingleFlightMiddleware
 
 app = FastAPI(title=settings.app_title, description=settings.app_description)
 
 app.include_router(main_router)
+app.add_middleware(SingleFlightMiddleware)
 
 
 @app.on_event("startup")
 async def startup():
     await create_first_superuser()
+    if settings.allocation_ledger:
+        await load_ledger()
+    if settings.allocation_queue:
+        allocation_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await allocation_queue.stop()
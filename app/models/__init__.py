@@ -1,3 +1,7 @@
+from .allocation_state import AllocationState  # noqa
+from .change_counter import ChangeCounter, UserChangeCounter  # noqa
 from .charity_project import CharityProject  # noqa
 from .donation import Donation  # noqa
+from .donation_allocation import DonationAllocation  # noqa
+from .fund_aggregate import FundAggregate  # noqa
 from .user import User  # noqa
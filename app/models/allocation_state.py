@@ -0,0 +1,22 @@
+from sqlalchemy import DDL, Column, Integer, event
+
+from app.core.db import Base
+
+STATE_ID = 1
+
+
+class AllocationState(Base):
+    """
+    Единственная строка с состоянием пула открытых объектов.
+
+    Версия увеличивается при каждом изменении пула через кэш
+    распределения или через изменение и удаление проектов. Агрегаты
+    фонда хранятся отдельно, в полосах FundAggregate.
+    """
+
+    version = Column(Integer, nullable=False, default=0)
+
+
+event.listen(AllocationState.__table__, "after_create", DDL(
+    f"INSERT INTO allocationstate (id, version) VALUES ({STATE_ID}, 0)"
+))
@@ -0,0 +1,162 @@
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import DDL, BigInteger, Column, event, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.db import Base
+from app.models.charity_project import CharityProject
+from app.models.donation import Donation
+from app.models.fund_aggregate import STRIPES, session_stripe
+
+TRACKED = {
+    CharityProject: "charityproject",
+    Donation: "donation",
+}
+BULK_COLUMN = "donation_bulk"
+TABLES_KEY = "changed_tables"
+USERS_KEY = "changed_donation_users"
+UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class ChangeCounter(Base):
+    """
+    Полоса счетчиков изменений таблиц проектов и пожертвований.
+
+    Версия таблицы - сумма ее столбца по STRIPES строкам: каждая
+    фиксация, изменившая таблицу, увеличивает полосу своей сессии,
+    поэтому версия только растет, а параллельные транзакции
+    не ждут друг друга на одной строке. donation_bulk считает
+    изменения пожертвований в обход ORM, владельцы которых неизвестны.
+    """
+
+    charityproject = Column(BigInteger, nullable=False, default=0)
+    donation = Column(BigInteger, nullable=False, default=0)
+    donation_bulk = Column(BigInteger, nullable=False, default=0)
+
+
+class UserChangeCounter(Base):
+    """
+    Счетчик изменений пожертвований пользователя; id - id пользователя.
+
+    Строка появляется при первом изменении его пожертвований.
+    """
+
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+event.listen(ChangeCounter.__table__, "after_create", DDL(
+    "INSERT INTO changecounter (id, charityproject, donation, "
+    "donation_bulk) VALUES " + ", ".join(
+        f"({stripe}, 0, 0, 0)" for stripe in range(1, STRIPES + 1)
+    )
+))
+
+
+def version_query(model):
+    """
+    SELECT версии таблицы модели.
+    """
+    return select(func.coalesce(
+        func.sum(getattr(ChangeCounter, TRACKED[model])), 0
+    ))
+
+
+def user_version_query(user_id: int):
+    """
+    SELECT версии пожертвований пользователя: его счетчик
+    плюс изменения пожертвований с неизвестными владельцами.
+    """
+    own = select(UserChangeCounter.version).where(
+        UserChangeCounter.id == user_id
+    ).scalar_subquery()
+    bulk = select(
+        func.sum(getattr(ChangeCounter, BULK_COLUMN))
+    ).scalar_subquery()
+    return select(func.coalesce(own, 0) + func.coalesce(bulk, 0))
+
+
+def bump_statement(stripe: int, columns: Iterable[str]):
+    """
+    UPDATE, увеличивающий счетчики columns в полосе stripe.
+    """
+    return update(ChangeCounter).where(
+        ChangeCounter.id == stripe
+    ).values({
+        column: getattr(ChangeCounter, column) + 1 for column in columns
+    })
+
+
+def bump_users_statement(dialect: str, user_ids: Iterable[int]):
+    """
+    INSERT ... ON CONFLICT, увеличивающий счетчики пользователей.
+
+    id идут по возрастанию, чтобы параллельные транзакции
+    блокировали строки в одном порядке.
+    """
+    statement = UPSERTS[dialect](UserChangeCounter).values([
+        {"id": user_id, "version": 1} for user_id in sorted(user_ids)
+    ])
+    return statement.on_conflict_do_update(
+        index_elements=[UserChangeCounter.id],
+        set_={"version": UserChangeCounter.version + 1},
+    )
+
+
+def record_changes(session: Session, model, objs: Optional[list] = None):
+    """
+    Запоминает, что транзакция изменила таблицу модели.
+
+    Для пожертвований без objs (запись в обход ORM) владельцы
+    неизвестны, и сдвигаются версии всех пользователей.
+    """
+    if model not in TRACKED:
+        return
+    tables: Set[str] = session.info.setdefault(TABLES_KEY, set())
+    tables.add(TRACKED[model])
+    if model is not Donation:
+        return
+    if objs is None:
+        tables.add(BULK_COLUMN)
+        return
+    session.info.setdefault(USERS_KEY, set()).update(
+        obj.user_id for obj in objs if obj.user_id is not None
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def collect_changes(session, flush_context):
+    changed = {}
+    modified = [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in (*session.new, *session.deleted, *modified):
+        if type(obj) in TRACKED:
+            changed.setdefault(type(obj), []).append(obj)
+    for model, objs in changed.items():
+        record_changes(session, model, objs)
+
+
+@event.listens_for(Session, "before_commit")
+def apply_changes(session):
+    """
+    Увеличивает счетчики измененных таблиц и пользователей
+    при фиксации транзакции.
+    """
+    session.flush()
+    tables = session.info.pop(TABLES_KEY, None)
+    users = session.info.pop(USERS_KEY, None)
+    if tables:
+        session.connection().execute(
+            bump_statement(session_stripe(session), tables)
+        )
+    if users:
+        connection = session.connection()
+        connection.execute(
+            bump_users_statement(connection.dialect.name, users)
+        )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def discard_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(TABLES_KEY, None)
+        session.info.pop(USERS_KEY, None)
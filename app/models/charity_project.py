@@ -1,7 +1,10 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text
+from sqlalchemy import (Boolean, Column, DateTime, Index, Integer, String,
+                        Text, false, text, true)
+from sqlalchemy.orm import declared_attr, defer
 
+from app.core.config import settings
 from app.core.db import Base
 
 DEFAULT = 0
@@ -9,14 +12,79 @@ DEFAULT = 0
 
 class ProjectDonation(Base):
     __abstract__ = True
+    text_columns = ()
 
     full_amount = Column(Integer)
     invested_amount = Column(Integer, default=DEFAULT)
     fully_invested = Column(Boolean, default=False)
     create_date = Column(DateTime, default=datetime.now)
     close_date = Column(DateTime)
+    version_id = Column(Integer, nullable=False, default=1)
+    queued = Column(Boolean, nullable=False, default=False)
+
+    @classmethod
+    def waiting(cls):
+        """
+        Условие отбора объектов, ждущих фонового распределения.
+
+        Без режима очереди пометка queued не учитывается: оставшиеся
+        в очереди объекты считаются обычными открытыми и не выпадают
+        из пула.
+        """
+        if settings.allocation_queue:
+            return cls.queued == true()
+        return false()
+
+    @classmethod
+    def defer_text(cls):
+        """
+        Опции запроса, откладывающие неограниченные текстовые столбцы.
+
+        Распределение их не читает; если объект понадобится целиком,
+        следующий полный SELECT догрузит столбцы в тот же объект.
+        """
+        return [defer(getattr(cls, column)) for column in cls.text_columns]
+
+    @declared_attr
+    def __mapper_args__(cls):
+        """
+        Оптимистическая блокировка: UPDATE и DELETE проверяют версию
+        строки и падают с StaleDataError, если ее уже изменили.
+        Значения, сгенерированные СУБД, читаются сразу при вставке
+        (RETURNING там, где он поддерживается).
+        """
+        return {"version_id_col": cls.version_id, "eager_defaults": True}
+
+    @declared_attr
+    def __table_args__(cls):
+        """
+        Индексы очереди открытых объектов: составной для выборок
+        по статусу и частичный только по открытым строкам там,
+        где СУБД это поддерживает. Еще один частичный индекс ведет
+        очередь объектов, ожидающих фонового распределения.
+        """
+        return (
+            Index(
+                f"ix_{cls.__tablename__}_fully_invested_create_date_id",
+                "fully_invested", "create_date", "id",
+            ),
+            Index(
+                f"ix_{cls.__tablename__}_open_create_date_id",
+                "create_date", "id",
+                sqlite_where=text("fully_invested = 0"),
+                postgresql_where=text("NOT fully_invested"),
+            ),
+            Index(
+                f"ix_{cls.__tablename__}_queued_create_date_id",
+                "create_date", "id",
+                sqlite_where=text("queued = 1"),
+                postgresql_where=text("queued"),
+            ),
+        )
 
 
 class CharityProject(ProjectDonation):
+    text_columns = ("description",)
+
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text, nullable=False)
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, ForeignKey, Integer, Text
+from sqlalchemy import Column, ForeignKey, Index, Integer, Text
 
 from app.models.charity_project import ProjectDonation
 
 
 class Donation(ProjectDonation):
+    text_columns = ("comment",)
+
     user_id = Column(Integer, ForeignKey("user.id"))
     comment = Column(Text)
+
+
+Index("ix_donation_user_id_id", Donation.user_id, Donation.id)
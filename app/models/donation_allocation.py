@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+
+from app.core.db import Base
+
+
+class DonationAllocation(Base):
+    """
+    Доля пожертвования, направленная в проект при распределении.
+    """
+
+    donation_id = Column(Integer, ForeignKey("donation.id"), nullable=False)
+    project_id = Column(
+        Integer, ForeignKey("charityproject.id"), nullable=False
+    )
+    amount = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_donationallocation_donation_id_id", "donation_id", "id"),
+        Index("ix_donationallocation_project_id_id", "project_id", "id"),
+    )
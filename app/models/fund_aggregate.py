@@ -0,0 +1,236 @@
+import random
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import (DDL, BigInteger, Column, case, event, false, func,
+                        select, update)
+from sqlalchemy.orm import Session, attributes
+
+from app.core.db import Base
+from app.models.charity_project import CharityProject
+from app.models.donation import Donation
+
+STRIPES = 16
+POOL_COLUMNS = {
+    CharityProject: "open_capacity",
+    Donation: "pending_balance",
+}
+COLUMNS = ("open_capacity", "pending_balance", "donated_total")
+PENDING_KEY = "fund_aggregate_deltas"
+STRIPE_KEY = "fund_aggregate_stripe"
+
+
+class FundAggregate(Base):
+    """
+    Полоса агрегатов фонда: свободная потребность открытых проектов,
+    нераспределенный остаток пожертвований и сумма всех пожертвований.
+
+    Итог - сумма STRIPES строк. Транзакция сдвигает одну полосу,
+    выбранную сессией, и только при фиксации, поэтому параллельные
+    распределения не ждут друг друга на одной горячей строке.
+    """
+
+    open_capacity = Column(BigInteger, nullable=False, default=0)
+    pending_balance = Column(BigInteger, nullable=False, default=0)
+    donated_total = Column(BigInteger, nullable=False, default=0)
+
+
+event.listen(FundAggregate.__table__, "after_create", DDL(
+    "INSERT INTO fundaggregate (id, open_capacity, pending_balance, "
+    "donated_total) VALUES " + ", ".join(
+        f"({stripe}, 0, 0, 0)" for stripe in range(1, STRIPES + 1)
+    )
+))
+
+
+def totals_query():
+    """
+    SELECT итогов фонда по всем полосам.
+    """
+    return select(*(
+        func.coalesce(func.sum(getattr(FundAggregate, column)), 0)
+        for column in COLUMNS
+    ))
+
+
+def adjust_statement(stripe: int, deltas: Dict[str, int]):
+    """
+    UPDATE, сдвигающий полосу stripe на deltas.
+    """
+    return update(FundAggregate).where(
+        FundAggregate.id == stripe
+    ).values({
+        column: getattr(FundAggregate, column) + delta
+        for column, delta in deltas.items()
+    })
+
+
+def exact_totals() -> Dict[str, object]:
+    """
+    Подзапросы итогов фонда по таблицам проектов и пожертвований.
+    """
+    totals = {
+        column: select(func.coalesce(
+            func.sum(model.full_amount - model.invested_amount), 0
+        )).where(model.fully_invested == false()).scalar_subquery()
+        for model, column in POOL_COLUMNS.items()
+    }
+    totals["donated_total"] = select(
+        func.coalesce(func.sum(Donation.full_amount), 0)
+    ).scalar_subquery()
+    return totals
+
+
+def recalculate_statement():
+    """
+    UPDATE, записывающий итоги фонда в первую полосу и обнуляющий
+    остальные.
+    """
+    return update(FundAggregate).values({
+        column: case((FundAggregate.id == 1, total), else_=0)
+        for column, total in exact_totals().items()
+    })
+
+
+def values(obj, key):
+    """
+    Значения атрибута до и после flush; None, если прежнее значение
+    не было загружено.
+    """
+    history = attributes.get_history(obj, key)
+    current = (history.added or history.unchanged or [None])[0]
+    if history.deleted:
+        return history.deleted[0], current
+    if history.added and attributes.instance_state(obj).has_identity:
+        return None, current
+    return current, current
+
+
+def remaining(full_amount: Optional[int], invested_amount: Optional[int]):
+    return (full_amount or 0) - (invested_amount or 0)
+
+
+def add_object(deltas: Counter, obj, sign: int) -> None:
+    deltas[POOL_COLUMNS[type(obj)]] += sign * remaining(
+        obj.full_amount, obj.invested_amount
+    )
+    if isinstance(obj, Donation):
+        deltas["donated_total"] += sign * (obj.full_amount or 0)
+
+
+def add_change(deltas: Counter, obj) -> bool:
+    old_full, new_full = values(obj, "full_amount")
+    old_invested, new_invested = values(obj, "invested_amount")
+    if old_full is None or old_invested is None:
+        return False
+    deltas[POOL_COLUMNS[type(obj)]] += (
+        remaining(new_full, new_invested) - remaining(old_full, old_invested)
+    )
+    if isinstance(obj, Donation):
+        deltas["donated_total"] += new_full - old_full
+    return True
+
+
+def flush_deltas(session: Session) -> Optional[dict]:
+    """
+    Изменения агрегатов фонда от объектов текущего flush.
+
+    Возвращает None, если прежние суммы какого-либо объекта неизвестны
+    и агрегаты нужно пересчитать целиком.
+    """
+    deltas = Counter()
+    for obj in session.new:
+        if type(obj) in POOL_COLUMNS:
+            add_object(deltas, obj, 1)
+    for obj in session.deleted:
+        if type(obj) in POOL_COLUMNS:
+            add_object(deltas, obj, -1)
+    for obj in session.dirty:
+        if (
+            type(obj) in POOL_COLUMNS and session.is_modified(obj) and
+            not add_change(deltas, obj)
+        ):
+            return None
+    return {column: delta for column, delta in deltas.items() if delta}
+
+
+def inserted_deltas(objs) -> dict:
+    """
+    Изменения агрегатов фонда от объектов, вставленных в обход flush.
+    """
+    deltas = Counter()
+    for obj in objs:
+        add_object(deltas, obj, 1)
+    return {column: delta for column, delta in deltas.items() if delta}
+
+
+def changed_deltas(objs) -> Optional[dict]:
+    """
+    Изменения агрегатов фонда от объектов, измененных в обход flush;
+    None, если прежние суммы какого-либо объекта неизвестны.
+    """
+    deltas = Counter()
+    for obj in objs:
+        if not add_change(deltas, obj):
+            return None
+    return {column: delta for column, delta in deltas.items() if delta}
+
+
+def add_pending(session: Session, deltas: Optional[dict]) -> None:
+    """
+    Копит изменения агрегатов до фиксации транзакции.
+
+    None означает, что агрегаты нужно пересчитать целиком.
+    """
+    pending = session.info.get(PENDING_KEY, Counter())
+    if pending is None or deltas is None:
+        session.info[PENDING_KEY] = None
+    else:
+        pending.update(deltas)
+        session.info[PENDING_KEY] = pending
+
+
+def pending_deltas(session: Session) -> Optional[Counter]:
+    return session.info.get(PENDING_KEY, Counter())
+
+
+def session_stripe(session: Session) -> int:
+    """
+    Полоса агрегатов сессии: одна на все ее транзакции, поэтому
+    транзакция блокирует не больше одной строки агрегатов.
+    """
+    return session.info.setdefault(
+        STRIPE_KEY, random.randint(1, STRIPES)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def collect_aggregates(session, flush_context):
+    """
+    Запоминает изменения сумм проектов и пожертвований из flush.
+    """
+    add_pending(session, flush_deltas(session))
+
+
+@event.listens_for(Session, "before_commit")
+def apply_aggregates(session):
+    """
+    Переносит накопленные изменения в полосу агрегатов сессии
+    последним запросом транзакции.
+    """
+    session.flush()
+    pending = session.info.pop(PENDING_KEY, Counter())
+    if pending is None:
+        session.connection().execute(recalculate_statement())
+        return
+    deltas = {column: delta for column, delta in pending.items() if delta}
+    if deltas:
+        session.connection().execute(
+            adjust_statement(session_stripe(session), deltas)
+        )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def discard_aggregates(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
@@ -45,3 +45,19 @@ class DonationDB(UserDonationDB):
     invested_amount: int
     fully_invested: bool
     close_date: Optional[datetime]
+
+
+class DonationStatus(BaseModel):
+    """
+    Состояние распределения пожертвования: queued, пока пожертвование
+    ждет фонового распределения.
+    """
+
+    id: int
+    queued: bool
+    invested_amount: int
+    fully_invested: bool
+    close_date: Optional[datetime]
+
+    class Config:
+        orm_mode = True
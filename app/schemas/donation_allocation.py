@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class DonationAllocationDB(BaseModel):
+    """
+    Модель доли пожертвования, направленной в проект.
+    """
+
+    id: int
+    donation_id: int
+    project_id: int
+    amount: int
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
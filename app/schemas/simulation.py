@@ -0,0 +1,35 @@
+from typing import List
+
+from pydantic import BaseModel, Extra, PositiveInt
+
+
+class SimulationCreate(BaseModel):
+    """
+    Модель запроса пробного распределения: сумма нового объекта.
+    """
+
+    full_amount: PositiveInt
+
+    class Config:
+        extra = Extra.forbid
+
+
+class SimulatedShare(BaseModel):
+    """
+    Доля открытого объекта в пробном распределении.
+    """
+
+    id: int
+    amount: int
+    fully_invested: bool
+
+
+class SimulationResult(BaseModel):
+    """
+    Прогноз распределения нового объекта по открытым объектам.
+    """
+
+    invested_amount: int
+    fully_invested: bool
+    closed_count: int
+    shares: List[SimulatedShare]
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+
+class FundStats(BaseModel):
+    """
+    Итоги фонда по агрегатам распределения.
+    """
+
+    open_capacity: int
+    pending_balance: int
+    donated_total: int
+    invested_total: int
+
+
+class EntityCacheStats(BaseModel):
+    """
+    Счетчики кэша объектов CRUDBase.get и поиска проекта по имени.
+    """
+
+    enabled: bool
+    hits: int
+    misses: int
+    size: int
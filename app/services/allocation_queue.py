@@ -0,0 +1,219 @@
+import asyncio
+import heapq
+from itertools import groupby
+from typing import Awaitable, Callable, List, Optional, Union
+
+from sqlalchemy import select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.config import logger, settings
+from app.core.db import AsyncSessionLocal
+from app.crud.allocation_state import allocation_state_crud
+from app.models import CharityProject, Donation
+from app.services.investing import allocate_targets, begin_allocation
+from app.services.ledger import ledger
+
+SOURCE_MODELS = {CharityProject: Donation, Donation: CharityProject}
+
+
+class AllocationQueue:
+    """
+    Фоновое распределение с групповой фиксацией.
+
+    Эндпоинты создания вставляют объект с queued=True и сразу отвечают.
+    Фоновая задача раз в settings.allocation_queue_flush_interval
+    (или сразу после постановки в очередь) забирает до
+    settings.allocation_queue_batch_size ожидающих проектов
+    и пожертвований в порядке создания и распределяет их одной
+    транзакцией: подряд идущие объекты одной модели обслуживаются
+    одним вызовом движка, а COMMIT выполняется один раз на пачку.
+    Пока объект в очереди, он не входит в пул открытых объектов.
+    Пачки разбираются строго по одной: транзакция пачки блокирует
+    строку allocationstate (на SQLite - BEGIN IMMEDIATE), так что
+    при нескольких процессах порядок FIFO совпадает с синхронным
+    режимом. Остановка задачи распределяет остаток очереди, а если
+    режим очереди выключен при непустой очереди, ее объекты входят
+    в пул как обычные открытые (см. ProjectDonation.waiting).
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.allocated: Optional[asyncio.Event] = None
+        self.stopping = False
+
+    @staticmethod
+    async def read_queued(session: AsyncSession, limit: int) -> List:
+        """
+        Первые limit объектов очереди обеих моделей в порядке создания.
+        """
+        queues = []
+        for number, model in enumerate(SOURCE_MODELS):
+            objs = await session.execute(
+                select(model).options(*model.defer_text()).where(
+                    model.queued == true()
+                ).order_by(model.create_date, model.id).limit(
+                    limit
+                ).execution_options(populate_existing=True)
+            )
+            queues.append([
+                (obj.create_date, number, obj.id, obj)
+                for obj in objs.scalars()
+            ])
+        return [item[-1] for item in heapq.merge(*queues)][:limit]
+
+    async def allocate_batch(self, session: AsyncSession) -> int:
+        """
+        Распределяет одну пачку очереди и возвращает ее размер.
+
+        Если параллельная запись изменила версию затронутой строки,
+        пачка сразу перечитывается и распределяется заново.
+        """
+        for attempt in range(settings.allocation_retries):
+            await begin_allocation(session)
+            await allocation_state_crud.lock(session)
+            targets = await self.read_queued(
+                session, settings.allocation_queue_batch_size
+            )
+            try:
+                for model, run in groupby(targets, type):
+                    run = list(run)
+                    for target in run:
+                        target.queued = False
+                    await session.flush()
+                    await allocate_targets(run, SOURCE_MODELS[model], session)
+                await session.commit()
+                return len(targets)
+            except StaleDataError:
+                await session.rollback()
+                ledger.invalidate()
+                if attempt == settings.allocation_retries - 1:
+                    raise
+            except Exception:
+                ledger.invalidate()
+                raise
+
+    async def drain(self) -> int:
+        """
+        Распределяет очередь пачками, пока она не опустеет.
+
+        Возвращает число распределенных объектов.
+        """
+        total = 0
+        while True:
+            async with self.session_factory() as session:
+                count = await self.allocate_batch(session)
+            total += count
+            if count and self.allocated is not None:
+                self.allocated.set()
+                self.allocated.clear()
+            if count < settings.allocation_queue_batch_size:
+                return total
+
+    async def run(self) -> None:
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(
+                    self.wakeup.wait(),
+                    settings.allocation_queue_flush_interval,
+                )
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Ошибка фонового распределения")
+
+    def start(self) -> None:
+        self.stopping = False
+        self.wakeup = asyncio.Event()
+        self.allocated = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновую задачу, дав ей распределить остаток
+        очереди.
+
+        Задача не отменяется посреди пачки: отмена во время запроса
+        оставила бы соединение пула в неопределенном состоянии.
+        """
+        if self.task is None:
+            return
+        self.stopping = True
+        self.wakeup.set()
+        await self.task
+        self.task = None
+
+    def notify(self) -> None:
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def enqueue(
+        self,
+        target: Union[CharityProject, Donation],
+        session: AsyncSession,
+    ) -> Union[CharityProject, Donation]:
+        await self.enqueue_many([target], session)
+        return target
+
+    async def enqueue_many(
+        self,
+        targets: List[Union[CharityProject, Donation]],
+        session: AsyncSession,
+    ) -> List[Union[CharityProject, Donation]]:
+        """
+        Сохраняет объекты в очереди распределения и будит фоновую задачу.
+
+        Вставка идет в транзакции распределения (BEGIN IMMEDIATE
+        на SQLite): отложенная транзакция, ждущая блокировку записи
+        фоновой задачи, держала бы блокировку чтения, и фиксация пачки
+        ждала бы ее до таймаута.
+        """
+        for target in targets:
+            target.queued = True
+        session.add_all(targets)
+        await begin_allocation(session)
+        await session.commit()
+        self.notify()
+        return targets
+
+    async def wait_allocated(
+        self,
+        read: Callable[[], Awaitable],
+        session: AsyncSession,
+        wait: float,
+    ):
+        """
+        Читает объект функцией read, пока он в очереди, но не дольше
+        wait секунд, и возвращает последнее прочитанное состояние.
+
+        Между чтениями транзакция завершается, чтобы не держать снимок
+        и блокировку чтения. Если фоновая задача работает в этом
+        процессе, ожидание прерывается после каждой ее пачки, иначе
+        объект перечитывается раз в интервал сброса очереди.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        obj = await read()
+        while obj is not None and obj.queued:
+            left = deadline - loop.time()
+            if left <= 0:
+                break
+            await session.commit()
+            timeout = min(left, settings.allocation_queue_flush_interval)
+            if self.allocated is None:
+                await asyncio.sleep(timeout)
+            else:
+                try:
+                    await asyncio.wait_for(self.allocated.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            obj = await read()
+        return obj
+
+
+allocation_queue = AllocationQueue()
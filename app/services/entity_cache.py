@@ -0,0 +1,419 @@
+import asyncio
+import json
+import secrets
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import (Any, Awaitable, Callable, Dict, Iterable, Optional, Set,
+                    Tuple)
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes, make_transient_to_detached
+from sqlalchemy.util import await_fallback
+
+from app.core.config import settings
+
+PENDING_KEY = "entity_cache_invalidations"
+DATETIME_KEY = "__datetime__"
+MISSING = object()
+
+
+def encode_value(value) -> str:
+    """
+    JSON записи общего кэша; datetime хранится строкой ISO 8601.
+    """
+    def default(obj):
+        if isinstance(obj, datetime):
+            return {DATETIME_KEY: obj.isoformat()}
+        raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+    return json.dumps(value, default=default)
+
+
+def decode_value(text: str):
+    def object_hook(obj: dict):
+        if obj.keys() == {DATETIME_KEY}:
+            return datetime.fromisoformat(obj[DATETIME_KEY])
+        return obj
+
+    return json.loads(text, object_hook=object_hook)
+
+
+class MemoryBackend:
+    """
+    Ограниченный LRU-словарь в памяти процесса; записи живут ttl секунд.
+    """
+
+    executor = None
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class SharedBackend:
+    """
+    Кэш в локальном файле SQLite, общий для воркеров одной машины.
+
+    Сброс записи в одном воркере сразу виден остальным. Размер
+    ограничивается вытеснением записей, которые истекают раньше всех.
+    Значения хранятся в JSON: файл пишут другие процессы, и из него
+    читаются только данные. Запросы к файлу EntityCache выполняет
+    в отдельном потоке executor, не блокируя цикл событий.
+    """
+
+    def __init__(self, path: str, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="entity-cache"
+        )
+        self.connection = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entity_cache "
+            "(key TEXT PRIMARY KEY, expires REAL, value TEXT)"
+        )
+
+    def get(self, key: str):
+        """
+        Значение записи; нечитаемая запись считается отсутствующей.
+        """
+        row = self.connection.execute(
+            "SELECT value FROM entity_cache WHERE key = ? AND expires >= ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return decode_value(row[0])
+        except (TypeError, ValueError):
+            return None
+
+    def set(self, key: str, value) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO entity_cache VALUES (?, ?, ?)",
+            (key, time.time() + self.ttl, encode_value(value)),
+        )
+        if secrets.randbelow(100) == 0:
+            self.connection.execute(
+                "DELETE FROM entity_cache WHERE key NOT IN (SELECT key "
+                "FROM entity_cache ORDER BY expires DESC LIMIT ?)",
+                (self.size,),
+            )
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM entity_cache")
+
+    def __len__(self) -> int:
+        return self.connection.execute(
+            "SELECT count(*) FROM entity_cache"
+        ).fetchone()[0]
+
+
+class EntityCache:
+    """
+    Сквозной кэш чтения объектов по id и id по уникальному столбцу.
+
+    Хранятся значения столбцов, а не объекты сессий: при попадании
+    объект собирается заново и присоединяется к сессии без SELECT.
+    Изменения, зафиксированные через ORM, сбрасывают записи после
+    COMMIT; записи в обход ORM сбрасывают все записи модели.
+
+    Каждая запись и каждый сброс помечаются случайной меткой. Чтение
+    из БД запоминает метку до запроса и кладет результат в кэш, только
+    если метка не сменилась, так что результат чтения, начатого
+    до параллельного сброса, в кэш не попадает. Другие воркеры
+    с кэшем в памяти видят чужие изменения не позже чем через
+    settings.entity_cache_ttl секунд (общий бэкенд - сразу), а запись
+    по устаревшему объекту отклоняет проверка version_id: такая
+    ошибка сбрасывает запись (см. CRUDBase.update).
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self.lookups: Dict[type, Tuple[str, ...]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.entity_cache
+
+    def get_backend(self):
+        if self.backend is None:
+            self.backend = (
+                SharedBackend(
+                    settings.entity_cache_path,
+                    settings.entity_cache_size, settings.entity_cache_ttl,
+                ) if settings.entity_cache_path else MemoryBackend(
+                    settings.entity_cache_size, settings.entity_cache_ttl,
+                )
+            )
+        return self.backend
+
+    def reset(self) -> None:
+        """
+        Очищает кэш и счетчики; бэкенд будет создан заново по настройкам.
+        """
+        if self.backend is not None:
+            self.backend.clear()
+            if self.backend.executor is not None:
+                self.backend.executor.shutdown()
+        self.backend = None
+        self.hits = self.misses = 0
+
+    def index(self, model, column: str) -> None:
+        """
+        Регистрирует уникальный столбец, по которому кэшируется id.
+        """
+        self.lookups[model] = self.lookups.get(model, ()) + (column,)
+
+    async def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": await self.run(len, self.get_backend())
+            if self.enabled else 0,
+        }
+
+    async def run(self, method: Callable, *args):
+        """
+        Вызывает метод кэша в потоке бэкенда, если бэкенд работает
+        с файлом, иначе сразу.
+        """
+        executor = self.get_backend().executor
+        if executor is None:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, method, *args
+        )
+
+    @staticmethod
+    def model_key(model) -> str:
+        return f"model:{model.__tablename__}"
+
+    @staticmethod
+    def entity_key(model, obj_id) -> str:
+        return f"{model.__tablename__}:{obj_id}"
+
+    @staticmethod
+    def lookup_key(model, column: str, value) -> str:
+        return f"{model.__tablename__}.{column}:{value!r}"
+
+    def stamp(self, key: str) -> Tuple:
+        backend = self.get_backend()
+        return (
+            backend.get("stamp:" + key),
+            backend.get(self.model_key_of(key)),
+        )
+
+    @staticmethod
+    def model_key_of(key: str) -> str:
+        return "model:" + key.split(":")[0].split(".")[0]
+
+    def read(self, key: str):
+        """
+        Значение записи или MISSING, если записи нет или ее модель
+        сброшена целиком после записи в кэш.
+        """
+        entry = self.get_backend().get(key)
+        if entry is None:
+            return MISSING
+        model_stamp, value = entry
+        if model_stamp != self.get_backend().get(self.model_key_of(key)):
+            return MISSING
+        return value
+
+    def store(self, key: str, stamp: Tuple, value) -> None:
+        if self.stamp(key) == stamp:
+            self.get_backend().set(key, (stamp[1], value))
+
+    def invalidate(self, key: str) -> None:
+        """
+        Сбрасывает запись; ключ модели сбрасывает все ее записи.
+        """
+        backend = self.get_backend()
+        if key.startswith("model:"):
+            backend.set(key, secrets.token_hex(8))
+            return
+        backend.set("stamp:" + key, secrets.token_hex(8))
+        backend.set(key, None)
+
+    def invalidate_all(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.invalidate(key)
+
+    async def cached(
+        self, key: str, load: Callable[[], Awaitable[Any]],
+        encode=None, decode=None,
+    ):
+        """
+        Значение ключа из кэша или функцией load.
+
+        Пустой результат не кэшируется: вставка объекта в другом
+        воркере не сбрасывает кэш в памяти этого воркера, и записанное
+        "не найдено" пропустило бы занятое значение.
+        """
+        value = await self.run(self.read, key)
+        if value is not MISSING:
+            self.hits += 1
+            return value if decode is None else decode(value)
+        self.misses += 1
+        stamp = await self.run(self.stamp, key)
+        result = await load()
+        if result is not None:
+            await self.run(
+                self.store, key, stamp,
+                result if encode is None else encode(result),
+            )
+        return result
+
+    async def get(
+        self, model, obj_id: int, session: AsyncSession,
+        load: Callable[[], Awaitable[Any]],
+    ):
+        """
+        Объект модели по id из кэша или функцией load.
+        """
+        if not self.enabled:
+            return await load()
+        return await self.cached(
+            self.entity_key(model, obj_id), load,
+            encode=entity_values,
+            decode=lambda values: attach(model, values, session),
+        )
+
+    async def lookup(
+        self, model, column: str, value,
+        load: Callable[[], Awaitable[Optional[int]]],
+    ) -> Optional[int]:
+        """
+        id объекта модели по значению уникального столбца или None.
+
+        Кэшируются только найденные id; отсутствие значения
+        каждый раз проверяется в БД.
+        """
+        if not self.enabled:
+            return await load()
+        return await self.cached(self.lookup_key(model, column, value), load)
+
+
+def entity_values(obj) -> dict:
+    return {
+        prop.key: obj.__dict__[prop.key]
+        for prop in inspect(type(obj)).column_attrs
+        if prop.key in obj.__dict__
+    }
+
+
+def attach(model, values: dict, session: AsyncSession):
+    """
+    Собирает объект из значений столбцов и присоединяет его к сессии
+    как загруженный из БД.
+    """
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    session.add(obj)
+    return obj
+
+
+entity_cache = EntityCache()
+
+
+def add_invalidations(session: Session, keys: Set[str]) -> None:
+    session.info.setdefault(PENDING_KEY, set()).update(keys)
+
+
+def lookup_keys(obj, key_of=entity_cache.lookup_key) -> Set[str]:
+    keys = set()
+    for column in entity_cache.lookups.get(type(obj), ()):
+        history = attributes.get_history(obj, column)
+        for value in (
+            *history.added, *history.deleted, *history.unchanged
+        ):
+            keys.add(key_of(type(obj), column, value))
+    return keys
+
+
+def record_written(session: Session, objs, new: bool = False) -> None:
+    """
+    Запоминает записи кэша, которые нужно сбросить после COMMIT.
+
+    У новых объектов сбрасываются только поиски по уникальным
+    столбцам: по id их в кэше еще нет.
+    """
+    if not entity_cache.enabled:
+        return
+    keys = set()
+    for obj in objs:
+        if new:
+            keys |= lookup_keys(obj)
+            continue
+        obj_id = inspect(obj).identity
+        if obj_id is not None:
+            keys.add(entity_cache.entity_key(type(obj), obj_id[0]))
+            keys |= lookup_keys(obj)
+    add_invalidations(session, keys)
+
+
+def record_model_written(session: Session, model) -> None:
+    """
+    Запоминает, что строки модели изменены в обход ORM.
+    """
+    if entity_cache.enabled:
+        add_invalidations(session, {entity_cache.model_key(model)})
+
+
+@event.listens_for(Session, "after_flush")
+def collect_invalidations(session, flush_context):
+    record_written(session, session.new, new=True)
+    record_written(session, list(session.dirty) + list(session.deleted))
+
+
+@event.listens_for(Session, "after_commit")
+def apply_invalidations(session):
+    """
+    Сбрасывает записи после COMMIT. Фиксация AsyncSession идет
+    в greenlet, поэтому запросы к общему кэшу ожидаются, не блокируя
+    цикл событий.
+    """
+    keys = session.info.pop(PENDING_KEY, None)
+    if keys:
+        await_fallback(entity_cache.run(entity_cache.invalidate_all, keys))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def discard_invalidations(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(PENDING_KEY, None)
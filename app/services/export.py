@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, List
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.base import CRUDBase
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def ndjson_chunks(
+    fields: List[str], partitions: AsyncIterator[List[tuple]]
+) -> AsyncIterator[str]:
+    async for rows in partitions:
+        yield "".join(
+            json.dumps(
+                dict(zip(fields, map(encode_value, row))),
+                ensure_ascii=False,
+            ) + "\n"
+            for row in rows
+        )
+
+
+async def csv_chunks(
+    fields: List[str], partitions: AsyncIterator[List[tuple]]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for rows in partitions:
+        writer.writerows(
+            [encode_value(value) for value in row] for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+ENCODERS = {
+    ExportFormat.ndjson: ndjson_chunks,
+    ExportFormat.csv: csv_chunks,
+}
+
+
+def export_response(
+    crud: CRUDBase,
+    schema,
+    export_format: ExportFormat,
+    session: AsyncSession,
+) -> StreamingResponse:
+    """
+    Ответ, выгружающий все объекты модели в формате export_format.
+
+    Строки читаются серверным курсором порциями по
+    settings.export_chunk_size и сразу пишутся в ответ кортежами
+    столбцов схемы, без объектов ORM и проверки pydantic, поэтому
+    память не растет с размером таблицы.
+    """
+    fields = list(schema.__fields__)
+    partitions = crud.stream_columns(
+        fields, session, settings.export_chunk_size
+    )
+    return StreamingResponse(
+        ENCODERS[export_format](fields, partitions),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename={crud.model.__tablename__}."
+                f"{export_format.value}"
+            ),
+        },
+    )
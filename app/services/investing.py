@@ -1,9 +1,21 @@
+import asyncio
 from datetime import datetime
+from typing import List, Union
 
-from sqlalchemy import select
+from sqlalchemy import false, func, insert, inspect, select, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient, object_session
+from sqlalchemy.orm.exc import StaleDataError
 
-from app.models import CharityProject, Donation
+from app.core.config import settings
+from app.core.db import SQLITE_BEGIN, skips_locked
+from app.crud.allocation_state import POOL_COLUMNS, allocation_state_crud
+from app.crud.base import CRUDBase
+from app.models import CharityProject, Donation, DonationAllocation
+from app.models.change_counter import record_changes
+from app.services.entity_cache import record_model_written
+from app.services.ledger import ledger
 
 
 def make_close_obj(obj):
@@ -13,65 +25,456 @@ def make_close_obj(obj):
     return obj
 
 
-async def get_projects_for_donation(
-    donation: Donation, session: AsyncSession
-) -> Donation:
-    projects_for_donation = await session.execute(
-        select(CharityProject).where(CharityProject.fully_invested == 0)
+def open_objects_query(model):
+    """
+    Запрос открытых объектов модели в порядке поступления (FIFO).
+
+    Объекты, ожидающие фонового распределения, в пул не входят.
+    Текстовые столбцы не читаются.
+    """
+    return select(model).options(*model.defer_text()).where(
+        model.fully_invested == false(), ~model.waiting()
+    ).order_by(model.create_date, model.id)
+
+
+SET_BASED_QUEUE = """
+    SELECT id, remaining,
+           CASE WHEN running <= :free THEN remaining
+                ELSE :free - running + remaining END AS share
+    FROM (
+        SELECT id, full_amount - invested_amount AS remaining,
+               SUM(full_amount - invested_amount) OVER (
+                   ORDER BY create_date, id ROWS UNBOUNDED PRECEDING
+               ) AS running
+        FROM {table}
+        WHERE fully_invested = :opened AND NOT (queued AND :queue_mode)
+    ) AS pool
+    WHERE running - remaining < :free
+"""
+
+SET_BASED_RECORD = """
+INSERT INTO donationallocation ({target_column}, {source_column}, amount,
+                                created_at)
+SELECT :target_id, id, share, :now FROM ({queue}) AS queue
+WHERE share > 0
+"""
+
+SET_BASED_UPDATE = """
+UPDATE {table}
+SET invested_amount = {table}.invested_amount + allocation.amount,
+    fully_invested = (
+        {table}.invested_amount + allocation.amount = {table}.full_amount
+    ),
+    close_date = CASE
+        WHEN {table}.invested_amount + allocation.amount = {table}.full_amount
+        THEN :now ELSE {table}.close_date END,
+    version_id = {table}.version_id + 1
+FROM donationallocation AS allocation
+WHERE allocation.{target_column} = :target_id
+  AND allocation.created_at = :now
+  AND allocation.{source_column} = {table}.id
+  AND {table}.fully_invested = :opened
+  AND {table}.full_amount - {table}.invested_amount >= allocation.amount
+"""
+
+ALLOCATION_COLUMNS = {
+    CharityProject: "project_id",
+    Donation: "donation_id",
+}
+
+
+def transfer(target, source, amount: int) -> dict:
+    """
+    Переносит amount между объектами и возвращает строку
+    для таблицы распределений.
+    """
+    for obj in (target, source):
+        obj.invested_amount += amount
+        if obj.invested_amount == obj.full_amount:
+            make_close_obj(obj)
+    return {
+        ALLOCATION_COLUMNS[type(target)]: target.id,
+        ALLOCATION_COLUMNS[type(source)]: source.id,
+        "amount": amount,
+    }
+
+
+async def merge_open(target, targets, source_model, session: AsyncSession,
+                     allocations: list, skip_locked: bool):
+    """
+    Сливает цели с открытыми объектами source_model за один проход
+    как две очереди и дополняет allocations.
+
+    Возвращает цель, которой не хватило открытых объектов, или None.
+    """
+    sources = await session.stream_scalars(
+        open_objects_query(source_model).with_for_update(
+            skip_locked=skip_locked
+        ).execution_options(
+            yield_per=settings.allocation_chunk_size, populate_existing=True
+        )
     )
-    projects_for_donation = projects_for_donation.scalars().all()
-    donation_amount = donation.full_amount
-    for project in projects_for_donation:
-        entering = donation_amount + project.invested_amount
-        if project.full_amount > entering:
-            donation = make_close_obj(donation)
-            project.invested_amount = entering
-            session.add(project)
-            break
-        elif project.full_amount <= entering:
-            donation_amount = entering - project.full_amount
-            project = make_close_obj(project)
-            session.add(project)
-            if donation_amount == 0:
-                donation = make_close_obj(donation)
+    try:
+        async for source in sources:
+            while (
+                target is not None and
+                source.invested_amount < source.full_amount
+            ):
+                allocations.append(transfer(target, source, min(
+                    target.full_amount - target.invested_amount,
+                    source.full_amount - source.invested_amount,
+                )))
+                if target.fully_invested:
+                    target = next(targets, None)
+            session.add(source)
+            if target is None:
                 break
-            else:
-                donation.invested_amount = donation.full_amount
-                - donation_amount
-    session.add(donation)
+    finally:
+        await sources.close()
+    return target
+
+
+async def allocate_in_python(targets, source_model, session: AsyncSession):
+    """
+    Распределяет свободные суммы, перебирая открытые объекты в Python.
+
+    Открытые объекты читаются через курсор порциями
+    по settings.allocation_chunk_size в порядке создания; чтение
+    прекращается, как только свободные суммы целей исчерпаны.
+    На PostgreSQL строки, заблокированные параллельным распределением,
+    пропускаются (FOR UPDATE SKIP LOCKED, см. skips_locked). Если
+    после этого у цели остался остаток, пул читается второй раз
+    с ожиданием блокировок, так что цель не остается недофинансированной
+    при свободных суммах в пуле.
+    """
+    allocations = []
+    targets = iter(targets)
+    skip_locked = skips_locked(session.get_bind().dialect)
+    target = await merge_open(
+        next(targets), targets, source_model, session, allocations,
+        skip_locked,
+    )
+    if target is not None and skip_locked:
+        await session.flush()
+        await merge_open(
+            target, targets, source_model, session, allocations, False
+        )
+    return allocations
+
+
+async def allocate_in_sql(targets, source_model, session: AsyncSession):
+    """
+    Распределяет свободную сумму каждой цели одним UPDATE ... FROM.
+
+    Доли открытых объектов считаются нарастающим итогом остатков
+    (SUM ... OVER в порядке create_date, id) и записываются в таблицу
+    распределений одним INSERT ... SELECT, поэтому число запросов
+    не зависит от количества затронутых объектов. Очередь вычисляется
+    один раз, в INSERT; UPDATE зачисляет доли по только что записанным
+    строкам распределений тем объектам, которые в них названы.
+    Если параллельное изменение закрыло объект или уменьшило его
+    остаток ниже доли, строка не обновляется и поднимается
+    StaleDataError. Обновление идет в обход ORM,
+    поэтому агрегат пула source_model сдвигается явно, а кэш объектов
+    source_model сбрасывается и счетчик изменений таблицы
+    увеличивается при фиксации. Объекты source_model,
+    уже загруженные в сессию, после вызова устаревают.
+    """
+    queue = SET_BASED_QUEUE.format(table=source_model.__tablename__)
+    for target in targets:
+        columns = dict(
+            target_column=ALLOCATION_COLUMNS[type(target)],
+            source_column=ALLOCATION_COLUMNS[source_model],
+        )
+        params = dict(
+            free=target.full_amount - target.invested_amount,
+            now=datetime.now(), opened=False, target_id=target.id,
+            queue_mode=settings.allocation_queue,
+        )
+        recorded = await session.execute(text(
+            SET_BASED_RECORD.format(queue=queue, **columns)
+        ), params)
+        if recorded.rowcount == 0:
+            break
+        updated = await session.execute(text(SET_BASED_UPDATE.format(
+            table=source_model.__tablename__, **columns
+        )), params)
+        record_model_written(session.sync_session, source_model)
+        record_changes(session.sync_session, source_model)
+        if updated.rowcount != recorded.rowcount:
+            raise StaleDataError(
+                f"{source_model.__tablename__}: open rows changed "
+                "during set-based allocation"
+            )
+        invested_amount = await session.scalar(
+            select(func.sum(DonationAllocation.amount)).where(
+                getattr(DonationAllocation, columns["target_column"]) ==
+                target.id
+            )
+        )
+        await allocation_state_crud.adjust(
+            {POOL_COLUMNS[source_model]: target.invested_amount -
+             invested_amount}, session
+        )
+        target.invested_amount = invested_amount
+        if target.invested_amount == target.full_amount:
+            make_close_obj(target)
+    return []
+
+
+async def allocate_from_ledger(targets, source_model, session: AsyncSession):
+    """
+    Распределяет свободные суммы по очередям кэша открытых объектов.
+
+    Порядок задает стратегия settings.allocation_strategy. Из БД
+    читаются только затронутые объекты, поэтому стоимость распределения
+    зависит от их числа, а не от размера пула.
+    """
+    await ledger.acquire(session, targets)
+    allocations = [
+        (target, ledger.take(
+            source_model, target.full_amount - target.invested_amount
+        ))
+        for target in targets
+    ]
+    touched_ids = [
+        obj_id for _, shares in allocations for obj_id, _ in shares
+    ]
+    sources = {}
+    chunk_size = settings.allocation_chunk_size
+    for start in range(0, len(touched_ids), chunk_size):
+        chunk = await session.execute(
+            select(source_model).options(
+                *source_model.defer_text()
+            ).where(
+                source_model.id.in_(touched_ids[start:start + chunk_size])
+            ).execution_options(populate_existing=True)
+        )
+        sources.update((source.id, source) for source in chunk.scalars())
+    records = []
+    for target, shares in allocations:
+        records.extend(
+            transfer(target, sources[obj_id], share)
+            for obj_id, share in shares
+        )
+        if not target.fully_invested:
+            ledger.push(
+                type(target), target,
+                target.full_amount - target.invested_amount,
+            )
+    return records
+
+
+ALLOCATION_ENGINES = {
+    "python": allocate_in_python,
+    "sql": allocate_in_sql,
+}
+
+
+async def load_by_ids(model, ids: List[int], session: AsyncSession):
+    """
+    Загружает объекты по id порциями, обновляя объекты сессии.
+    """
+    chunk_size = settings.allocation_chunk_size
+    objs = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = await session.execute(
+            select(model).options(*model.defer_text()).where(
+                model.id.in_(ids[start:start + chunk_size])
+            ).execution_options(populate_existing=True)
+        )
+        objs.extend(chunk.scalars())
+    return objs
+
+
+async def begin_allocation(session: AsyncSession) -> None:
+    """
+    Фиксирует текущую транзакцию и начинает транзакцию распределения.
+
+    Еще не вставленные объекты сессии переносятся в транзакцию
+    распределения и фиксируются вместе с ним. На SQLite транзакция
+    начинается с BEGIN IMMEDIATE, так что конкурирующие распределения
+    ждут друг друга вместо ошибки блокировки при записи; если БД занята
+    дольше таймаута драйвера, попытка повторяется с экспоненциальной
+    паузой. На PostgreSQL открытые объекты блокируются построчно
+    при чтении.
+    """
+    pending = list(session.new)
+    for obj in pending:
+        session.expunge(obj)
     await session.commit()
-    await session.refresh(donation)
-    return donation
+    for attempt in range(settings.allocation_retries):
+        try:
+            await session.connection(
+                execution_options={SQLITE_BEGIN: "IMMEDIATE"}
+            )
+            session.add_all(pending)
+            return
+        except OperationalError as error:
+            if (
+                "locked" not in str(error) or
+                attempt == settings.allocation_retries - 1
+            ):
+                raise
+            await session.rollback()
+            await asyncio.sleep(settings.allocation_retry_delay * 2 ** attempt)
+
+
+async def allocate_targets(targets, source_model, session: AsyncSession):
+    """
+    Распределяет свободные суммы выбранным движком и записывает доли
+    в таблицу распределений, не фиксируя транзакцию.
+
+    Если агрегаты фонда показывают, что в пуле source_model нет
+    свободных сумм, движок не вызывается и пул не читается. Кэш
+    открытых объектов сам хранит пул в памяти и должен учесть новые
+    цели, поэтому с ним проверка не выполняется.
+    """
+    open_targets = [
+        target for target in targets
+        if target.invested_amount < target.full_amount
+    ]
+    if open_targets and not settings.allocation_ledger:
+        if not await allocation_state_crud.get_pool_balance(
+            source_model, session
+        ):
+            return
+    if not open_targets:
+        return
+    allocate = (
+        allocate_from_ledger if settings.allocation_ledger
+        else ALLOCATION_ENGINES[settings.allocation_engine]
+    )
+    allocations = await allocate(open_targets, source_model, session)
+    if allocations:
+        await session.execute(insert(DonationAllocation), allocations)
+
+
+async def allocate_and_commit(targets, source_model, session: AsyncSession):
+    """
+    Распределяет свободные суммы и фиксирует транзакцию вместе
+    с долями. Кэш открытых объектов сбрасывается, если транзакцию
+    не удалось зафиксировать.
+    """
+    try:
+        await allocate_targets(targets, source_model, session)
+        await session.commit()
+    except Exception:
+        ledger.invalidate()
+        raise
+
+
+ALLOCATED_FIELDS = (
+    "id", "invested_amount", "fully_invested", "close_date", "version_id",
+)
+
+
+def snapshot_new_targets(targets) -> List[dict]:
+    """
+    Запоминает заданные значения новых целей, кроме полей,
+    которые меняет распределение.
+    """
+    return [
+        {
+            prop.key: getattr(target, prop.key)
+            for prop in inspect(type(target)).column_attrs
+            if prop.key not in ALLOCATED_FIELDS
+        }
+        for target in targets
+    ]
+
+
+def reset_new_targets(targets, snapshots: List[dict]) -> None:
+    """
+    Возвращает цели, вставленные в откаченной транзакции,
+    к состоянию до вставки.
+
+    Откат истекает атрибуты сохраненных объектов, поэтому значения
+    восстанавливаются из снимка.
+    """
+    for target, snapshot in zip(targets, snapshots):
+        state = inspect(target)
+        if state.session_id is not None:
+            object_session(target).expunge(target)
+        make_transient(target)
+        for field in ALLOCATED_FIELDS:
+            if field in state.dict:
+                delattr(target, field)
+        for key, value in snapshot.items():
+            setattr(target, key, value)
+
+
+async def invest_many(
+    targets: List[Union[CharityProject, Donation]],
+    source_model,
+    session: AsyncSession,
+) -> List[Union[CharityProject, Donation]]:
+    """
+    Распределяет свободные суммы объектов по открытым объектам
+    source_model в одной транзакции.
+
+    Новые цели вставляются в той же транзакции многострочными INSERT
+    (CRUDBase.insert_many), так что создание и распределение
+    фиксируются одним COMMIT. Цели обслуживаются
+    в переданном порядке, а доли каждого пожертвования в проектах
+    записываются в таблицу распределений одной вставкой. Движок
+    распределения выбирается настройкой allocation_engine, а при
+    включенной настройке allocation_ledger используется кэш открытых
+    объектов. Если параллельная запись
+    изменила версию затронутой строки, распределение сразу
+    повторяется на свежих данных.
+    """
+    if not targets:
+        return targets
+    model = type(targets[0])
+    crud = CRUDBase(model)
+    states = list(map(inspect, targets))
+    persisted_ids = [
+        state.identity[0] for state in states if state.persistent
+    ]
+    new_targets = [
+        target for target, state in zip(targets, states)
+        if not state.persistent
+    ]
+    for target in new_targets:
+        crud.fill_defaults(target)
+    snapshots = snapshot_new_targets(new_targets)
+    for attempt in range(settings.allocation_retries):
+        await begin_allocation(session)
+        await load_by_ids(model, persisted_ids, session)
+        if new_targets:
+            await crud.insert_many(new_targets, session)
+        session.add_all(targets)
+        await session.flush()
+        try:
+            await allocate_and_commit(targets, source_model, session)
+            return targets
+        except StaleDataError:
+            await session.rollback()
+            reset_new_targets(new_targets, snapshots)
+            if attempt == settings.allocation_retries - 1:
+                raise
+
+
+async def invest(
+    target: Union[CharityProject, Donation],
+    source_model,
+    session: AsyncSession,
+) -> Union[CharityProject, Donation]:
+    """
+    Распределяет свободную сумму объекта по открытым объектам source_model.
+    """
+    await invest_many([target], source_model, session)
+    return target
+
+
+async def get_projects_for_donation(
+    donation: Donation, session: AsyncSession
+) -> Donation:
+    return await invest(donation, CharityProject, session)
 
 
 async def get_donations_for_project(
     project: CharityProject, session: AsyncSession
 ) -> CharityProject:
-    donations_for_project = await session.execute(
-        select(Donation).where(Donation.fully_invested == 0)
-    )
-    donations_for_project = donations_for_project.scalars().all()
-    project_amount = project.invested_amount
-    for donation in donations_for_project:
-        free_donation_amount = donation.full_amount - donation.invested_amount
-        new_project_amount = project_amount + free_donation_amount
-        if project.full_amount >= new_project_amount:
-            donation = make_close_obj(donation)
-            project_amount = new_project_amount
-            session.add(donation)
-            if project_amount == project.full_amount:
-                project = make_close_obj(project)
-                break
-            else:
-                project.invested_amount = project_amount
-        elif project.full_amount < new_project_amount:
-            project = make_close_obj(project)
-            donation.invested_amount = donation.full_amount - (
-                new_project_amount - project.full_amount
-            )
-            session.add(donation)
-            break
-    session.add(project)
-    await session.commit()
-    await session.refresh(project)
-    return project
+    return await invest(project, Donation, session)
@@ -0,0 +1,131 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import false, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.init_db import get_async_session_context
+from app.crud.allocation_state import allocation_state_crud
+from app.models import CharityProject, Donation
+from app.services.strategies import STRATEGIES, AllocationStrategy, HeapEntry
+
+
+class OpenPoolLedger:
+    """
+    Кэш открытых проектов и пожертвований в памяти процесса.
+
+    Для каждой модели хранится куча (приоритет, id, остаток), порядок
+    в которой задает стратегия распределения settings.allocation_strategy
+    (по умолчанию FIFO по create_date, id). Кэш помечен версией пула
+    из таблицы allocationstate и перечитывается из БД, если версия
+    разошлась, сменилась стратегия или кэш сброшен после отката
+    транзакции.
+    """
+
+    def __init__(self):
+        self.queues: Dict[type, List[HeapEntry]] = {
+            CharityProject: [],
+            Donation: [],
+        }
+        self.version: Optional[int] = None
+        self.strategy: Optional[AllocationStrategy] = None
+
+    @staticmethod
+    async def read_queue(model, session: AsyncSession) -> List[Tuple]:
+        rows = await session.execute(
+            select(
+                model.id, model.full_amount - model.invested_amount,
+                model.create_date,
+            ).where(
+                model.fully_invested == false(), ~model.waiting(),
+                model.full_amount > model.invested_amount,
+            ).order_by(model.create_date, model.id)
+        )
+        return [tuple(row) for row in rows]
+
+    async def load(self, session: AsyncSession) -> None:
+        self.strategy = STRATEGIES[settings.allocation_strategy]
+        for model in self.queues:
+            queue = [
+                (self.strategy.priority(create_date, remaining),
+                 obj_id, remaining)
+                for obj_id, remaining, create_date
+                in await self.read_queue(model, session)
+            ]
+            heapq.heapify(queue)
+            self.queues[model] = queue
+        self.version = await allocation_state_crud.get_version(session)
+
+    async def acquire(self, session: AsyncSession, targets) -> None:
+        """
+        Увеличивает версию пула в текущей транзакции и перечитывает
+        очереди, если кэш не соответствует предыдущей версии
+        или выбранной стратегии.
+
+        Распределяемые объекты уже сохранены в БД, поэтому после
+        перечитывания они убираются из своей очереди.
+        """
+        version = await allocation_state_crud.bump_version(session)
+        if (
+            self.version != version - 1 or
+            self.strategy is not STRATEGIES[settings.allocation_strategy]
+        ):
+            await self.load(session)
+            target_ids = {target.id for target in targets}
+            queue = [
+                entry for entry in self.queues[type(targets[0])]
+                if entry[1] not in target_ids
+            ]
+            heapq.heapify(queue)
+            self.queues[type(targets[0])] = queue
+        self.version = version
+
+    def invalidate(self) -> None:
+        self.version = None
+
+    def take(self, model, amount: int) -> List[Tuple[int, int]]:
+        """
+        Снимает amount с очереди модели по правилу стратегии.
+
+        Возвращает пары (id, доля) затронутых объектов.
+        """
+        return self.strategy.take(self.queues[model], amount)
+
+    def push(self, model, obj, remaining: int) -> None:
+        heapq.heappush(self.queues[model], (
+            self.strategy.priority(obj.create_date, remaining),
+            obj.id, remaining,
+        ))
+
+    async def check(self, session: AsyncSession) -> List[Tuple]:
+        """
+        Сверяет очереди с БД.
+
+        Возвращает расхождения (модель, id, остаток в кэше, остаток в БД).
+        """
+        mismatches = []
+        for model, queue in self.queues.items():
+            cached = {obj_id: remaining for _, obj_id, remaining in queue}
+            actual = {
+                obj_id: remaining for obj_id, remaining, _
+                in await self.read_queue(model, session)
+            }
+            for obj_id in sorted(cached.keys() | actual.keys()):
+                if cached.get(obj_id) != actual.get(obj_id):
+                    mismatches.append((
+                        model.__name__, obj_id,
+                        cached.get(obj_id), actual.get(obj_id),
+                    ))
+        return mismatches
+
+
+ledger = OpenPoolLedger()
+
+
+async def load_ledger():
+    """
+    Загружает кэш открытых объектов при старте приложения.
+    """
+    async with get_async_session_context() as session:
+        await ledger.load(session)
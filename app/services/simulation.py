@@ -0,0 +1,90 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import List, Tuple
+
+from sqlalchemy import false, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import fetch_raw
+from app.services.strategies import STRATEGIES
+
+
+async def read_open_pool(model, session: AsyncSession) -> Tuple[array, array]:
+    """
+    Читает снимок открытых объектов модели в порядке FIFO
+    как массивы id и остатков, без создания объектов ORM.
+    """
+    connection = await session.connection()
+    rows = await connection.run_sync(fetch_raw, select(
+        model.id, model.full_amount - model.invested_amount
+    ).where(
+        model.fully_invested == false(), ~model.waiting()
+    ).order_by(model.create_date, model.id))
+    return (
+        array("q", [row[0] for row in rows]),
+        array("q", [row[1] for row in rows]),
+    )
+
+
+def take_fifo(ids: array, remaining: array, amount: int) -> List[Tuple]:
+    """
+    Доли FIFO: префикс пула, покрывающий amount, находится бинарным
+    поиском по нарастающему итогу остатков.
+
+    Возвращает тройки (id, доля, остаток до распределения).
+    """
+    running = array("q", accumulate(remaining))
+    cut = bisect_left(running, amount)
+    if cut == len(ids):
+        return list(zip(ids, remaining, remaining))
+    shares = list(zip(ids[:cut], remaining[:cut], remaining[:cut]))
+    shares.append((
+        ids[cut], amount - (running[cut - 1] if cut else 0), remaining[cut]
+    ))
+    return shares
+
+
+def take_by_strategy(ids: array, remaining: array, amount: int):
+    """
+    Доли по стратегии развертывания. Позиция в FIFO-снимке заменяет
+    дату создания, поэтому порядок совпадает с кэшем открытых объектов.
+    """
+    strategy = STRATEGIES[settings.allocation_strategy]
+    heap = [
+        (strategy.priority(position, rest), obj_id, rest)
+        for position, (obj_id, rest) in enumerate(zip(ids, remaining))
+    ]
+    heapq.heapify(heap)
+    rest_by_id = dict(zip(ids, remaining))
+    return [
+        (obj_id, share, rest_by_id[obj_id])
+        for obj_id, share in strategy.take(heap, amount)
+    ]
+
+
+async def simulate(
+    full_amount: int, source_model, session: AsyncSession
+) -> dict:
+    """
+    Прогнозирует распределение нового объекта на сумму full_amount
+    по открытым объектам source_model, ничего не записывая в БД.
+    """
+    ids, remaining = await read_open_pool(source_model, session)
+    if settings.allocation_strategy == "fifo":
+        shares = take_fifo(ids, remaining, full_amount)
+    else:
+        shares = take_by_strategy(ids, remaining, full_amount)
+    shares = [
+        dict(id=obj_id, amount=share, fully_invested=share == rest)
+        for obj_id, share, rest in shares
+    ]
+    invested_amount = sum(share["amount"] for share in shares)
+    return dict(
+        invested_amount=invested_amount,
+        fully_invested=invested_amount == full_amount,
+        closed_count=sum(share["fully_invested"] for share in shares),
+        shares=shares,
+    )
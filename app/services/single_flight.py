@@ -0,0 +1,104 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+from app.core.config import settings
+
+KEY_HEADERS = (b"authorization", b"cookie", b"if-none-match", b"accept")
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные одинаковые вызовы в один.
+
+    Первый вызов с ключом выполняется, остальные, пришедшие до его
+    завершения, ждут и получают тот же результат или ту же ошибку.
+    Если первый вызов отменен, ожидавшие выполняют вызов заново.
+    """
+
+    def __init__(self):
+        self.flights: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable]):
+        while key in self.flights:
+            flight = self.flights[key]
+            try:
+                result = await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                continue
+            self.shared += 1
+            return result
+        flight = asyncio.get_running_loop().create_future()
+        self.flights[key] = flight
+        self.calls += 1
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as error:
+            flight.set_exception(error)
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self.flights[key]
+
+
+def flight_key(scope) -> tuple:
+    """
+    Ключ одинаковых запросов: путь, строка запроса и заголовки,
+    от которых зависит ответ (пользователь, If-None-Match, формат).
+    """
+    headers = tuple(sorted(
+        (name, value) for name, value in scope["headers"]
+        if name in KEY_HEADERS
+    ))
+    return scope["path"], scope["query_string"], headers
+
+
+class SingleFlightMiddleware:
+    """
+    ASGI-прослойка, которая выполняет одновременные одинаковые
+    GET-запросы к путям из settings.single_flight_routes один раз.
+
+    Ответ первого запроса (статус, заголовки и уже сериализованное
+    тело) собирается в память и отдается всем запросам, пришедшим
+    до его завершения, поэтому они делят один запрос к БД и одну
+    сериализацию. Запрос, пришедший во время чтения, может получить
+    ответ, прочитанный до его прихода: путь стоит включать только
+    для списков, где это допустимо, и не для потоковых ответов.
+    """
+
+    def __init__(self, app, flights: Optional[SingleFlight] = None):
+        self.app = app
+        self.flights = flights or single_flight
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http" or scope["method"] != "GET" or
+            scope["path"] not in settings.single_flight_routes
+        ):
+            return await self.app(scope, receive, send)
+        messages = await self.flights.run(
+            flight_key(scope), lambda: self.respond(scope, receive)
+        )
+        for message in messages:
+            await send(message)
+
+    async def respond(self, scope, receive) -> List[dict]:
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await self.app(scope, receive, send)
+        return messages
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,121 @@
+import heapq
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Tuple
+
+HeapEntry = Tuple[object, int, int]
+
+
+class AllocationStrategy(ABC):
+    """
+    Порядок, в котором цель забирает остатки открытых объектов.
+
+    Очередь модели - куча кортежей (приоритет, id, остаток). Цель
+    снимает суммы с вершины кучи, поэтому распределение, затронувшее
+    k объектов, стоит O(k log n).
+    """
+
+    @abstractmethod
+    def priority(self, create_date: datetime, remaining: int):
+        """Приоритет объекта в куче: меньшие значения идут раньше."""
+
+    def requeue(self, priority, remaining: int):
+        """
+        Приоритет вершины кучи после частичного списания.
+
+        Не должен превышать прежний, чтобы вершина оставалась на месте.
+        """
+        return priority
+
+    def take(self, heap: List[HeapEntry], amount: int) -> List[Tuple]:
+        """
+        Снимает amount с вершины кучи.
+
+        Возвращает пары (id, доля) затронутых объектов; объекты
+        с нулевым остатком снимаются с кучи без доли.
+        """
+        shares = []
+        while amount and heap:
+            priority, obj_id, remaining = heap[0]
+            share = min(amount, remaining)
+            if share == remaining:
+                heapq.heappop(heap)
+            else:
+                heap[0] = (
+                    self.requeue(priority, remaining - share),
+                    obj_id, remaining - share,
+                )
+            if share:
+                shares.append((obj_id, share))
+            amount -= share
+        return shares
+
+
+class FifoStrategy(AllocationStrategy):
+    """Сначала самые старые объекты (create_date, id)."""
+
+    def priority(self, create_date, remaining):
+        return create_date
+
+
+class ClosestToGoalStrategy(AllocationStrategy):
+    """
+    Сначала объекты с наименьшим остатком: за то же пожертвование
+    закрывается больше проектов.
+    """
+
+    def priority(self, create_date, remaining):
+        return remaining
+
+    def requeue(self, priority, remaining):
+        return remaining
+
+
+class ProportionalStrategy(FifoStrategy):
+    """
+    Сумма цели делится между всеми открытыми объектами
+    пропорционально их остаткам.
+
+    Затрагивается весь пул, поэтому распределение стоит O(n log n).
+    Единицы, оставшиеся после округления долей вниз, достаются
+    объектам с наибольшей дробной частью доли, при равенстве -
+    более старым.
+    """
+
+    def take(self, heap, amount):
+        total = sum(remaining for _, _, remaining in heap)
+        if amount >= total:
+            shares = [
+                (obj_id, remaining) for _, obj_id, remaining in sorted(heap)
+                if remaining
+            ]
+            heap.clear()
+            return shares
+        exact = [
+            (divmod(amount * entry[2], total), entry) for entry in heap
+        ]
+        leftover = amount - sum(share for (share, _), _ in exact)
+        rounded_up = {
+            entry[1] for _, entry in heapq.nsmallest(
+                leftover, exact,
+                key=lambda item: (-item[0][1], item[1][0], item[1][1]),
+            )
+        }
+        shares = []
+        rest = []
+        for (share, _), (priority, obj_id, remaining) in exact:
+            share += obj_id in rounded_up
+            if share:
+                shares.append((priority, obj_id, share))
+            if share < remaining:
+                rest.append((priority, obj_id, remaining - share))
+        heap[:] = rest
+        heapq.heapify(heap)
+        return [(obj_id, share) for _, obj_id, share in sorted(shares)]
+
+
+STRATEGIES = {
+    "fifo": FifoStrategy(),
+    "closest": ClosestToGoalStrategy(),
+    "proportional": ProportionalStrategy(),
+}
@@ -0,0 +1,119 @@
+"""
+Пропускная способность при непрерывном потоке пожертвований:
+синхронное распределение в запросе против очереди с фоновым
+распределением пачками и групповой фиксацией.
+
+Для каждого режима concurrency клиентов создают пожертвования
+в общей SQLite-базе. Для очереди отдельно замеряются ответы клиентам
+и время, за которое фоновая задача распределила всю очередь.
+
+Запуск: python -m benchmarks.allocation_queue --donations 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from app.core.config import settings
+from app.crud.donation import donation_crud
+from app.models import User
+from app.schemas.donation import DonationCreate
+from app.services.allocation_queue import AllocationQueue
+from app.services.investing import get_projects_for_donation
+from benchmarks.common import make_rows, percentile
+from benchmarks.concurrent_allocation import (check_balance,
+                                              make_session_factory, prepare)
+
+MODES = ("sync", "queue")
+USER = User(id=1)
+
+
+async def run_clients(session_factory, amounts, concurrency, create):
+    """
+    Создает пожертвования concurrency клиентами и возвращает
+    задержки ответов.
+    """
+    amounts = iter(amounts)
+    timings = []
+
+    async def client():
+        for amount in amounts:
+            async with session_factory() as session:
+                started = time.perf_counter()
+                donation = await donation_crud.create(
+                    DonationCreate(full_amount=amount), session, USER,
+                    commit=False,
+                )
+                await create(donation, session)
+                timings.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return timings
+
+
+async def measure(mode, path, amounts, concurrency):
+    engine, session_factory = make_session_factory(path)
+    queue = AllocationQueue(session_factory)
+    settings.allocation_queue = mode == "queue"
+    if settings.allocation_queue:
+        queue.start()
+        create = queue.enqueue
+    else:
+        create = get_projects_for_donation
+    started = time.perf_counter()
+    timings = await run_clients(session_factory, amounts, concurrency, create)
+    acknowledged = time.perf_counter() - started
+    await queue.stop()
+    await queue.drain()
+    allocated = time.perf_counter() - started
+    async with session_factory() as session:
+        problems = await check_balance(session)
+    await engine.dispose()
+    return {
+        "mode": mode,
+        "donations": len(amounts),
+        "acknowledged_per_second": round(len(amounts) / acknowledged, 1),
+        "allocated_per_second": round(len(amounts) / allocated, 1),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "problems": problems,
+    }
+
+
+async def main(modes, donations, projects, concurrency):
+    amounts = [row["full_amount"] for row in make_rows(donations, seed=1)]
+    for mode in modes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "queue.db")
+            await prepare(path, projects)
+            result = await measure(mode, path, amounts, concurrency)
+        print(json.dumps(dict(
+            result,
+            batch_size=settings.allocation_queue_batch_size,
+            flush_interval=settings.allocation_queue_flush_interval,
+        )))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--modes", nargs="+", choices=MODES, default=list(MODES)
+    )
+    parser.add_argument("--donations", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.allocation_queue_batch_size
+    )
+    parser.add_argument(
+        "--flush-interval", type=float,
+        default=settings.allocation_queue_flush_interval,
+    )
+    args = parser.parse_args()
+    settings.allocation_queue_batch_size = args.batch_size
+    settings.allocation_queue_flush_interval = args.flush_interval
+    asyncio.run(main(
+        args.modes, args.donations, args.projects, args.concurrency
+    ))
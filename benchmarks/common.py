@@ -0,0 +1,71 @@
+"""Общие утилиты бенчмарков: временная база данных и генератор данных."""
+import contextlib
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.base import Base
+from app.crud.allocation_state import allocation_state_crud
+
+START_DATE = datetime(2020, 1, 1)
+
+
+@contextlib.asynccontextmanager
+async def temp_database():
+    """
+    Создает SQLite-базу во временном каталоге и отдает фабрику сессий.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            yield sessionmaker(
+                engine, class_=AsyncSession, expire_on_commit=False
+            )
+        finally:
+            await engine.dispose()
+
+
+def make_rows(count, max_amount=1000, seed=0, start=0, **extra):
+    """
+    Генерирует строки открытых объектов со случайной суммой
+    и возрастающей датой создания.
+
+    start сдвигает даты создания, чтобы большой пул можно было
+    генерировать и вставлять порциями.
+    """
+    rng = random.Random(seed + start)
+    return [
+        dict(
+            full_amount=rng.randint(1, max_amount),
+            invested_amount=0,
+            fully_invested=False,
+            create_date=START_DATE + timedelta(seconds=start + number),
+            **extra,
+        )
+        for number in range(count)
+    ]
+
+
+async def seed(session_factory, model, rows):
+    """
+    Вставляет строки одной командой executemany и пересчитывает
+    агрегаты фонда, которые такая вставка обходит.
+    """
+    async with session_factory() as session:
+        await session.execute(insert(model), rows)
+        await allocation_state_crud.recalculate(session)
+        await session.commit()
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
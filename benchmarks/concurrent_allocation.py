@@ -0,0 +1,162 @@
+"""
+Нагрузочный тест конкурентного распределения: несколько процессов
+одновременно создают пожертвования в общей SQLite-базе, после чего
+проверяется, что суммы проектов, пожертвований и долей сходятся.
+
+Запуск: python -m benchmarks.concurrent_allocation --workers 1 2 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import List
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.base import Base
+from app.core.db import setup_sqlite_transactions
+from app.crud.allocation_state import allocation_state_crud
+from app.crud.donation import donation_crud
+from app.models import CharityProject, Donation, DonationAllocation, User
+from app.schemas.donation import DonationCreate
+from app.services.investing import get_projects_for_donation
+from benchmarks.common import make_rows, seed
+
+USER = User(id=1)
+BUSY_TIMEOUT = 60
+
+
+def make_session_factory(path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}",
+        connect_args={"timeout": BUSY_TIMEOUT},
+    )
+    setup_sqlite_transactions(engine)
+    return engine, sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+
+async def prepare(path, projects):
+    engine, session_factory = make_session_factory(path)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await seed(session_factory, CharityProject, [
+        dict(row, name=f"project {number}", description="stress")
+        for number, row in enumerate(make_rows(projects, 5000))
+    ])
+    await engine.dispose()
+
+
+async def donate(path, amounts, concurrency):
+    """
+    Имитирует воркер uvicorn: concurrency клиентов по очереди создают
+    пожертвования, каждый в своей сессии.
+    """
+    engine, session_factory = make_session_factory(path)
+    amounts = iter(amounts)
+
+    async def client():
+        for amount in amounts:
+            async with session_factory() as session:
+                donation = await donation_crud.create(
+                    DonationCreate(full_amount=amount), session, USER,
+                    commit=False,
+                )
+                await get_projects_for_donation(donation, session)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    await engine.dispose()
+
+
+def worker(path, amounts, concurrency):
+    asyncio.run(donate(path, amounts, concurrency))
+
+
+async def check_balance(session: AsyncSession) -> List[str]:
+    """
+    Возвращает нарушения баланса: суммы вне границ, неверный статус,
+    расхождение вложенных сумм с долями в таблице распределений
+    и агрегатов фонда с суммами по таблицам.
+    """
+    problems = []
+    for model, column in (
+        (CharityProject, DonationAllocation.project_id),
+        (Donation, DonationAllocation.donation_id),
+    ):
+        shares = dict((await session.execute(
+            select(column, func.sum(DonationAllocation.amount)).group_by(
+                column
+            )
+        )).all())
+        for obj in (await session.execute(select(model))).scalars():
+            if not 0 <= obj.invested_amount <= obj.full_amount:
+                problems.append(f"{model.__name__} {obj.id}: out of bounds")
+            if obj.fully_invested != (obj.invested_amount == obj.full_amount):
+                problems.append(f"{model.__name__} {obj.id}: wrong status")
+            if obj.invested_amount != shares.get(obj.id, 0):
+                problems.append(f"{model.__name__} {obj.id}: unbalanced")
+    maintained = await allocation_state_crud.get_totals(session)
+    await allocation_state_crud.recalculate(session)
+    if maintained != await allocation_state_crud.get_totals(session):
+        problems.append("fundaggregate: aggregates drifted")
+    await session.rollback()
+    return problems
+
+
+async def verify(path):
+    engine, session_factory = make_session_factory(path)
+    async with session_factory() as session:
+        problems = await check_balance(session)
+    await engine.dispose()
+    return problems
+
+
+def run(workers, donations, projects, concurrency, path):
+    asyncio.run(prepare(path, projects))
+    amounts = [row["full_amount"] for row in make_rows(donations, seed=1)]
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=worker, args=(path, amounts[number::workers], concurrency)
+        )
+        for number in range(workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "workers": workers,
+        "donations": donations,
+        "seconds": round(elapsed, 3),
+        "donations_per_second": round(donations / elapsed, 1),
+        "failed_workers": sum(process.exitcode != 0 for process in processes),
+        "problems": asyncio.run(verify(path)),
+    }
+
+
+def main(workers_counts, donations, projects, concurrency):
+    for workers in workers_counts:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print(json.dumps(run(
+                workers, donations, projects, concurrency,
+                os.path.join(tmp_dir, "stress.db"),
+            )))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--donations", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    main(args.workers, args.donations, args.projects, args.concurrency)
@@ -0,0 +1,76 @@
+"""
+Пропускная способность создания пожертвований: по одному, как в
+POST /donation/, и пачкой, как в POST /donation/batch.
+
+Запуск: python -m benchmarks.donation_batch --donations 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.crud.donation import donation_crud
+from app.models import CharityProject, User
+from app.schemas.donation import DonationCreate
+from app.services.investing import get_projects_for_donation, invest_many
+from benchmarks.common import make_rows, seed, temp_database
+
+USER = User(id=1)
+
+
+def make_projects(count):
+    return [
+        dict(row, name=f"project {number}", description="benchmark")
+        for number, row in enumerate(make_rows(count, max_amount=5000))
+    ]
+
+
+async def create_one_by_one(session_factory, donations):
+    for donation in donations:
+        async with session_factory() as session:
+            new_donation = await donation_crud.create(
+                donation, session, USER, commit=False
+            )
+            await get_projects_for_donation(new_donation, session)
+
+
+async def create_batch(session_factory, donations):
+    async with session_factory() as session:
+        new_donations = await donation_crud.create_many(
+            donations, session, USER
+        )
+        await invest_many(new_donations, CharityProject, session)
+
+
+async def measure(mode, create, projects, donations):
+    async with temp_database() as session_factory:
+        await seed(session_factory, CharityProject, make_projects(projects))
+        started = time.perf_counter()
+        await create(session_factory, donations)
+        elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "donations": len(donations),
+        "seconds": round(elapsed, 3),
+        "donations_per_second": round(len(donations) / elapsed, 1),
+    }
+
+
+async def main(projects, donations_count):
+    donations = [
+        DonationCreate(full_amount=row["full_amount"])
+        for row in make_rows(donations_count, seed=1)
+    ]
+    for mode, create in (
+        ("one_by_one", create_one_by_one),
+        ("batch", create_batch),
+    ):
+        print(json.dumps(await measure(mode, create, projects, donations)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--donations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.projects, args.donations))
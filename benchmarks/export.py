@@ -0,0 +1,71 @@
+"""
+Пиковая память и скорость выгрузки пожертвований
+(GET /donation/export) в зависимости от размера таблицы.
+
+Запуск: python -m benchmarks.export --sizes 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from app.crud.donation import donation_crud
+from app.models import Donation
+from app.schemas.donation import DonationDB
+from app.services.export import ExportFormat, export_response
+from benchmarks.common import make_rows, seed, temp_database
+
+SEED_CHUNK = 100000
+
+
+async def consume(response) -> int:
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+async def measure(rows, export_format):
+    async with temp_database() as session_factory:
+        for start in range(0, rows, SEED_CHUNK):
+            await seed(session_factory, Donation, make_rows(
+                min(SEED_CHUNK, rows - start), start=start, user_id=1
+            ))
+        async with session_factory() as session:
+            tracemalloc.start()
+            started = time.perf_counter()
+            size = await consume(export_response(
+                donation_crud, DonationDB, export_format, session
+            ))
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {
+        "rows": rows,
+        "format": export_format.value,
+        "bytes": size,
+        "rows_per_s": round(rows / elapsed),
+        "peak_mb": round(peak / 2 ** 20, 3),
+    }
+
+
+def run(sizes, formats):
+    return [
+        asyncio.run(measure(rows, export_format))
+        for export_format in formats
+        for rows in sizes
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument(
+        "--formats", nargs="+", default=[fmt.value for fmt in ExportFormat]
+    )
+    args = parser.parse_args()
+    for result in run(args.sizes, [ExportFormat(fmt) for fmt in args.formats]):
+        print(json.dumps(result))
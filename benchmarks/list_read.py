@@ -0,0 +1,113 @@
+"""
+Пропускная способность и память на запрос GET /charity_project/
+при чтении через ORM с проверкой pydantic и при быстром чтении
+кортежей столбцов (настройка fast_read).
+
+Запуск: python -m benchmarks.list_read --projects 10000 --limit 100 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from app.core.config import settings
+from app.core.db import get_async_session
+from app.main import app
+from app.models import CharityProject
+from benchmarks.common import make_rows, seed, temp_database
+
+PATH = "/charity_project/"
+
+
+async def asgi_get(path: str, query: str) -> bytes:
+    """
+    GET-запрос прямо к ASGI-приложению, без сети и HTTP-клиента.
+    """
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app({
+        "type": "http", "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": query.encode(), "headers": [],
+        "server": ("benchmark", 80), "client": ("benchmark", 1),
+    }, receive, send)
+    return b"".join(body)
+
+
+@contextmanager
+def override_session(session_factory):
+    async def get_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = get_session
+    try:
+        yield
+    finally:
+        app.dependency_overrides.pop(get_async_session, None)
+
+
+async def measure(limit, fast_read, requests, traced):
+    settings.fast_read = fast_read
+    query = f"limit={limit}"
+    await asgi_get(PATH, query)
+    started = time.perf_counter()
+    for _ in range(requests):
+        body = await asgi_get(PATH, query)
+    elapsed = time.perf_counter() - started
+    peaks = []
+    for _ in range(traced):
+        tracemalloc.start()
+        await asgi_get(PATH, query)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "path": "fast" if fast_read else "orm",
+        "limit": limit,
+        "bytes": len(body),
+        "requests_per_s": round(requests / elapsed, 1),
+        "peak_kb_per_request": round(min(peaks) / 1024, 1),
+    }
+
+
+async def measure_all(projects, limits, requests, traced):
+    fast_read = settings.fast_read
+    async with temp_database() as session_factory:
+        await seed(session_factory, CharityProject, [
+            dict(row, name=f"project {number}", description="benchmark")
+            for number, row in enumerate(make_rows(projects))
+        ])
+        with override_session(session_factory):
+            try:
+                return [
+                    await measure(limit, mode, requests, traced)
+                    for limit in limits
+                    for mode in (False, True)
+                ]
+            finally:
+                settings.fast_read = fast_read
+
+
+def run(projects, limits, requests, traced=3):
+    return asyncio.run(measure_all(projects, limits, requests, traced))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--limit", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    for result in run(args.projects, args.limit, args.requests):
+        print(json.dumps(result))
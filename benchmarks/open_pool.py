@@ -0,0 +1,55 @@
+"""
+Задержка создания проекта в зависимости от размера пула открытых
+пожертвований.
+
+Запуск: python -m benchmarks.open_pool --sizes 1000 10000 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.models import CharityProject, Donation
+from app.services.investing import get_donations_for_project
+from benchmarks.common import make_rows, percentile, seed, temp_database
+
+PROJECT_AMOUNT = 2000
+
+
+async def measure(pool_size, repeat):
+    async with temp_database() as session_factory:
+        await seed(session_factory, Donation, make_rows(pool_size))
+        timings = []
+        for number in range(repeat):
+            async with session_factory() as session:
+                project = CharityProject(
+                    name=f"project {number}",
+                    description="benchmark",
+                    full_amount=PROJECT_AMOUNT,
+                )
+                session.add(project)
+                await session.commit()
+                await session.refresh(project)
+                started = time.perf_counter()
+                await get_donations_for_project(project, session)
+                timings.append(time.perf_counter() - started)
+    return {
+        "open_pool": pool_size,
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+    }
+
+
+async def main(sizes, repeat):
+    for pool_size in sizes:
+        print(json.dumps(await measure(pool_size, repeat)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
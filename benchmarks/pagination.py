@@ -0,0 +1,78 @@
+"""
+Время чтения страницы списка в зависимости от ее глубины: поиск
+по ключу (limit/after_id, как в GET /donation/) против OFFSET.
+
+Запуск: python -m benchmarks.pagination --rows 1000000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import select
+
+from app.crud.donation import donation_crud
+from app.models import Donation
+from benchmarks.common import make_rows, percentile, seed, temp_database
+
+SEED_CHUNK = 100000
+
+
+async def keyset_page(session, depth, limit):
+    return await donation_crud.get_multi(session, limit, after_id=depth)
+
+
+async def offset_page(session, depth, limit):
+    page = await session.execute(
+        select(Donation).order_by(Donation.id).offset(depth).limit(limit)
+    )
+    return page.scalars().all()
+
+
+METHODS = {"keyset": keyset_page, "offset": offset_page}
+
+
+async def measure(session_factory, method, depth, limit, repeat):
+    timings = []
+    for _ in range(repeat):
+        async with session_factory() as session:
+            started = time.perf_counter()
+            page = await METHODS[method](session, depth, limit)
+            timings.append(time.perf_counter() - started)
+    return {
+        "method": method,
+        "depth": depth,
+        "rows": len(page),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+    }
+
+
+async def measure_all(rows, depths, limit, repeat):
+    async with temp_database() as session_factory:
+        for start in range(0, rows, SEED_CHUNK):
+            await seed(session_factory, Donation, make_rows(
+                min(SEED_CHUNK, rows - start), start=start, user_id=1
+            ))
+        return [
+            await measure(session_factory, method, depth, limit, repeat)
+            for method in METHODS
+            for depth in depths
+        ]
+
+
+def run(rows, depths, limit, repeat):
+    return asyncio.run(measure_all(rows, depths, limit, repeat))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument(
+        "--depths", type=int, nargs="+", default=[0, 10000, 100000, 990000]
+    )
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for result in run(args.rows, args.depths, args.limit, args.repeat):
+        print(json.dumps(result))
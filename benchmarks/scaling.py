@@ -0,0 +1,223 @@
+"""
+Масштабирование распределения: задержка создания пожертвований
+и проектов, число строк, прочитанных за одно распределение, и пиковая
+память процесса в зависимости от размера пула открытых объектов.
+
+Каждая пара (движок, размер пула) измеряется в отдельном процессе
+на копии заранее заполненной SQLite-базы. Результаты печатаются
+построчно в формате JSON и при --output сохраняются в файл, чтобы
+сравнивать их между коммитами.
+
+Запуск: python -m benchmarks.scaling --sizes 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.base import Base
+from app.core.config import settings
+from app.crud.charity_project import charity_project_crud
+from app.crud.donation import donation_crud
+from app.models import CharityProject, Donation, User
+from app.schemas.charity_project import CharityProjectCreate
+from app.schemas.donation import DonationCreate
+from app.services.investing import (get_donations_for_project,
+                                    get_projects_for_donation)
+from app.services.ledger import ledger
+from benchmarks.common import make_rows, percentile, seed
+
+ENGINES = ("python", "sql", "ledger")
+SEED_CHUNK_SIZE = 50000
+USER = User(id=1)
+
+
+def make_session_factory(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    return engine, sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+
+async def prepare(path, pool_size):
+    """
+    Создает базу с пулами из pool_size открытых проектов
+    и пожертвований.
+    """
+    engine, session_factory = make_session_factory(path)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    for start in range(0, pool_size, SEED_CHUNK_SIZE):
+        count = min(SEED_CHUNK_SIZE, pool_size - start)
+        await seed(session_factory, CharityProject, [
+            dict(row, name=f"project {start + number}",
+                 description="benchmark")
+            for number, row in enumerate(make_rows(count, start=start))
+        ])
+        await seed(session_factory, Donation, make_rows(
+            count, seed=1, start=start, user_id=USER.id
+        ))
+    await engine.dispose()
+
+
+def use_engine(engine_name):
+    settings.allocation_ledger = engine_name == "ledger"
+    if not settings.allocation_ledger:
+        settings.allocation_engine = engine_name
+
+
+async def measure(session_factory, operation, create, amount, repeat):
+    """
+    Замеряет создание repeat объектов вместе с распределением
+    и считает объекты, загруженные ORM за время замеров.
+    """
+    loaded = []
+
+    def count_loaded(target, context):
+        loaded.append(target)
+
+    for model in (CharityProject, Donation):
+        event.listen(model, "load", count_loaded)
+    timings = []
+    try:
+        for number in range(repeat):
+            async with session_factory() as session:
+                started = time.perf_counter()
+                await create(session, number, amount)
+                timings.append(time.perf_counter() - started)
+    finally:
+        for model in (CharityProject, Donation):
+            event.remove(model, "load", count_loaded)
+    return {
+        "operation": operation,
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "rows_fetched_per_allocation": round(len(loaded) / repeat, 1),
+    }
+
+
+async def create_donation(session, number, amount):
+    donation = await donation_crud.create(
+        DonationCreate(full_amount=amount), session, USER, commit=False
+    )
+    await get_projects_for_donation(donation, session)
+
+
+async def create_project(session, number, amount):
+    project = await charity_project_crud.create(CharityProjectCreate(
+        name=f"new project {number}", description="benchmark",
+        full_amount=amount,
+    ), session, commit=False)
+    await get_donations_for_project(project, session)
+
+
+async def run_engine(path, engine_name, amount, repeat):
+    use_engine(engine_name)
+    engine, session_factory = make_session_factory(path)
+    if settings.allocation_ledger:
+        async with session_factory() as session:
+            await ledger.load(session)
+    results = [
+        await measure(session_factory, operation, create, amount, repeat)
+        for operation, create in (
+            ("donation", create_donation),
+            ("project", create_project),
+        )
+    ]
+    await engine.dispose()
+    return results
+
+
+def peak_rss_mb():
+    """
+    Пиковая резидентная память процесса.
+
+    ru_maxrss наследуется через exec от родителя, заполнявшего базу,
+    поэтому на Linux берется VmHWM адресного пространства процесса.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def worker(path, engine_name, amount, repeat):
+    results = asyncio.run(run_engine(path, engine_name, amount, repeat))
+    peak = peak_rss_mb()
+    return [dict(result, peak_rss_mb=peak) for result in results]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, engines, amount, repeat):
+    """
+    Возвращает результаты замеров для каждого движка и размера пула.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pool_size in sizes:
+            seeded = os.path.join(tmp_dir, f"pool_{pool_size}.db")
+            asyncio.run(prepare(seeded, pool_size))
+            for engine_name in engines:
+                path = os.path.join(tmp_dir, f"{engine_name}.db")
+                shutil.copy(seeded, path)
+                with context.Pool(1) as pool:
+                    measured = pool.apply(
+                        worker, (path, engine_name, amount, repeat)
+                    )
+                results.extend(
+                    dict(engine=engine_name, open_pool=pool_size, **result)
+                    for result in measured
+                )
+            os.remove(seeded)
+    return results
+
+
+def main(sizes, engines, amount, repeat, output):
+    results = run(sizes, engines, amount, repeat)
+    for result in results:
+        print(json.dumps(result))
+    if output:
+        with open(output, "w") as file:
+            json.dump(
+                {"commit": current_commit(), "results": results},
+                file, indent=2,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument(
+        "--engines", nargs="+", choices=ENGINES, default=list(ENGINES)
+    )
+    parser.add_argument("--amount", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    main(args.sizes, args.engines, args.amount, args.repeat, args.output)
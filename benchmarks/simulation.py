@@ -0,0 +1,54 @@
+"""
+Задержка пробного распределения в зависимости от размера пула
+открытых проектов.
+
+Запуск: python -m benchmarks.simulation --sizes 10000 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.models import CharityProject
+from app.services.simulation import simulate
+from benchmarks.common import make_rows, percentile, seed, temp_database
+
+
+def make_projects(count):
+    return [
+        dict(row, name=f"project {number}", description="benchmark")
+        for number, row in enumerate(make_rows(count))
+    ]
+
+
+async def measure(pool_size, amount, repeat):
+    async with temp_database() as session_factory:
+        await seed(session_factory, CharityProject, make_projects(pool_size))
+        timings = []
+        for _ in range(repeat):
+            async with session_factory() as session:
+                started = time.perf_counter()
+                result = await simulate(amount, CharityProject, session)
+                timings.append(time.perf_counter() - started)
+    return {
+        "open_pool": pool_size,
+        "shares": len(result["shares"]),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+    }
+
+
+async def main(sizes, amount, repeat):
+    for pool_size in sizes:
+        print(json.dumps(await measure(pool_size, amount, repeat)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000]
+    )
+    parser.add_argument("--amount", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.amount, args.repeat))
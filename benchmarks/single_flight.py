@@ -0,0 +1,85 @@
+"""
+Пропускная способность и число запросов к БД для GET /charity_project/
+под волнами одинаковых одновременных запросов: каждый запрос
+выполняется сам или одинаковые запросы объединяются (single flight).
+
+Запуск: python -m benchmarks.single_flight --concurrency 1 10 100
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.models import CharityProject
+from app.services.single_flight import single_flight
+from benchmarks.common import make_rows, seed, temp_database
+from benchmarks.list_read import PATH, asgi_get, override_session
+
+
+async def measure(concurrency, coalesced, rounds, limit, queries):
+    settings.single_flight_routes = [PATH] if coalesced else []
+    query = f"limit={limit}"
+    await asgi_get(PATH, query)
+    queries.clear()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        bodies = await asyncio.gather(*(
+            asgi_get(PATH, query) for _ in range(concurrency)
+        ))
+    elapsed = time.perf_counter() - started
+    requests = rounds * concurrency
+    return {
+        "mode": "single_flight" if coalesced else "direct",
+        "concurrency": concurrency,
+        "identical": len(set(bodies)) == 1,
+        "requests_per_s": round(requests / elapsed, 1),
+        "queries_per_request": round(len(queries) / requests, 2),
+    }
+
+
+async def measure_all(projects, levels, rounds, limit):
+    routes = settings.single_flight_routes
+    async with temp_database() as session_factory:
+        await seed(session_factory, CharityProject, [
+            dict(row, name=f"project {number}", description="benchmark")
+            for number, row in enumerate(make_rows(projects))
+        ])
+        queries = []
+        engine = session_factory.kw["bind"].sync_engine
+
+        def count_query(conn, cursor, statement, *args):
+            queries.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count_query)
+        with override_session(session_factory):
+            try:
+                return [
+                    await measure(level, coalesced, rounds, limit, queries)
+                    for level in levels
+                    for coalesced in (False, True)
+                ]
+            finally:
+                settings.single_flight_routes = routes
+                event.remove(engine, "before_cursor_execute", count_query)
+
+
+def run(projects, levels, rounds, limit=100):
+    single_flight.calls = single_flight.shared = 0
+    return asyncio.run(measure_all(projects, levels, rounds, limit))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 10, 100]
+    )
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+    for result in run(args.projects, args.concurrency, args.rounds,
+                      args.limit):
+        print(json.dumps(result))
@@ -0,0 +1,106 @@
+"""
+Пропускная способность стратегий распределения: создание пожертвований
+через кэш открытых объектов и списание с кучи в памяти без БД.
+
+Запуск: python -m benchmarks.strategies --projects 10000 --donations 500
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import time
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.crud.donation import donation_crud
+from app.models import CharityProject, DonationAllocation, User
+from app.schemas.donation import DonationCreate
+from app.services.investing import get_projects_for_donation
+from app.services.ledger import ledger
+from app.services.strategies import STRATEGIES
+from benchmarks.common import make_rows, seed, temp_database
+
+USER = User(id=1)
+
+
+def make_projects(count):
+    return [
+        dict(row, name=f"project {number}", description="benchmark")
+        for number, row in enumerate(make_rows(count, max_amount=5000))
+    ]
+
+
+async def measure_allocation(strategy_name, projects, amounts):
+    settings.allocation_strategy = strategy_name
+    ledger.invalidate()
+    async with temp_database() as session_factory:
+        await seed(session_factory, CharityProject, make_projects(projects))
+        started = time.perf_counter()
+        for amount in amounts:
+            async with session_factory() as session:
+                donation = await donation_crud.create(
+                    DonationCreate(full_amount=amount), session, USER,
+                    commit=False,
+                )
+                await get_projects_for_donation(donation, session)
+        elapsed = time.perf_counter() - started
+        async with session_factory() as session:
+            closed = await session.scalar(
+                select(func.count(CharityProject.id)).where(
+                    CharityProject.fully_invested
+                )
+            )
+            allocations = await session.scalar(
+                select(func.count(DonationAllocation.id))
+            )
+    return {
+        "donations_per_second": round(len(amounts) / elapsed, 1),
+        "allocations_per_donation": round(allocations / len(amounts), 2),
+        "closed_projects": closed,
+    }
+
+
+def measure_take(strategy_name, projects, amounts):
+    """Списание с кучи стратегии без обращений к БД."""
+    strategy = STRATEGIES[strategy_name]
+    heap = [
+        (strategy.priority(row["create_date"], row["full_amount"]),
+         number, row["full_amount"])
+        for number, row in enumerate(make_rows(projects, max_amount=5000))
+    ]
+    heapq.heapify(heap)
+    started = time.perf_counter()
+    for amount in amounts:
+        strategy.take(heap, amount)
+    return {
+        "takes_per_second": round(
+            len(amounts) / (time.perf_counter() - started), 1
+        ),
+    }
+
+
+async def main(strategies, projects, donations_count):
+    settings.allocation_ledger = True
+    amounts = [
+        row["full_amount"] for row in make_rows(donations_count, seed=1)
+    ]
+    for strategy_name in strategies:
+        result = {"strategy": strategy_name, "projects": projects}
+        result.update(
+            await measure_allocation(strategy_name, projects, amounts)
+        )
+        result.update(measure_take(strategy_name, projects, amounts))
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--strategies", nargs="+", choices=list(STRATEGIES),
+        default=list(STRATEGIES),
+    )
+    parser.add_argument("--projects", type=int, default=10000)
+    parser.add_argument("--donations", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.strategies, args.projects, args.donations))
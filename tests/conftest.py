@@ -1,5 +1,6 @@
 from pathlib import Path
 
+import freezegun
 import pytest
 import pytest_asyncio
 from mixer.backend.sqlalchemy import Mixer as _mixer
@@ -48,8 +49,14 @@ BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
 pytest_plugins = [
     'fixtures.user',
     'fixtures.data',
+    'fixtures.queries',
+    'fixtures.ledger',
 ]
 
+# Срок записей общего кэша объектов считается по реальным часам:
+# под freezer они остановлены только в части потоков.
+freezegun.configure(extend_ignore_list=['app.services.entity_cache'])
+
 TEST_DB = BASE_DIR / 'test.db'
 SQLALCHEMY_DATABASE_URL = f'sqlite+aiosqlite:///{str(TEST_DB)}'
 engine = create_async_engine(
@@ -58,6 +65,7 @@ engine = create_async_engine(
 )
 TestingSessionLocal = sessionmaker(
     class_=AsyncSession, autocommit=False, autoflush=False, bind=engine,
+    expire_on_commit=False,
 )
 
 
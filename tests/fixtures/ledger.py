@@ -0,0 +1,10 @@
+import pytest
+
+from app.services.ledger import ledger
+
+
+@pytest.fixture
+def reset_ledger():
+    ledger.invalidate()
+    yield
+    ledger.invalidate()
@@ -0,0 +1,33 @@
+import pytest
+from conftest import engine
+from sqlalchemy import event
+
+
+@pytest.fixture
+def captured_queries():
+    queries = []
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        queries.append((statement, parameters))
+
+    event.listen(
+        engine.sync_engine, 'before_cursor_execute', before_cursor_execute
+    )
+    yield queries
+    event.remove(
+        engine.sync_engine, 'before_cursor_execute', before_cursor_execute
+    )
+
+
+@pytest.fixture
+def captured_commits():
+    commits = []
+
+    def commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, 'commit', commit)
+    yield commits
+    event.remove(engine.sync_engine, 'commit', commit)
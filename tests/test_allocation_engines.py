@@ -0,0 +1,167 @@
+import random
+
+import pytest
+from conftest import TestingSessionLocal, engine
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.models import CharityProject, Donation, DonationAllocation
+from app.services.investing import (get_donations_for_project,
+                                    get_projects_for_donation)
+from app.services.ledger import ledger
+
+EVENTS_COUNT = 60
+
+
+def make_events(seed):
+    rng = random.Random(seed)
+    return [
+        (rng.choice((CharityProject, Donation)), rng.randint(1, 1000))
+        for _ in range(EVENTS_COUNT)
+    ]
+
+
+async def replay(events):
+    async with TestingSessionLocal() as session:
+        for number, (model, full_amount) in enumerate(events):
+            if model is CharityProject:
+                obj = CharityProject(
+                    name=f'project {number}', description='random',
+                    full_amount=full_amount,
+                )
+                invest = get_donations_for_project
+            else:
+                obj = Donation(user_id=1, full_amount=full_amount)
+                invest = get_projects_for_donation
+            session.add(obj)
+            await session.commit()
+            await session.refresh(obj)
+            await invest(obj, session)
+        return await snapshot(session)
+
+
+async def snapshot(session):
+    """
+    Состояние объектов и распределений и расхождения кэша открытых
+    объектов с БД; таблицы затем очищаются для следующего прогона.
+    """
+    mismatches = await ledger.check(session)
+    state = []
+    for model in (CharityProject, Donation):
+        objs = await session.execute(select(model).order_by(model.id))
+        state.append([
+            (obj.id, obj.invested_amount, obj.fully_invested,
+             obj.close_date is not None)
+            for obj in objs.scalars()
+        ])
+    allocations = await session.execute(select(
+        DonationAllocation.donation_id,
+        DonationAllocation.project_id,
+        DonationAllocation.amount,
+    ))
+    state.append(sorted(tuple(row) for row in allocations))
+    async with engine.begin() as conn:
+        for model in (DonationAllocation, CharityProject, Donation):
+            await conn.execute(delete(model))
+    return state, mismatches
+
+
+@pytest.mark.usefixtures('reset_ledger')
+@pytest.mark.parametrize('seed', range(5))
+async def test_sql_engine_matches_python_engine(monkeypatch, seed):
+    events = make_events(seed)
+    monkeypatch.setattr(settings, 'allocation_engine', 'python')
+    expected, _ = await replay(events)
+    monkeypatch.setattr(settings, 'allocation_engine', 'sql')
+    state, _ = await replay(events)
+    assert state == expected, (
+        'Распределение через SQL должно совпадать с эталонным '
+        'распределением в Python на одних и тех же данных.'
+    )
+
+
+@pytest.mark.usefixtures('reset_ledger')
+@pytest.mark.parametrize('seed', range(5))
+async def test_ledger_matches_python_engine(monkeypatch, seed):
+    events = make_events(seed)
+    expected, _ = await replay(events)
+    monkeypatch.setattr(settings, 'allocation_ledger', True)
+    state, mismatches = await replay(events)
+    assert state == expected, (
+        'Распределение через кэш открытых объектов должно совпадать '
+        'с эталонным распределением на одних и тех же данных.'
+    )
+    assert not mismatches, (
+        'После распределения кэш открытых объектов должен совпадать с БД. '
+        f'Расхождения: {mismatches}'
+    )
+
+
+async def replay_zero_remaining():
+    async with TestingSessionLocal() as session:
+        session.add_all([
+            CharityProject(
+                name='funded', description='zero remaining',
+                full_amount=100, invested_amount=100,
+            ),
+            CharityProject(
+                name='open', description='zero remaining', full_amount=50,
+            ),
+        ])
+        await session.commit()
+        donation = Donation(user_id=1, full_amount=30)
+        session.add(donation)
+        await session.commit()
+        await session.refresh(donation)
+        await get_projects_for_donation(donation, session)
+        return await snapshot(session)
+
+
+@pytest.mark.usefixtures('reset_ledger')
+@pytest.mark.parametrize('engine_name', ['sql', 'ledger'])
+async def test_engines_skip_zero_remaining(monkeypatch, engine_name):
+    expected, _ = await replay_zero_remaining()
+    if engine_name == 'ledger':
+        monkeypatch.setattr(settings, 'allocation_ledger', True)
+    else:
+        monkeypatch.setattr(settings, 'allocation_engine', engine_name)
+    state, mismatches = await replay_zero_remaining()
+    assert state == expected, (
+        'Открытый проект с нулевым остатком все движки должны '
+        'обрабатывать одинаково.'
+    )
+    assert all(amount for _, _, amount in state[-1]), (
+        'Распределение не должно записывать доли с нулевой суммой.'
+    )
+    assert engine_name != 'ledger' or not mismatches, (
+        'Кэш открытых объектов не должен хранить объекты '
+        f'с нулевым остатком. Расхождения: {mismatches}'
+    )
+
+
+@pytest.mark.usefixtures('reset_ledger')
+async def test_ledger_reloads_after_external_change(
+        monkeypatch, charity_project
+):
+    monkeypatch.setattr(settings, 'allocation_ledger', True)
+    async with TestingSessionLocal() as session:
+        await ledger.load(session)
+        project = CharityProject(
+            name='after load', description='ledger', full_amount=100
+        )
+        session.add(project)
+        await session.commit()
+        assert await ledger.check(session), (
+            'Проверка кэша должна находить объекты, созданные в обход него.'
+        )
+        ledger.version -= 1
+        donation = Donation(user_id=1, full_amount=1000100)
+        session.add(donation)
+        await session.commit()
+        await session.refresh(donation)
+        await get_projects_for_donation(donation, session)
+        assert not await ledger.check(session), (
+            'При расхождении версии кэш должен перечитываться из БД.'
+        )
+    assert charity_project.fully_invested
+    assert donation.fully_invested
@@ -0,0 +1,134 @@
+import random
+
+import pytest
+from conftest import TestingSessionLocal
+
+from app.core.config import settings
+from app.core.rebuild_ledger import rebuild_ledger
+from app.models import CharityProject, Donation
+from app.services.allocation_queue import AllocationQueue, allocation_queue
+from app.services.investing import get_donations_for_project
+from benchmarks.allocation_queue import measure
+from benchmarks.concurrent_allocation import prepare
+
+
+@pytest.fixture
+def queue_mode(monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_queue', True)
+    monkeypatch.setattr(settings, 'allocation_queue_flush_interval', 0.01)
+    monkeypatch.setattr(
+        allocation_queue, 'session_factory', TestingSessionLocal
+    )
+
+
+@pytest.mark.usefixtures('queue_mode')
+def test_donation_allocated_in_background(user_client, charity_project):
+    response = user_client.post('/donation/', json={'full_amount': 300})
+    assert response.status_code == 200, (
+        'В режиме очереди POST-запрос к эндпоинту `/donation/` '
+        'должен вернуть статус-код 200.'
+    )
+    donation_id = response.json()['id']
+    response = user_client.get(
+        f'/donation/{donation_id}/status', params={'wait': 5}
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        'id': donation_id,
+        'queued': False,
+        'invested_amount': 300,
+        'fully_invested': True,
+        'close_date': response.json()['close_date'],
+    }, 'Фоновая задача должна распределить пожертвование из очереди.'
+    project = user_client.get('/charity_project/').json()[0]
+    assert project['invested_amount'] == 300, (
+        'Пожертвование из очереди должно попасть в открытый проект.'
+    )
+
+
+def test_donation_status_hides_foreign_donation(user_client, mixer):
+    donation = mixer.blend(
+        'app.models.donation.Donation', user_id=100, full_amount=10,
+        invested_amount=0, fully_invested=False, queued=False,
+    )
+    response = user_client.get(f'/donation/{donation.id}/status')
+    assert response.status_code == 404, (
+        'Состояние чужого пожертвования не должно быть доступно.'
+    )
+
+
+@pytest.mark.usefixtures('reset_ledger')
+@pytest.mark.parametrize('engine_name', ['python', 'sql', 'ledger'])
+async def test_queue_keeps_fifo(monkeypatch, engine_name):
+    monkeypatch.setattr(
+        settings, 'allocation_ledger', engine_name == 'ledger'
+    )
+    if engine_name != 'ledger':
+        monkeypatch.setattr(settings, 'allocation_engine', engine_name)
+    monkeypatch.setattr(settings, 'allocation_queue', True)
+    monkeypatch.setattr(settings, 'allocation_queue_batch_size', 7)
+    queue = AllocationQueue(TestingSessionLocal)
+    rng = random.Random(engine_name)
+    for number in range(40):
+        async with TestingSessionLocal() as session:
+            if rng.random() < 0.5:
+                target = CharityProject(
+                    name=f'project {number}', description='queue',
+                    full_amount=rng.randint(1, 1000),
+                )
+            else:
+                target = Donation(user_id=1, full_amount=rng.randint(1, 1000))
+            await queue.enqueue(target, session)
+        if number % 15 == 14:
+            await queue.drain()
+    assert await queue.drain() > 0
+    async with TestingSessionLocal() as session:
+        mismatches, _ = await rebuild_ledger(session)
+    assert mismatches == [], (
+        'Распределение очереди пачками должно совпадать с FIFO '
+        'в порядке создания.'
+    )
+    assert await queue.drain() == 0, 'Очередь должна опустеть.'
+
+
+async def test_queued_rows_join_pool_without_queue_mode(monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_queue', True)
+    async with TestingSessionLocal() as session:
+        donation = await AllocationQueue(TestingSessionLocal).enqueue(
+            Donation(user_id=1, full_amount=100), session
+        )
+    monkeypatch.setattr(settings, 'allocation_queue', False)
+    async with TestingSessionLocal() as session:
+        project = await get_donations_for_project(CharityProject(
+            name='after queue', description='queue', full_amount=100,
+        ), session)
+    assert project.fully_invested, (
+        'Без режима очереди оставшиеся в ней пожертвования должны '
+        'входить в пул открытых объектов.'
+    )
+    async with TestingSessionLocal() as session:
+        donation = await session.get(Donation, donation.id)
+    assert donation.invested_amount == 100
+
+
+async def test_queue_benchmark_balances(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'allocation_queue', True)
+    path = str(tmp_path / 'queue.db')
+    await prepare(path, 20)
+    result = await measure('queue', path, [100] * 30, concurrency=4)
+    assert result['problems'] == [], (
+        'После распределения очереди суммы проектов, пожертвований '
+        f'и долей должны сходиться. Нарушения: {result["problems"]}'
+    )
+
+
+@pytest.mark.usefixtures('queue_mode')
+def test_queued_project_duplicate_name(superuser_client, charity_project):
+    response = superuser_client.post('/charity_project/', json={
+        'name': charity_project.name, 'description': 'twin',
+        'full_amount': 100,
+    })
+    assert response.status_code == 400, (
+        'В режиме очереди проект с занятым именем должен отклоняться '
+        'ограничением уникальности со статус-кодом 400.'
+    )
@@ -1,7 +1,11 @@
+import sqlite3
 import time
 from datetime import datetime
 
 import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.api.validators import is_name_conflict
 
 PROJECTS_URL = '/charity_project/'
 PROJECT_DETAILS_URL = PROJECTS_URL + '{project_id}'
@@ -433,6 +437,14 @@ def test_update_charity_project_full_amount_equal_invested_amount(
         f'к эндпоинту `{PROJECT_DETAILS_URL}` изменяет '
         'значение поля `full_amount`.'
     )
+    funded = json_data['full_amount'] == 100
+    assert (
+        response.json()['fully_invested'],
+        response.json().get('close_date') is not None,
+    ) == (funded, funded), (
+        'Проект, требуемая сумма которого стала равна внесённой, '
+        'должен закрываться.'
+    )
 
 
 @pytest.mark.parametrize(
@@ -728,3 +740,98 @@ def test_get_all_charity_project_not_auth_user(test_client):
         f'пользователя к эндпоинту `{PROJECTS_URL}` возвращается список '
         'существующих проектов.'
     )
+
+
+BULK_PROJECTS_URL = PROJECTS_URL + 'bulk'
+
+
+def bulk_projects(amounts):
+    return [
+        {'name': f'bulk {number}', 'description': 'bulk', 'full_amount': amount}
+        for number, amount in enumerate(amounts)
+    ]
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_create_charity_projects_bulk(superuser_client):
+    response = superuser_client.post(
+        BULK_PROJECTS_URL, json=bulk_projects([50, 2000, 500])
+    )
+    assert response.status_code == 200, (
+        f'Корректный POST-запрос суперпользователя к `{BULK_PROJECTS_URL}` '
+        'должен возвращать ответ со статус-кодом 200.'
+    )
+    assert [
+        (item['name'], item['invested_amount'], item['fully_invested'])
+        for item in response.json()
+    ] == [
+        ('bulk 0', 50, True), ('bulk 1', 2000, True), ('bulk 2', 50, False),
+    ], (
+        'Проекты из пачки должны распределять ожидающие пожертвования '
+        'в порядке запроса.'
+    )
+
+
+@pytest.mark.parametrize('names', [
+    ['chimichangas4life', 'fresh'],
+    ['twin', 'twin'],
+])
+def test_create_charity_projects_bulk_duplicate(superuser_client,
+                                                charity_project, names):
+    response = superuser_client.post(BULK_PROJECTS_URL, json=[
+        {'name': name, 'description': 'bulk', 'full_amount': 10}
+        for name in names
+    ])
+    assert response.status_code == 400, (
+        'Пачка проектов с занятым или повторяющимся именем должна '
+        'отклоняться со статус-кодом 400.'
+    )
+    assert len(superuser_client.get(PROJECTS_URL).json()) == 1, (
+        'Отклоненная пачка не должна создавать ни одного проекта.'
+    )
+
+
+def test_create_charity_projects_bulk_forbidden(user_client):
+    response = user_client.post(BULK_PROJECTS_URL, json=bulk_projects([10]))
+    assert response.status_code in (401, 403), (
+        f'POST-запрос обычного пользователя к `{BULK_PROJECTS_URL}` '
+        'должен быть запрещен.'
+    )
+
+
+class UniqueViolationError(Exception):
+    def __init__(self, constraint_name):
+        super().__init__('duplicate key value violates unique constraint')
+        self.constraint_name = constraint_name
+
+
+class PostgresError(Exception):
+    sqlstate = '23505'
+
+    def __init__(self, constraint_name):
+        super().__init__('duplicate key value violates unique constraint')
+        self.__cause__ = UniqueViolationError(constraint_name)
+
+
+def integrity_error(orig):
+    try:
+        raise IntegrityError('INSERT INTO charityproject ...', {}, orig)
+    except IntegrityError as error:
+        return error
+
+
+@pytest.mark.parametrize('orig, name_conflict', [
+    (sqlite3.IntegrityError(
+        'UNIQUE constraint failed: charityproject.name'
+    ), True),
+    (sqlite3.IntegrityError(
+        'NOT NULL constraint failed: charityproject.description'
+    ), False),
+    (PostgresError('charityproject_name_key'), True),
+    (PostgresError('charityproject_pkey'), False),
+])
+def test_name_conflict_matches_constraint(orig, name_conflict):
+    assert is_name_conflict(integrity_error(orig)) is name_conflict, (
+        'Ошибку занятого имени должно определять только нарушение '
+        'ограничения уникальности имени проекта.'
+    )
@@ -0,0 +1,57 @@
+from conftest import TestingSessionLocal
+
+from app.core import db
+from app.models import CharityProject, Donation
+from app.services import investing
+from app.services.investing import get_projects_for_donation
+from benchmarks.concurrent_allocation import run
+
+
+def test_concurrent_donations_balance(tmp_path):
+    result = run(
+        workers=2, donations=200, projects=50, concurrency=4,
+        path=str(tmp_path / 'stress.db'),
+    )
+    assert result['failed_workers'] == 0, (
+        'Конкурентные распределения в нескольких процессах должны '
+        'завершаться без ошибок блокировки.'
+    )
+    assert result['problems'] == [], (
+        'После конкурентных распределений суммы проектов, пожертвований '
+        f'и долей должны сходиться. Нарушения: {result["problems"]}'
+    )
+
+
+async def test_skipped_rows_do_not_strand_target(monkeypatch):
+    async with TestingSessionLocal() as session:
+        locked = CharityProject(
+            name='locked', description='skip locked', full_amount=100
+        )
+        session.add(locked)
+        await session.commit()
+        session.add(CharityProject(
+            name='free', description='skip locked', full_amount=30
+        ))
+        await session.commit()
+    monkeypatch.setattr(db, 'SKIP_LOCKED_DIALECTS', ('sqlite',))
+    open_objects_query = investing.open_objects_query
+    passes = []
+
+    def skip_locked_row(model):
+        passes.append(model)
+        query = open_objects_query(model)
+        if len(passes) == 1:
+            return query.where(model.id != locked.id)
+        return query
+
+    monkeypatch.setattr(investing, 'open_objects_query', skip_locked_row)
+    async with TestingSessionLocal() as session:
+        donation = await get_projects_for_donation(
+            Donation(user_id=1, full_amount=100), session
+        )
+    assert donation.fully_invested, (
+        'Если из-за пропущенных заблокированных строк цели не хватило '
+        'открытых объектов, распределение должно дождаться блокировок '
+        'и дочитать пул.'
+    )
+    assert len(passes) == 2
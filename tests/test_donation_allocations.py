@@ -0,0 +1,81 @@
+import pytest
+from conftest import app, current_user
+
+from app.models.user import User
+
+PROJECTS_URL = '/charity_project/'
+PROJECT_ALLOCATIONS_URL = PROJECTS_URL + '{project_id}/allocations'
+DONATIONS_URL = '/donation/'
+DONATION_ALLOCATIONS_URL = DONATIONS_URL + '{donation_id}/allocations'
+
+
+def short(allocations):
+    return [
+        (item['donation_id'], item['project_id'], item['amount'])
+        for item in allocations
+    ]
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_project_allocations(superuser_client):
+    project = superuser_client.post(PROJECTS_URL, json={
+        'name': 'Allocations',
+        'description': 'Who funded it',
+        'full_amount': 1000,
+    }).json()
+    url = PROJECT_ALLOCATIONS_URL.format(project_id=project['id'])
+    response = superuser_client.get(url)
+    assert response.status_code == 200, (
+        f'GET-запрос суперпользователя к эндпоинту `{url}` должен '
+        'возвращать ответ со статус-кодом 200.'
+    )
+    allocations = response.json()
+    assert short(allocations) == [(1, 1, 100), (2, 1, 900)], (
+        'Доли пожертвований проекта должны возвращаться в порядке '
+        'распределения.'
+    )
+    first_page = superuser_client.get(url, params={'limit': 1}).json()
+    next_page = superuser_client.get(
+        url, params={'limit': 1, 'after_id': first_page[-1]['id']}
+    ).json()
+    assert [first_page, next_page] == [allocations[:1], allocations[1:]], (
+        'Параметры `limit` и `after_id` должны возвращать страницы долей '
+        'по порядку.'
+    )
+
+
+@pytest.mark.usefixtures('charity_project', 'charity_project_nunchaku')
+def test_donation_allocations(user_client):
+    donation = user_client.post(
+        DONATIONS_URL, json={'full_amount': 1000500}
+    ).json()
+    url = DONATION_ALLOCATIONS_URL.format(donation_id=donation['id'])
+    assert short(user_client.get(url).json()) == [
+        (1, 1, 1000000), (1, 2, 500)
+    ], (
+        'Пользователь должен видеть, в какие проекты распределено '
+        'его пожертвование.'
+    )
+    app.dependency_overrides[current_user] = lambda: User(
+        id=5, is_active=True, is_verified=True, is_superuser=False,
+    )
+    assert user_client.get(url).json() == [], (
+        'Пользователь не должен видеть доли чужих пожертвований.'
+    )
+
+
+@pytest.mark.parametrize('params', [{'limit': 0}, {'after_id': -1}])
+def test_allocations_invalid_page(superuser_client, params):
+    response = superuser_client.get(
+        PROJECT_ALLOCATIONS_URL.format(project_id=1), params=params
+    )
+    assert response.status_code == 422, (
+        'Некорректные параметры страницы должны возвращать статус-код 422.'
+    )
+
+
+def test_project_allocations_superuser_only(user_client):
+    response = user_client.get(PROJECT_ALLOCATIONS_URL.format(project_id=1))
+    assert response.status_code == 403, (
+        'Доли пожертвований проекта доступны только суперпользователю.'
+    )
@@ -3,9 +3,12 @@ from datetime import datetime
 
 import pytest
 
+from app.core.config import settings
+
 DONATIONS_URL = '/donation/'
 DONATON_DETAILS_URL = DONATIONS_URL + '{donation_id}'
 MY_DONATIONS_URL = DONATIONS_URL + 'my'
+BATCH_DONATIONS_URL = DONATIONS_URL + 'batch'
 
 
 @pytest.mark.parametrize('json_data, expected_keys, expected_data', [
@@ -221,3 +224,61 @@ def test_create_donation_check_create_date(user_client):
         'Убедитесь, что при неодновременном создании двух пожертвований '
         'у них отличаются значения в поле `create_date`.'
     )
+
+
+def test_create_donations_batch(user_client, charity_project_little_invested):
+    response = user_client.post(BATCH_DONATIONS_URL, json=[
+        {'full_amount': 999000},
+        {'full_amount': 1000, 'comment': 'Closes the project'},
+        {'full_amount': 50},
+    ])
+    assert response.status_code == 200, (
+        f'Корректный POST-запрос к эндпоинту `{BATCH_DONATIONS_URL}` '
+        'должен возвращать ответ со статус-кодом 200.'
+    )
+    results = [
+        (item['full_amount'], item['invested_amount'], item['fully_invested'])
+        for item in response.json()
+    ]
+    assert results == [
+        (999000, 999000, True),
+        (1000, 900, False),
+        (50, 0, False),
+    ], (
+        'Пожертвования из пачки должны распределяться по открытым проектам '
+        'в порядке запроса, а ответ - содержать результат по каждому из них.'
+    )
+    assert charity_project_little_invested.fully_invested, (
+        'Пачка пожертвований должна закрыть проект, сумма которого собрана.'
+    )
+
+
+def test_create_donations_batch_ids(user_client, monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_chunk_size', 3)
+    amounts = list(range(1, 9))
+    response = user_client.post(BATCH_DONATIONS_URL, json=[
+        {'full_amount': amount} for amount in amounts
+    ])
+    assert response.status_code == 200
+    created = {item['id']: item['full_amount'] for item in response.json()}
+    stored = {
+        item['id']: item['full_amount']
+        for item in user_client.get(MY_DONATIONS_URL).json()
+    }
+    assert created == stored and sorted(created.values()) == amounts, (
+        'Пачка, вставленная несколькими порциями, должна возвращать '
+        'id сохраненных пожертвований.'
+    )
+
+
+@pytest.mark.parametrize('json_data', [
+    [],
+    [{'full_amount': 10}, {'full_amount': -1}],
+    {'full_amount': 10},
+])
+def test_create_donations_batch_incorrect(user_client, json_data):
+    response = user_client.post(BATCH_DONATIONS_URL, json=json_data)
+    assert response.status_code == 422, (
+        'При некорректном теле POST-запроса к эндпоинту '
+        f'`{BATCH_DONATIONS_URL}` должен вернуться статус-код 422.'
+    )
@@ -0,0 +1,232 @@
+import json
+import threading
+
+import pytest
+from conftest import TestingSessionLocal
+from sqlalchemy import insert, update
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.api.endpoints import charity_project as charity_project_endpoints
+from app.core.config import settings
+from app.crud.charity_project import charity_project_crud
+from app.models import CharityProject, Donation
+from app.schemas.charity_project import CharityProjectUpdate
+from app.services.entity_cache import MISSING, EntityCache, entity_cache
+from app.services.investing import get_projects_for_donation
+
+
+@pytest.fixture(params=['memory', 'shared'])
+def cache(request, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'entity_cache', True)
+    if request.param == 'shared':
+        monkeypatch.setattr(
+            settings, 'entity_cache_path', str(tmp_path / 'cache.sqlite')
+        )
+    entity_cache.reset()
+    yield entity_cache
+    entity_cache.reset()
+
+
+def project_selects(captured_queries):
+    return [
+        statement for statement, _ in captured_queries
+        if statement.startswith('SELECT') and
+        'FROM charityproject' in statement
+    ]
+
+
+async def read_project(project_id):
+    async with TestingSessionLocal() as session:
+        return await charity_project_crud.get(project_id, session)
+
+
+async def test_get_served_from_cache(cache, charity_project,
+                                     captured_queries):
+    first = await read_project(charity_project.id)
+    second = await read_project(charity_project.id)
+    assert len(project_selects(captured_queries)) == 1, (
+        'Повторное чтение проекта по id должно обслуживаться кэшем.'
+    )
+    assert (second.name, second.version_id) == (
+        first.name, first.version_id
+    )
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_update_invalidates_cache(cache, charity_project):
+    await read_project(charity_project.id)
+    async with TestingSessionLocal() as session:
+        project = await charity_project_crud.get(charity_project.id, session)
+        await charity_project_crud.update(
+            project, CharityProjectUpdate(name='renamed'), session
+        )
+    cached = await read_project(charity_project.id)
+    assert (cached.name, cached.version_id) == ('renamed', 2), (
+        'Изменение проекта должно сбрасывать его запись в кэше.'
+    )
+
+
+async def test_sql_allocation_invalidates_cache(cache, monkeypatch,
+                                                charity_project):
+    monkeypatch.setattr(settings, 'allocation_engine', 'sql')
+    await read_project(charity_project.id)
+    async with TestingSessionLocal() as session:
+        await get_projects_for_donation(
+            Donation(user_id=1, full_amount=100), session
+        )
+    cached = await read_project(charity_project.id)
+    assert cached.invested_amount == 100, (
+        'Распределение в обход ORM должно сбрасывать кэш проектов.'
+    )
+
+
+async def test_name_lookup_invalidated_by_insert(cache):
+    async with TestingSessionLocal() as session:
+        assert await charity_project_crud.get_project_id_by_name(
+            'cached', session
+        ) is None
+        session.add(CharityProject(
+            name='cached', description='cache', full_amount=10
+        ))
+        await session.commit()
+        assert await charity_project_crud.get_project_id_by_name(
+            'cached', session
+        ) is not None, (
+            'Создание проекта должно сбрасывать кэш поиска по имени.'
+        )
+
+
+async def test_name_lookup_miss_not_cached(cache):
+    async with TestingSessionLocal() as session:
+        assert await charity_project_crud.get_project_id_by_name(
+            'other worker', session
+        ) is None
+        await session.execute(insert(CharityProject).values(
+            name='other worker', description='cache', full_amount=10,
+        ))
+        await session.commit()
+        assert await charity_project_crud.get_project_id_by_name(
+            'other worker', session
+        ) is not None, (
+            'Отсутствие имени не должно кэшироваться: вставку в другом '
+            'воркере кэш этого воркера не видит.'
+        )
+
+
+@pytest.mark.usefixtures('cache', 'charity_project', 'charity_project_nunchaku')
+def test_patch_name_taken_after_check(superuser_client, monkeypatch):
+    async def stale_check(*args):
+        pass
+
+    monkeypatch.setattr(
+        charity_project_endpoints, 'check_name_duplicate', stale_check
+    )
+    response = superuser_client.patch('/charity_project/1', json={
+        'name': 'nunchaku',
+    })
+    assert response.status_code == 400, (
+        'Если имя заняли после проверки, PATCH-запрос должен '
+        'возвращать статус-код 400, а не ошибку сервера.'
+    )
+
+
+def test_read_started_before_invalidation_is_not_stored(cache):
+    key = cache.entity_key(CharityProject, 1)
+    stamp = cache.stamp(key)
+    cache.invalidate(key)
+    cache.store(key, stamp, {'name': 'stale'})
+    assert cache.read(key) is MISSING, (
+        'Результат чтения, начатого до сброса, не должен попадать в кэш.'
+    )
+
+
+def test_shared_backend_invalidation_visible_to_workers(monkeypatch,
+                                                        tmp_path):
+    monkeypatch.setattr(settings, 'entity_cache', True)
+    monkeypatch.setattr(
+        settings, 'entity_cache_path', str(tmp_path / 'cache.sqlite')
+    )
+    first, second = EntityCache(), EntityCache()
+    key = first.entity_key(CharityProject, 1)
+    first.store(key, first.stamp(key), {'name': 'shared'})
+    assert second.read(key) == {'name': 'shared'}
+    second.invalidate(first.model_key(CharityProject))
+    assert first.read(key) is MISSING, (
+        'Сброс в одном воркере должен быть виден другим через общий кэш.'
+    )
+
+
+async def test_shared_backend_off_event_loop(monkeypatch, tmp_path,
+                                             charity_project):
+    monkeypatch.setattr(settings, 'entity_cache', True)
+    monkeypatch.setattr(
+        settings, 'entity_cache_path', str(tmp_path / 'cache.sqlite')
+    )
+    cache = EntityCache()
+    backend = cache.get_backend()
+    threads = []
+    get = backend.get
+
+    def record_thread(key):
+        threads.append(threading.get_ident())
+        return get(key)
+
+    monkeypatch.setattr(backend, 'get', record_thread)
+    async with TestingSessionLocal() as session:
+        await cache.get(
+            CharityProject, charity_project.id, session,
+            lambda: charity_project_crud.read(charity_project.id, session),
+        )
+    assert threads and threading.get_ident() not in threads, (
+        'Запросы к файлу общего кэша не должны блокировать цикл событий.'
+    )
+    key = cache.entity_key(CharityProject, charity_project.id)
+    stored = backend.connection.execute(
+        'SELECT value FROM entity_cache WHERE key = ?', (key,)
+    ).fetchone()[0]
+    assert json.loads(stored)[1]['name'] == charity_project.name, (
+        'Общий кэш должен хранить значения столбцов в JSON.'
+    )
+    assert cache.read(key)['create_date'] == charity_project.create_date
+
+
+@pytest.mark.usefixtures(
+    'cache', 'charity_project', 'charity_project_nunchaku'
+)
+def test_cache_stats(superuser_client):
+    for _ in range(2):
+        response = superuser_client.patch('/charity_project/1', json={
+            'name': 'nunchaku',
+        })
+        assert response.status_code == 400
+    stats = superuser_client.get('/stats/cache').json()
+    assert (stats['enabled'], stats['hits'], stats['misses']) == (
+        True, 2, 2,
+    ), (
+        'Эндпоинт `/stats/cache` должен отдавать счетчики кэша: повторная '
+        'проверка проекта и имени обслуживается кэшем.'
+    )
+
+
+async def test_stale_cached_write_rejected_and_invalidated(cache,
+                                                           charity_project):
+    await read_project(charity_project.id)
+    async with TestingSessionLocal() as session:
+        await session.execute(
+            update(CharityProject).values(
+                name='other worker', version_id=CharityProject.version_id + 1
+            )
+        )
+        await session.commit()
+    async with TestingSessionLocal() as session:
+        stale = await charity_project_crud.get(charity_project.id, session)
+        assert stale.name == charity_project.name
+        with pytest.raises(StaleDataError):
+            await charity_project_crud.update(
+                stale, CharityProjectUpdate(description='lost'), session
+            )
+    fresh = await read_project(charity_project.id)
+    assert fresh.name == 'other worker', (
+        'Запись по устаревшему объекту из кэша должна отклоняться '
+        'проверкой версии и сбрасывать запись кэша.'
+    )
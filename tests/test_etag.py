@@ -0,0 +1,91 @@
+import pytest
+from conftest import TestingSessionLocal
+
+from app.core.config import settings
+from app.crud.change_counter import change_counter_crud
+from app.models import CharityProject, Donation
+from app.services.investing import get_donations_for_project
+
+
+def conditional_get(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag})
+
+
+@pytest.mark.usefixtures('charity_project')
+def test_unchanged_projects_not_modified(superuser_client, captured_queries):
+    etag = superuser_client.get('/charity_project/').headers['etag']
+    assert etag.startswith('W/'), 'Список проектов должен отдавать слабый ETag.'
+    captured_queries.clear()
+    response = conditional_get(superuser_client, '/charity_project/', etag)
+    assert response.status_code == 304, (
+        'GET-запрос к `/charity_project/` с актуальным If-None-Match '
+        'должен вернуть статус-код 304.'
+    )
+    assert response.headers['etag'] == etag
+    assert not any(
+        'FROM charityproject' in statement
+        for statement, _ in captured_queries
+    ), 'Ответ 304 не должен читать строки проектов.'
+
+
+@pytest.mark.usefixtures('charity_project')
+@pytest.mark.parametrize('fast_read', [False, True])
+def test_project_change_refreshes_etag(superuser_client, monkeypatch,
+                                       fast_read):
+    monkeypatch.setattr(settings, 'fast_read', fast_read)
+    etag = superuser_client.get('/charity_project/').headers['etag']
+    superuser_client.patch('/charity_project/1', json={'name': 'renamed'})
+    response = conditional_get(superuser_client, '/charity_project/', etag)
+    assert response.status_code == 200, (
+        'После изменения проекта список должен отдаваться заново.'
+    )
+    assert response.headers['etag'] != etag
+    assert response.json()[0]['name'] == 'renamed'
+
+
+async def add_donation(user_id):
+    async with TestingSessionLocal() as session:
+        session.add(Donation(user_id=user_id, full_amount=10))
+        await session.commit()
+
+
+@pytest.mark.usefixtures('donation')
+async def test_user_donations_etag_is_per_user(user_client):
+    etag = user_client.get('/donation/my').headers['etag']
+    await add_donation(user_id=1)
+    assert conditional_get(
+        user_client, '/donation/my', etag
+    ).status_code == 304, (
+        'Пожертвование другого пользователя не должно менять ETag '
+        '`/donation/my`.'
+    )
+    await add_donation(user_id=2)
+    assert conditional_get(
+        user_client, '/donation/my', etag
+    ).status_code == 200, (
+        'Новое пожертвование пользователя должно менять ETag '
+        '`/donation/my`.'
+    )
+
+
+@pytest.mark.usefixtures('donation')
+async def test_sql_allocation_bumps_user_versions(monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_engine', 'sql')
+    async with TestingSessionLocal() as session:
+        before = await change_counter_crud.get_user_version(2, session)
+        projects = await change_counter_crud.get_version(
+            CharityProject, session
+        )
+        await get_donations_for_project(
+            CharityProject(name='sql', description='etag', full_amount=10),
+            session,
+        )
+        assert await change_counter_crud.get_user_version(
+            2, session
+        ) > before, (
+            'Распределение в обход ORM должно менять версии пожертвований '
+            'пользователей.'
+        )
+        assert await change_counter_crud.get_version(
+            CharityProject, session
+        ) > projects
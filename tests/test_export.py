@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.services.export import ExportFormat
+from benchmarks.export import run
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_export_donations_ndjson(superuser_client):
+    response = superuser_client.get('/donation/export')
+    assert response.status_code == 200, (
+        'GET-запрос суперпользователя к эндпоинту `/donation/export` '
+        'должен возвращать ответ со статус-кодом 200.'
+    )
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    listed = superuser_client.get('/donation/').json()
+    assert [
+        {key: value for key, value in row.items() if value is not None}
+        for row in exported
+    ] == listed, (
+        'Выгрузка пожертвований должна содержать те же поля и значения, '
+        'что и список пожертвований.'
+    )
+
+
+@pytest.mark.usefixtures('charity_project', 'small_fully_charity_project')
+def test_export_charity_projects_csv(superuser_client):
+    response = superuser_client.get(
+        '/charity_project/export', params={'format': 'csv'}
+    )
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [
+        (row['id'], row['name'], row['fully_invested'], row['close_date'])
+        for row in rows
+    ] == [
+        ('1', 'chimichangas4life', 'False', ''),
+        ('2', '1M$ for ur project', 'True', '2010-10-11T00:00:00'),
+    ], 'CSV-выгрузка должна содержать заголовок и строку на каждый проект.'
+
+
+@pytest.mark.parametrize('url', [
+    '/donation/export', '/charity_project/export',
+])
+def test_export_usual_user(user_client, url):
+    response = user_client.get(url)
+    assert response.status_code == 403, (
+        f'Выгрузка `{url}` должна быть доступна только суперпользователю.'
+    )
+
+
+def test_export_benchmark_memory_is_flat():
+    small, large = run([5000, 50000], [ExportFormat.ndjson])
+    assert large['bytes'] > 5 * small['bytes'] and (
+        large['peak_mb'] < 2 * small['peak_mb']
+    ), (
+        'Пиковая память выгрузки не должна расти с размером таблицы: '
+        f'{small} / {large}'
+    )
@@ -0,0 +1,112 @@
+import pytest
+from conftest import TestingSessionLocal, engine
+
+from app.crud.charity_project import charity_project_crud
+from app.crud.donation import donation_crud
+from app.crud.donation_allocation import donation_allocation_crud
+from app.models import CharityProject, Donation, User
+from app.services.investing import (get_donations_for_project,
+                                     get_projects_for_donation)
+
+
+async def query_plan(queries, table):
+    statement, parameters = next(
+        (statement, parameters) for statement, parameters in queries
+        if statement.startswith('SELECT') and f'FROM {table}' in statement
+    )
+    async with engine.connect() as conn:
+        plan = await conn.exec_driver_sql(
+            'EXPLAIN QUERY PLAN ' + statement, parameters
+        )
+        return ' '.join(row[-1] for row in plan)
+
+
+def assert_index_used(plan, *indexes):
+    assert any(f'INDEX {index} ' in plan for index in indexes), (
+        f'Запрос должен использовать один из индексов {indexes}. '
+        f'План: {plan}'
+    )
+    assert 'TEMP B-TREE' not in plan, (
+        f'Запрос не должен сортировать строки во временном дереве. '
+        f'План: {plan}'
+    )
+
+
+@pytest.mark.parametrize('model, invest, source_table', [
+    (Donation, get_projects_for_donation, 'charityproject'),
+    (CharityProject, get_donations_for_project, 'donation'),
+])
+async def test_open_objects_query_uses_index(
+        captured_queries, model, invest, source_table
+):
+    async with TestingSessionLocal() as session:
+        session.add_all([
+            CharityProject(name='index', description='index', full_amount=50),
+            Donation(full_amount=50),
+        ])
+        await session.commit()
+        obj = model(full_amount=100)
+        if model is CharityProject:
+            obj.name, obj.description = 'new index', 'index'
+        session.add(obj)
+        await session.commit()
+        captured_queries.clear()
+        await invest(obj, session)
+    plan = await query_plan(captured_queries, source_table)
+    assert_index_used(
+        plan,
+        f'ix_{source_table}_open_create_date_id',
+        f'ix_{source_table}_fully_invested_create_date_id',
+    )
+
+
+async def test_user_donations_query_uses_index(captured_queries):
+    async with TestingSessionLocal() as session:
+        await donation_crud.get_user_donations(
+            User(id=2), session, limit=10, after_id=5
+        )
+    plan = await query_plan(captured_queries, 'donation')
+    assert_index_used(plan, 'ix_donation_user_id_id')
+
+
+@pytest.mark.parametrize('crud, table', [
+    (charity_project_crud, 'charityproject'),
+    (donation_crud, 'donation'),
+])
+async def test_list_page_query_seeks_primary_key(captured_queries, crud,
+                                                 table):
+    async with TestingSessionLocal() as session:
+        await crud.get_multi(session, limit=10, after_id=500000)
+    plan = await query_plan(captured_queries, table)
+    assert 'USING INTEGER PRIMARY KEY (rowid>?)' in plan, (
+        f'Страница списка должна начинаться поиском по первичному ключу, '
+        f'а не просмотром пропущенных строк. План: {plan}'
+    )
+    assert 'TEMP B-TREE' not in plan, (
+        f'Страница списка не должна сортироваться. План: {plan}'
+    )
+
+
+async def test_completion_rate_query_uses_index(captured_queries):
+    async with TestingSessionLocal() as session:
+        await charity_project_crud.get_projects_by_completion_rate(session)
+    plan = await query_plan(captured_queries, 'charityproject')
+    assert_index_used(
+        plan, 'ix_charityproject_fully_invested_create_date_id'
+    )
+
+
+@pytest.mark.parametrize('get_allocations, column', [
+    (donation_allocation_crud.get_donation_allocations, 'donation_id'),
+    (donation_allocation_crud.get_project_allocations, 'project_id'),
+])
+async def test_allocations_query_uses_index(
+        captured_queries, get_allocations, column
+):
+    async with TestingSessionLocal() as session:
+        await get_allocations(1, session, limit=10, after_id=5)
+    assert len(captured_queries) == 1, (
+        'Страница долей должна читаться одним запросом.'
+    )
+    plan = await query_plan(captured_queries, 'donationallocation')
+    assert_index_used(plan, f'ix_donationallocation_{column}_id')
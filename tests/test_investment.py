@@ -1,4 +1,8 @@
 import pytest
+from conftest import TestingSessionLocal
+
+from app.models import Donation
+from app.services.investing import get_projects_for_donation
 
 DONATION_URL = '/donation/'
 PROJECTS_URL = '/charity_project/'
@@ -60,3 +64,41 @@ def test_donation_to_little_invest_project(
     )
     assert not charity_project_nunchaku.fully_invested, common_asser_msg
     assert charity_project_nunchaku.invested_amount == 0, common_asser_msg
+
+
+async def test_donation_spread_over_projects_fifo(
+        charity_project_little_invested, charity_project_nunchaku
+):
+    async with TestingSessionLocal() as session:
+        donation = Donation(user_id=2, full_amount=1000000)
+        session.add(donation)
+        await session.commit()
+        await session.refresh(donation)
+        donation = await get_projects_for_donation(donation, session)
+    common_asser_msg = (
+        'Пожертвование, превышающее остаток первого открытого проекта, '
+        'должно закрыть его, а остаток направить в следующий по времени '
+        'создания проект.'
+    )
+    assert charity_project_little_invested.fully_invested, common_asser_msg
+    assert charity_project_nunchaku.invested_amount == 100, common_asser_msg
+    assert donation.fully_invested, common_asser_msg
+
+
+async def test_donation_larger_than_open_projects(
+        charity_project_little_invested
+):
+    async with TestingSessionLocal() as session:
+        donation = Donation(user_id=2, full_amount=2000000)
+        session.add(donation)
+        await session.commit()
+        await session.refresh(donation)
+        donation = await get_projects_for_donation(donation, session)
+    assert donation.invested_amount == 999900, (
+        'Если открытым проектам не хватает пожертвования, в поле '
+        '`invested_amount` пожертвования должна попасть только '
+        'распределенная сумма.'
+    )
+    assert not donation.fully_invested, (
+        'Частично распределенное пожертвование должно оставаться открытым.'
+    )
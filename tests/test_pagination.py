@@ -0,0 +1,132 @@
+import pytest
+
+from app.core.config import settings
+from benchmarks.list_read import run as run_list_read
+from benchmarks.pagination import run
+
+
+def read_pages(client, url, limit):
+    pages = []
+    response = client.get(url, params={'limit': limit})
+    while True:
+        assert response.status_code == 200, (
+            f'GET-запрос страницы к эндпоинту `{url}` должен возвращать '
+            'ответ со статус-кодом 200.'
+        )
+        pages.append([item['id'] for item in response.json()])
+        if 'next' not in response.links:
+            return pages
+        response = client.get(response.links['next']['url'])
+
+
+@pytest.mark.usefixtures(
+    'charity_project', 'charity_project_nunchaku',
+    'small_fully_charity_project',
+)
+def test_charity_projects_pages(user_client):
+    pages = read_pages(user_client, '/charity_project/', limit=2)
+    assert pages == [[1, 2], [3]], (
+        'Проекты должны отдаваться страницами по `limit` в порядке id, '
+        'а заголовок `Link` должен вести на следующую страницу.'
+    )
+
+
+@pytest.fixture
+def donations(donation, another_donation, mixer):
+    mixer.blend('app.models.donation.Donation', user_id=2, full_amount=50)
+
+
+@pytest.mark.usefixtures('donations')
+def test_donations_pages(superuser_client):
+    assert read_pages(superuser_client, '/donation/', limit=1) == [
+        [1], [2], [3], [],
+    ], (
+        'Пожертвования должны отдаваться страницами в порядке id; '
+        'после заполненной страницы ссылка ведет на следующую, '
+        'даже если она пуста.'
+    )
+
+
+@pytest.mark.usefixtures('donations')
+def test_user_donations_pages(user_client):
+    assert read_pages(user_client, '/donation/my', limit=1) == [
+        [1], [3], [],
+    ], (
+        'Страницы `/donation/my` должны содержать только пожертвования '
+        'текущего пользователя.'
+    )
+
+
+@pytest.mark.parametrize('params', [{'limit': 0}, {'limit': 100000}])
+def test_page_limit_is_bounded(user_client, params):
+    response = user_client.get('/charity_project/', params=params)
+    assert response.status_code == 422, (
+        'Размер страницы должен быть ограничен настройкой max_page_size.'
+    )
+
+
+def test_pagination_benchmark_reports_depths():
+    results = run(rows=2000, depths=[0, 1900], limit=50, repeat=3)
+    assert [
+        (result['method'], result['depth']) for result in results
+    ] == [
+        ('keyset', 0), ('keyset', 1900), ('offset', 0), ('offset', 1900),
+    ], 'Бенчмарк должен замерять обе выборки на каждой глубине.'
+    assert all(result['rows'] == 50 for result in results), (
+        'Каждая выборка бенчмарка должна возвращать полную страницу.'
+    )
+
+
+@pytest.mark.usefixtures('donations')
+@pytest.mark.parametrize('client, url', [
+    ('superuser_client', '/donation/'),
+    ('user_client', '/donation/my'),
+])
+def test_fast_read_matches_orm_path(request, monkeypatch, client, url):
+    client = request.getfixturevalue(client)
+    responses = []
+    for fast_read in (False, True):
+        monkeypatch.setattr(settings, 'fast_read', fast_read)
+        responses.append(client.get(url, params={'limit': 2}))
+    orm, fast = responses
+    assert fast.json() == orm.json() and (
+        fast.headers['link'] == orm.headers['link']
+    ), (
+        f'Быстрое чтение `{url}` должно отдавать те же объекты и ссылку '
+        'на следующую страницу, что и чтение через ORM.'
+    )
+
+
+def test_list_read_benchmark_compares_paths():
+    orm, fast = run_list_read(300, [100], requests=5, traced=1)
+    assert (orm['path'], fast['path']) == ('orm', 'fast')
+    assert orm['bytes'] == fast['bytes'], (
+        'Оба пути чтения списка должны отдавать одинаковый ответ.'
+    )
+    assert fast['peak_kb_per_request'] < orm['peak_kb_per_request'], (
+        'Быстрое чтение должно расходовать меньше памяти на запрос.'
+    )
+
+
+@pytest.mark.usefixtures('charity_project', 'small_fully_charity_project')
+def test_sparse_fieldset(user_client, captured_queries):
+    response = user_client.get(
+        '/charity_project/', params={'fields': 'name,invested_amount'}
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {'id': 1, 'name': 'chimichangas4life', 'invested_amount': 0},
+        {'id': 2, 'name': '1M$ for ur project', 'invested_amount': 0},
+    ], 'С параметром `fields` ответ должен содержать только эти поля и id.'
+    assert not any(
+        'description' in statement for statement, _ in captured_queries
+    ), 'Неперечисленные в `fields` столбцы не должны читаться из БД.'
+
+
+def test_sparse_fieldset_unknown_field(user_client):
+    response = user_client.get(
+        '/charity_project/', params={'fields': 'name,secret'}
+    )
+    assert response.status_code == 400, (
+        'Неизвестное поле в `fields` должно возвращать статус-код 400.'
+    )
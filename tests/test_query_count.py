@@ -0,0 +1,197 @@
+import pytest
+from conftest import TestingSessionLocal
+
+from app.core.config import settings
+from app.crud.charity_project import charity_project_crud
+from app.schemas.charity_project import (CharityProjectCreate,
+                                         CharityProjectUpdate)
+
+
+def statements(captured_queries):
+    return sorted(statement.split()[0] for statement, _ in captured_queries)
+
+
+def test_create_donation_queries(user_client, charity_project,
+                                 captured_queries, captured_commits):
+    response = user_client.post('/donation/', json={'full_amount': 100})
+    assert response.status_code == 200
+    assert statements(captured_queries) == [
+        'INSERT', 'INSERT', 'INSERT', 'SELECT', 'SELECT',
+        'UPDATE', 'UPDATE', 'UPDATE', 'UPDATE',
+    ], (
+        'Создание пожертвования должно выполнять вставку, проверку '
+        'агрегатов, чтение открытых проектов, обновление затронутых строк, '
+        'агрегатов и счетчиков изменений и запись долей без повторного '
+        'чтения после фиксации.'
+    )
+    assert len(captured_commits) == 1, (
+        'Создание и распределение пожертвования должны фиксироваться '
+        'одной транзакцией.'
+    )
+
+
+def test_create_donation_empty_pool_queries(user_client, captured_queries,
+                                            captured_commits):
+    response = user_client.post('/donation/', json={'full_amount': 100})
+    assert response.status_code == 200
+    assert statements(captured_queries) == [
+        'INSERT', 'INSERT', 'SELECT', 'UPDATE', 'UPDATE',
+    ], (
+        'Если открытых проектов нет, пожертвование должно сохраняться '
+        'без чтения пула проектов.'
+    )
+    assert not any(
+        'FROM charityproject' in statement
+        for statement, _ in captured_queries
+    ), 'Пул проектов не должен читаться, если он пуст по агрегатам.'
+    assert len(captured_commits) == 1
+
+
+def test_create_donations_batch_queries(user_client, charity_project,
+                                        captured_queries, captured_commits):
+    response = user_client.post(
+        '/donation/batch', json=[{'full_amount': 10}, {'full_amount': 20}]
+    )
+    assert response.status_code == 200
+    assert statements(captured_queries) == [
+        'INSERT', 'INSERT', 'INSERT', 'SELECT', 'SELECT',
+        'UPDATE', 'UPDATE', 'UPDATE', 'UPDATE', 'UPDATE',
+    ], (
+        'Пачка пожертвований должна распределяться без повторного '
+        'чтения после фиксации.'
+    )
+    assert sum(
+        statement.startswith('INSERT INTO donation ')
+        for statement, _ in captured_queries
+    ) == 1, 'Пачка пожертвований должна вставляться одним INSERT.'
+    assert len(captured_commits) == 1, (
+        'Пачка пожертвований должна фиксироваться одной транзакцией.'
+    )
+
+
+@pytest.mark.usefixtures('donation')
+def test_create_project_queries(superuser_client, captured_queries,
+                                captured_commits):
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'queries', 'description': 'count', 'full_amount': 50,
+    })
+    assert response.status_code == 200
+    assert statements(captured_queries) == [
+        'INSERT', 'INSERT', 'INSERT', 'SELECT', 'SELECT',
+        'UPDATE', 'UPDATE', 'UPDATE', 'UPDATE',
+    ], (
+        'Создание проекта должно выполнять вставку и распределение '
+        'без отдельной проверки имени и повторного чтения после фиксации.'
+    )
+    assert len(captured_commits) == 1, (
+        'Создание проекта должно фиксировать вставку вместе '
+        'с распределением одной транзакцией.'
+    )
+
+
+def project_reads(captured_queries):
+    return [
+        statement for statement, _ in captured_queries
+        if statement.startswith('SELECT charityproject.') and
+        'charityproject.id = ' in statement
+    ]
+
+
+def test_update_project_queries(superuser_client, charity_project,
+                                captured_queries, captured_commits):
+    response = superuser_client.patch(
+        f'/charity_project/{charity_project.id}',
+        json={'name': 'renamed', 'full_amount': 2000},
+    )
+    assert response.status_code == 200
+    assert statements(captured_queries) == [
+        'SELECT', 'SELECT', 'SELECT', 'UPDATE', 'UPDATE', 'UPDATE', 'UPDATE',
+    ], (
+        'Изменение проекта должно выполнять проверки, увеличивать версию '
+        'пула, обновлять проект, агрегаты и счетчик изменений без '
+        'повторного чтения после фиксации.'
+    )
+    assert len(project_reads(captured_queries)) == 1, (
+        'Все проверки изменения проекта должны использовать проект, '
+        'прочитанный в запросе один раз.'
+    )
+    assert len(captured_commits) == 1, (
+        'Изменение проекта должно фиксироваться одной транзакцией.'
+    )
+
+
+def test_delete_project_queries(superuser_client, charity_project,
+                                captured_queries):
+    response = superuser_client.delete(
+        f'/charity_project/{charity_project.id}'
+    )
+    assert response.status_code == 200
+    assert len(project_reads(captured_queries)) == 1, (
+        'Удаление проекта должно читать проект один раз на все проверки.'
+    )
+
+
+@pytest.mark.usefixtures('reset_ledger', 'charity_project', 'donation')
+@pytest.mark.parametrize('ledger', [False, True])
+@pytest.mark.parametrize('client, url, json', [
+    ('user_client', '/donation/', {'full_amount': 100}),
+    ('superuser_client', '/charity_project/', {
+        'name': 'text columns', 'description': 'deferred', 'full_amount': 50,
+    }),
+])
+def test_allocation_skips_text_columns(request, captured_queries,
+                                       monkeypatch, ledger, client, url,
+                                       json):
+    client = request.getfixturevalue(client)
+    monkeypatch.setattr(settings, 'allocation_ledger', ledger)
+    response = client.post(url, json=json)
+    assert response.status_code == 200
+    selects = [
+        statement for statement, _ in captured_queries
+        if statement.startswith('SELECT') and (
+            'FROM charityproject' in statement or 'FROM donation' in statement
+        )
+    ]
+    assert selects and not any(
+        'description' in statement or 'comment' in statement
+        for statement in selects
+    ), (
+        'Распределение не должно читать описания проектов '
+        'и комментарии пожертвований.'
+    )
+
+
+def write_statements(captured_queries, prefix):
+    return [
+        statement for statement, _ in captured_queries
+        if statement.startswith(prefix)
+    ]
+
+
+async def test_bulk_crud_statements(captured_queries, monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_chunk_size', 2)
+    projects_in = [
+        CharityProjectCreate(
+            name=f'bulk {number}', description='bulk', full_amount=10
+        )
+        for number in range(5)
+    ]
+    async with TestingSessionLocal() as session:
+        projects = await charity_project_crud.create_many(
+            projects_in, session, commit=True
+        )
+        assert len(write_statements(
+            captured_queries, 'INSERT INTO charityproject'
+        )) == 3, 'Пачка должна вставляться порциями по allocation_chunk_size.'
+        await charity_project_crud.update_many(projects, [
+            CharityProjectUpdate(description=f'updated {project.id}')
+            for project in projects
+        ], session)
+        assert len(write_statements(
+            captured_queries, 'UPDATE charityproject'
+        )) == 1, 'Пачка изменений должна записываться одним executemany.'
+        await charity_project_crud.remove_many(projects, session)
+        assert len(write_statements(
+            captured_queries, 'DELETE FROM charityproject'
+        )) == 1, 'Пачка удалений должна выполняться одним executemany.'
+        assert await charity_project_crud.get_multi(session) == []
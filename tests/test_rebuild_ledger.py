@@ -0,0 +1,103 @@
+import random
+
+import pytest
+from conftest import TestingSessionLocal
+from sqlalchemy import select, update
+
+from app.core import db
+from app.core.config import settings
+from app.core.rebuild_ledger import rebuild_ledger
+from app.models import CharityProject, Donation
+from app.services.investing import (get_donations_for_project,
+                                    get_projects_for_donation)
+
+
+async def make_history(session, count=40):
+    rng = random.Random(0)
+    for number in range(count):
+        if rng.random() < 0.5:
+            await get_donations_for_project(CharityProject(
+                name=f'project {number}', description='rebuild',
+                full_amount=rng.randint(1, 1000),
+            ), session)
+        else:
+            await get_projects_for_donation(
+                Donation(user_id=1, full_amount=rng.randint(1, 1000)), session
+            )
+
+
+async def read_state(session):
+    return [
+        [
+            (obj.id, obj.invested_amount, obj.fully_invested, obj.close_date)
+            for obj in (await session.execute(
+                select(model).order_by(model.id).execution_options(
+                    populate_existing=True
+                )
+            )).scalars()
+        ]
+        for model in (CharityProject, Donation)
+    ]
+
+
+async def test_rebuild_ledger_finds_and_fixes_drift():
+    async with TestingSessionLocal() as session:
+        await make_history(session)
+        mismatches, _ = await rebuild_ledger(session)
+        assert mismatches == [], (
+            'Пересчет распределения должен совпадать с состоянием, '
+            'полученным при обычном распределении.'
+        )
+        expected = await read_state(session)
+        closed = expected[0][[row[2] for row in expected[0]].index(True)]
+        opened = expected[1][[row[2] for row in expected[1]].index(False)]
+        await session.execute(
+            update(CharityProject).where(
+                CharityProject.id == closed[0]
+            ).values(invested_amount=closed[1] - 1, close_date=None)
+        )
+        await session.execute(
+            update(Donation).where(Donation.id == opened[0]).values(
+                fully_invested=True
+            )
+        )
+        await session.commit()
+        mismatches, fixed = await rebuild_ledger(session, fix=True)
+        assert sorted(
+            (row['model'], row['id'], row['field']) for row in mismatches
+        ) == [
+            ('CharityProject', closed[0], 'close_date'),
+            ('CharityProject', closed[0], 'invested_amount'),
+            ('Donation', opened[0], 'fully_invested'),
+        ], 'Проверка должна сообщать о каждом расхождении с пересчетом.'
+        assert fixed == 2, 'Исправляться должны только расходящиеся строки.'
+        assert (await rebuild_ledger(session))[0] == [], (
+            'После исправления расхождений быть не должно.'
+        )
+        state = await read_state(session)
+    assert state[1] == expected[1]
+    assert [row[:3] for row in state[0]] == [row[:3] for row in expected[0]], (
+        'Исправление должно возвращать суммы и статусы к пересчитанным.'
+    )
+    assert all(row[3] is not None for row in state[0] if row[2]), (
+        'Исправление должно проставлять дату закрытия закрытым проектам.'
+    )
+
+
+async def test_rebuild_ledger_refuses_non_fifo_strategy(monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_strategy', 'closest')
+    async with TestingSessionLocal() as session:
+        with pytest.raises(ValueError):
+            await rebuild_ledger(session, fix=True)
+
+
+async def test_rebuild_ledger_refuses_skip_locked(monkeypatch):
+    monkeypatch.setattr(db, 'SKIP_LOCKED_DIALECTS', ('sqlite',))
+    async with TestingSessionLocal() as session:
+        with pytest.raises(ValueError):
+            await rebuild_ledger(session)
+    monkeypatch.setattr(settings, 'allocation_skip_locked', False)
+    async with TestingSessionLocal() as session:
+        assert (await rebuild_ledger(session))[0] == [], (
+            'Без пропуска заблокированных строк пересчет должен работать.'
+        )
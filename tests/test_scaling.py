@@ -0,0 +1,29 @@
+from benchmarks.scaling import ENGINES, run
+
+
+def test_scaling_benchmark_reports_engines():
+    results = run(sizes=[300], engines=ENGINES, amount=2000, repeat=3)
+    fetched = {
+        (result['engine'], result['operation']):
+            result['rows_fetched_per_allocation']
+        for result in results
+    }
+    assert len(fetched) == len(ENGINES) * 2, (
+        'Бенчмарк должен замерять создание пожертвований и проектов '
+        'для каждого движка.'
+    )
+    assert all(
+        result['p50_ms'] <= result['p99_ms'] and result['peak_rss_mb'] > 0
+        for result in results
+    ), 'Бенчмарк должен сообщать перцентили задержки и пиковую память.'
+    for operation in ('donation', 'project'):
+        assert fetched[('sql', operation)] == 0, (
+            'Движок sql не должен загружать открытые объекты в Python.'
+        )
+        assert (
+            0 < fetched[('ledger', operation)] <=
+            fetched[('python', operation)]
+        ), (
+            'Кэш открытых объектов должен загружать только затронутые '
+            'строки, не больше движка python.'
+        )
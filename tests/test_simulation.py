@@ -0,0 +1,81 @@
+import random
+
+import pytest
+from conftest import TestingSessionLocal
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.crud.allocation_state import allocation_state_crud
+from app.models import CharityProject, Donation, DonationAllocation
+from app.services.investing import get_projects_for_donation
+from app.services.simulation import simulate
+from benchmarks.common import make_rows
+
+
+def test_simulate_donation(user_client, charity_project,
+                           charity_project_nunchaku):
+    response = user_client.post(
+        '/donation/simulate', json={'full_amount': 1500000}
+    )
+    assert response.status_code == 200, (
+        'POST-запрос к эндпоинту `/donation/simulate` должен вернуть '
+        'статус-код 200.'
+    )
+    assert response.json() == {
+        'invested_amount': 1500000,
+        'fully_invested': True,
+        'closed_count': 1,
+        'shares': [
+            {'id': charity_project.id, 'amount': 1000000,
+             'fully_invested': True},
+            {'id': charity_project_nunchaku.id, 'amount': 500000,
+             'fully_invested': False},
+        ],
+    }, 'Пробное распределение должно идти по открытым проектам по FIFO.'
+    projects = user_client.get('/charity_project/').json()
+    assert all(project['invested_amount'] == 0 for project in projects), (
+        'Пробное распределение не должно изменять проекты.'
+    )
+
+
+def test_simulate_project_superuser_only(user_client):
+    response = user_client.post(
+        '/charity_project/simulate', json={'full_amount': 100}
+    )
+    assert response.status_code == 403, (
+        'Пробное распределение проекта доступно только суперпользователю.'
+    )
+
+
+@pytest.mark.usefixtures('reset_ledger')
+@pytest.mark.parametrize('strategy', ['fifo', 'closest', 'proportional'])
+async def test_simulation_matches_allocation(monkeypatch, strategy):
+    monkeypatch.setattr(settings, 'allocation_ledger', strategy != 'fifo')
+    monkeypatch.setattr(settings, 'allocation_strategy', strategy)
+    amount = random.Random(strategy).randint(1000, 30000)
+    async with TestingSessionLocal() as session:
+        await session.execute(insert(CharityProject), [
+            dict(row, name=f'project {number}', description='simulation')
+            for number, row in enumerate(make_rows(50))
+        ])
+        await allocation_state_crud.recalculate(session)
+        await session.commit()
+        simulation = await simulate(amount, CharityProject, session)
+        donation = await get_projects_for_donation(
+            Donation(user_id=1, full_amount=amount), session
+        )
+        allocations = await session.execute(
+            select(
+                DonationAllocation.project_id, DonationAllocation.amount
+            ).where(DonationAllocation.donation_id == donation.id)
+        )
+        closed = await session.execute(
+            select(CharityProject.id).where(CharityProject.fully_invested)
+        )
+    assert sorted(
+        (share['id'], share['amount']) for share in simulation['shares']
+    ) == sorted(tuple(row) for row in allocations), (
+        'Пробное распределение должно совпадать с настоящим.'
+    )
+    assert simulation['invested_amount'] == donation.invested_amount
+    assert simulation['closed_count'] == len(closed.all())
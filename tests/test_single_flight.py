@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+from benchmarks.single_flight import run
+
+
+async def test_concurrent_calls_share_one_flight():
+    flights = SingleFlight()
+    calls = []
+
+    async def read():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b'body'
+
+    results = await asyncio.gather(*(
+        flights.run('key', read) for _ in range(10)
+    ))
+    assert results == [b'body'] * 10
+    assert (len(calls), flights.shared) == (1, 9), (
+        'Одновременные одинаковые вызовы должны выполняться один раз.'
+    )
+    assert not flights.flights
+
+
+async def test_flight_error_shared():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('db')
+
+    results = await asyncio.gather(
+        *(flights.run('key', fail) for _ in range(3)),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.calls == 1
+
+
+async def test_cancelled_leader_hands_over():
+    flights = SingleFlight()
+
+    async def read():
+        await asyncio.sleep(0.05)
+        return 'fresh'
+
+    leader = asyncio.ensure_future(flights.run('key', read))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flights.run('key', read))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == 'fresh', (
+        'Если первый запрос отменен, ожидающий должен выполнить '
+        'вызов сам.'
+    )
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert flights.calls == 2
+
+
+def test_single_flight_benchmark_coalesces_reads():
+    direct, coalesced = run(projects=50, levels=[20], rounds=2, limit=10)
+    assert (direct['mode'], coalesced['mode']) == ('direct', 'single_flight')
+    assert direct['identical'] and coalesced['identical']
+    assert coalesced['queries_per_request'] < direct['queries_per_request'], (
+        'Одинаковые одновременные запросы к списку проектов должны '
+        'делить один запрос к БД.'
+    )
@@ -0,0 +1,128 @@
+import random
+
+import pytest
+from conftest import TestingSessionLocal
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.crud.allocation_state import allocation_state_crud
+from app.crud.charity_project import charity_project_crud
+from app.models import CharityProject, Donation, FundAggregate
+from app.models.fund_aggregate import STRIPE_KEY
+from app.schemas.charity_project import CharityProjectUpdate
+from app.services.investing import (get_donations_for_project,
+                                    get_projects_for_donation)
+
+
+def test_get_stats(user_client, charity_project):
+    response = user_client.post('/donation/', json={'full_amount': 1500000})
+    assert response.status_code == 200
+    response = user_client.get('/stats')
+    assert response.status_code == 200, (
+        'GET-запрос к эндпоинту `/stats` должен вернуть статус-код 200.'
+    )
+    assert response.json() == {
+        'open_capacity': 0,
+        'pending_balance': 500000,
+        'donated_total': 1500000,
+        'invested_total': 1000000,
+    }, 'Итоги фонда должны учитывать закрытый проект и остаток пожертвования.'
+
+
+def test_stats_follow_project_changes(superuser_client, charity_project):
+    response = superuser_client.post('/charity_project/', json={
+        'name': 'stats', 'description': 'stats', 'full_amount': 800000,
+    })
+    assert response.status_code == 200
+    response = superuser_client.patch(
+        f'/charity_project/{response.json()["id"]}',
+        json={'full_amount': 600000},
+    )
+    assert response.status_code == 200
+    superuser_client.delete(f'/charity_project/{charity_project.id}')
+    assert superuser_client.get('/stats').json() == {
+        'open_capacity': 600000,
+        'pending_balance': 0,
+        'donated_total': 0,
+        'invested_total': 0,
+    }, (
+        'Итоги фонда должны обновляться при создании, изменении '
+        'и удалении проекта.'
+    )
+
+
+async def read_totals(session):
+    return await allocation_state_crud.get_totals(session)
+
+
+@pytest.mark.usefixtures('reset_ledger')
+@pytest.mark.parametrize('engine_name', ['python', 'sql', 'ledger'])
+async def test_aggregates_match_sums(monkeypatch, engine_name):
+    monkeypatch.setattr(
+        settings, 'allocation_ledger', engine_name == 'ledger'
+    )
+    if engine_name != 'ledger':
+        monkeypatch.setattr(settings, 'allocation_engine', engine_name)
+    rng = random.Random(engine_name)
+    async with TestingSessionLocal() as session:
+        for number in range(60):
+            if rng.random() < 0.5:
+                await get_donations_for_project(CharityProject(
+                    name=f'project {number}', description='stats',
+                    full_amount=rng.randint(1, 1000),
+                ), session)
+            else:
+                await get_projects_for_donation(Donation(
+                    user_id=1, full_amount=rng.randint(1, 1000)
+                ), session)
+            maintained = await read_totals(session)
+            await allocation_state_crud.recalculate(session)
+            assert maintained == await read_totals(session), (
+                'Агрегаты фонда должны совпадать с суммами по проектам '
+                'и пожертвованиям после каждого распределения.'
+            )
+
+
+async def test_aggregates_written_to_session_stripe_at_commit(
+    captured_queries,
+):
+    amounts = {}
+    for stripe, amount in ((2, 300), (5, 700)):
+        captured_queries.clear()
+        async with TestingSessionLocal() as session:
+            session.sync_session.info[STRIPE_KEY] = stripe
+            session.add(Donation(user_id=1, full_amount=amount))
+            await session.flush()
+            assert not any(
+                'UPDATE fundaggregate' in statement
+                for statement, _ in captured_queries
+            ), 'Агрегаты фонда должны обновляться только при фиксации.'
+            await session.commit()
+        amounts[stripe] = amount
+    async with TestingSessionLocal() as session:
+        stripes = dict((await session.execute(
+            select(FundAggregate.id, FundAggregate.donated_total)
+        )).all())
+        totals = await read_totals(session)
+    assert {
+        stripe: total for stripe, total in stripes.items() if total
+    } == amounts, 'Каждая сессия должна сдвигать только свою полосу.'
+    assert totals['donated_total'] == 1000, (
+        'Итоги фонда должны складываться из всех полос.'
+    )
+
+
+@pytest.mark.usefixtures('charity_project', 'charity_project_nunchaku')
+async def test_update_many_adjusts_aggregates():
+    async with TestingSessionLocal() as session:
+        projects = await charity_project_crud.get_multi(session)
+        await charity_project_crud.update_many(projects, [
+            CharityProjectUpdate(full_amount=5000 + project.id)
+            for project in projects
+        ], session)
+        maintained = await read_totals(session)
+        await allocation_state_crud.recalculate(session)
+        assert maintained == await read_totals(session), (
+            'Изменение пачки проектов в обход flush должно учитываться '
+            'в агрегатах фонда.'
+        )
@@ -0,0 +1,85 @@
+import heapq
+from datetime import datetime, timedelta
+
+import pytest
+from conftest import TestingSessionLocal
+from pydantic import ValidationError
+
+from app.core.config import Settings, settings
+from app.models import CharityProject, Donation
+from app.services.investing import get_projects_for_donation
+from app.services.ledger import ledger
+from app.services.strategies import STRATEGIES
+
+START = datetime(2020, 1, 1)
+REMAINING = [300, 100, 50, 400]
+
+
+def make_heap(strategy, remaining):
+    heap = [
+        (strategy.priority(START + timedelta(seconds=number), amount),
+         number + 1, amount)
+        for number, amount in enumerate(remaining)
+    ]
+    heapq.heapify(heap)
+    return heap
+
+
+@pytest.mark.parametrize('name, amount, expected', [
+    ('fifo', 350, [(1, 300), (2, 50)]),
+    ('closest', 120, [(3, 50), (2, 70)]),
+    ('proportional', 120, [(1, 42), (2, 14), (3, 7), (4, 57)]),
+    ('proportional', 1000, [(1, 300), (2, 100), (3, 50), (4, 400)]),
+])
+def test_strategy_take(name, amount, expected):
+    strategy = STRATEGIES[name]
+    heap = make_heap(strategy, REMAINING)
+    shares = strategy.take(heap, amount)
+    assert shares == expected, (
+        f'Стратегия {name} должна распределять {amount} как {expected}.'
+    )
+    left = {obj_id: remaining for _, obj_id, remaining in heap}
+    assert sum(left.values()) == sum(REMAINING) - min(amount, sum(REMAINING))
+    while heap:
+        priority, obj_id, remaining = heapq.heappop(heap)
+        assert remaining == left[obj_id] and remaining > 0, (
+            'После списания в куче должны остаться только открытые '
+            'объекты с актуальным остатком.'
+        )
+
+
+def test_strategy_requires_ledger():
+    with pytest.raises(ValidationError):
+        Settings(allocation_strategy='closest', allocation_ledger=False)
+
+
+@pytest.mark.usefixtures('reset_ledger')
+@pytest.mark.parametrize('name, expected', [
+    ('fifo', [100, 0]),
+    ('closest', [0, 100]),
+    ('proportional', [75, 25]),
+])
+async def test_ledger_uses_strategy(monkeypatch, name, expected):
+    monkeypatch.setattr(settings, 'allocation_ledger', True)
+    monkeypatch.setattr(settings, 'allocation_strategy', name)
+    async with TestingSessionLocal() as session:
+        projects = [
+            CharityProject(
+                name=f'project {amount}', description='strategy',
+                full_amount=amount, create_date=START + timedelta(days=day),
+            )
+            for day, amount in enumerate((300, 100))
+        ]
+        session.add_all(projects)
+        await session.commit()
+        await get_projects_for_donation(
+            Donation(user_id=1, full_amount=100), session
+        )
+        invested = [project.invested_amount for project in projects]
+        assert invested == expected, (
+            f'Стратегия {name} должна распределить пожертвование '
+            f'как {expected}.'
+        )
+        assert not await ledger.check(session), (
+            'После распределения кэш открытых объектов должен совпадать с БД.'
+        )
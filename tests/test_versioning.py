@@ -0,0 +1,119 @@
+import pytest
+from conftest import TestingSessionLocal
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.crud.charity_project import charity_project_crud
+from app.models import CharityProject, Donation
+from app.schemas.charity_project import CharityProjectUpdate
+from app.services import investing
+from app.services.investing import get_projects_for_donation
+
+
+async def bump_versions(model, session):
+    await session.execute(
+        update(model).values(version_id=model.version_id + 1).
+        execution_options(synchronize_session=False)
+    )
+
+
+async def test_update_stale_project(charity_project):
+    async with TestingSessionLocal() as session:
+        project = await charity_project_crud.get(charity_project.id, session)
+        await bump_versions(CharityProject, session)
+        with pytest.raises(StaleDataError):
+            await charity_project_crud.update(
+                project, CharityProjectUpdate(name='stale'), session
+            )
+
+
+def test_update_project_conflict(superuser_client, charity_project,
+                                 monkeypatch):
+    async def stale_update(*args, **kwargs):
+        raise StaleDataError()
+
+    monkeypatch.setattr(charity_project_crud, 'update', stale_update)
+    response = superuser_client.patch(
+        f'/charity_project/{charity_project.id}', json={'name': 'new name'}
+    )
+    assert response.status_code == 409, (
+        'При параллельном изменении проекта PATCH-запрос должен '
+        'возвращать статус-код 409.'
+    )
+
+
+async def test_allocation_retries_stale_write(charity_project, monkeypatch):
+    calls = []
+    allocate = investing.ALLOCATION_ENGINES['python']
+
+    async def concurrent_allocate(targets, source_model, session):
+        calls.append(source_model)
+        allocations = await allocate(targets, source_model, session)
+        if len(calls) == 1:
+            await bump_versions(source_model, session)
+        return allocations
+
+    monkeypatch.setitem(
+        investing.ALLOCATION_ENGINES, 'python', concurrent_allocate
+    )
+    async with TestingSessionLocal() as session:
+        donation = await get_projects_for_donation(
+            Donation(user_id=1, full_amount=100), session
+        )
+        project = await charity_project_crud.get(charity_project.id, session)
+        assert len(calls) == 2, (
+            'Распределение, столкнувшееся с параллельной записью, '
+            'должно повторяться.'
+        )
+        assert donation.fully_invested and project.invested_amount == 100, (
+            'Повторное распределение должно учесть пожертвование один раз.'
+        )
+
+
+async def test_update_many_stale_projects(charity_project,
+                                          charity_project_nunchaku):
+    async with TestingSessionLocal() as session:
+        projects = await charity_project_crud.get_multi(session)
+        await bump_versions(CharityProject, session)
+        with pytest.raises(StaleDataError):
+            await charity_project_crud.update_many(projects, [
+                CharityProjectUpdate(description='stale')
+            ] * len(projects), session)
+
+
+async def test_sql_allocation_credits_recorded_rows(
+        charity_project, charity_project_nunchaku, monkeypatch
+):
+    async with TestingSessionLocal() as session:
+        execute = session.execute
+
+        async def concurrent_close(statement, *args, **kwargs):
+            result = await execute(statement, *args, **kwargs)
+            if str(statement).lstrip().startswith(
+                'INSERT INTO donationallocation'
+            ):
+                await execute(
+                    update(CharityProject).where(
+                        CharityProject.id == charity_project.id
+                    ).values(
+                        fully_invested=True,
+                        invested_amount=CharityProject.full_amount,
+                    ).execution_options(synchronize_session=False)
+                )
+            return result
+
+        monkeypatch.setattr(session, 'execute', concurrent_close)
+        donation = Donation(user_id=1, full_amount=100, invested_amount=0)
+        session.add(donation)
+        await session.flush()
+        with pytest.raises(StaleDataError):
+            await investing.allocate_in_sql(
+                [donation], CharityProject, session
+            )
+        nunchaku = await session.get(
+            CharityProject, charity_project_nunchaku.id
+        )
+        assert nunchaku.invested_amount == 0, (
+            'Доли должны зачисляться тем проектам, которые записаны '
+            'в таблицу распределений, а не заново выбранным.'
+        )